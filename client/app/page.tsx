@@ -127,7 +127,6 @@ export default function Root(): React.ReactElement {
         onClose={closeCreateCarDrawer}
         cars={cars}
         setCars={setCars}
-        persons={persons}
       />
       <CreatePersonDrawer
         opened={createPersonDrawerOpened}
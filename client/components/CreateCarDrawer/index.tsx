@@ -4,7 +4,6 @@ import {
   Drawer,
   Group,
   NumberInput,
-  Select,
   Stack,
   TextInput,
   Title,
@@ -17,13 +16,13 @@ import { useRouter } from "next/navigation";
 import brands from "@/data/brands.json";
 import models from "@/data/models.json";
 import colors from "@/data/colors.json";
+import PersonSelect from "@/components/PersonSelect";
 
 interface CreateCarDrawerProps {
   opened: boolean;
   onClose: () => void;
   cars: any;
   setCars: (cars: any) => void;
-  persons: any;
 }
 
 export default function CreateCarDrawer({
@@ -31,7 +30,6 @@ export default function CreateCarDrawer({
   onClose,
   cars,
   setCars,
-  persons,
 }: CreateCarDrawerProps): React.ReactElement {
   const [loading, setLoading] = useState<boolean>(false);
 
@@ -142,19 +140,10 @@ export default function CreateCarDrawer({
             {...form.getInputProps("color")}
             data={colors}
           />
-          <Select
-            searchable
+          <PersonSelect
             label="Propriétaire"
             key={form.key("owner")}
             {...form.getInputProps("owner")}
-            data={
-              persons?.map((person: any) => ({
-                value: person.id,
-                label: `${person.first_name} ${person.last_name} - ${new Date(
-                  person.birth_date
-                ).toLocaleDateString()}`,
-              })) || []
-            }
           />
           <Button type="submit" loading={loading}>
             Créer la voiture
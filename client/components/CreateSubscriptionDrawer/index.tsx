@@ -13,6 +13,7 @@ import { useEffect, useState } from "react";
 import { useForm } from "@mantine/form";
 import { notifications } from "@mantine/notifications";
 import { useRouter } from "next/navigation";
+import PersonSelect from "@/components/PersonSelect";
 
 interface Subscription {
   id: string;
@@ -61,17 +62,6 @@ export default function CreateSubscriptionDrawer({
       }[]
     | null
   >([]);
-  const [persons, setPersons] = useState<
-    | {
-        id: string;
-        first_name: string;
-        last_name: string;
-        birth_date: string;
-        cars: string[];
-        subscriptions: string[];
-      }[]
-    | null
-  >([]);
 
   const form = useForm({
     initialValues: {
@@ -97,12 +87,6 @@ export default function CreateSubscriptionDrawer({
     }
   }, [parking?.id]);
 
-  useEffect(() => {
-    axios.get(`${process.env.NEXT_PUBLIC_API_URL}/persons`).then((response) => {
-      setPersons(response.data.persons);
-    });
-  }, []);
-
   const router = useRouter();
 
   return (
@@ -151,19 +135,10 @@ export default function CreateSubscriptionDrawer({
             value={parking?.name}
             disabled
           />
-          <Select
-            searchable
+          <PersonSelect
             label="Bénéficiaire"
             key={form.key("owner")}
             {...form.getInputProps("owner")}
-            data={
-              persons?.map((person) => ({
-                value: person.id,
-                label: `${person.first_name} ${person.last_name} - ${new Date(
-                  person.birth_date
-                ).toLocaleDateString()}`,
-              })) || []
-            }
           />
           <Select
             searchable
@@ -0,0 +1,82 @@
+import { ComboboxItem, Select, SelectProps } from "@mantine/core";
+import { useDebouncedValue } from "@mantine/hooks";
+import axios from "axios";
+import { useEffect, useState } from "react";
+
+interface Person {
+  id: string;
+  first_name: string;
+  last_name: string;
+  birth_date: string;
+}
+
+type PersonSelectProps = Omit<
+  SelectProps,
+  "data" | "searchable" | "searchValue" | "onSearchChange" | "filter"
+>;
+
+const personLabel = (person: Person): string =>
+  `${person.first_name} ${person.last_name} - ${new Date(
+    person.birth_date
+  ).toLocaleDateString()}`;
+
+export default function PersonSelect({
+  onChange,
+  ...props
+}: PersonSelectProps): React.ReactElement {
+  const [search, setSearch] = useState<string>("");
+  const [debouncedSearch] = useDebouncedValue(search, 200);
+  const [persons, setPersons] = useState<Person[]>([]);
+  const [selected, setSelected] = useState<Person | null>(null);
+
+  useEffect(() => {
+    // Le libellé de la personne choisie n'est pas une recherche
+    if (selected && debouncedSearch === personLabel(selected)) return;
+
+    if (debouncedSearch.trim().length < 1) {
+      setPersons([]);
+      return;
+    }
+
+    const controller = new AbortController();
+    axios
+      .get(`${process.env.NEXT_PUBLIC_API_URL}/persons/search`, {
+        params: { q: debouncedSearch },
+        signal: controller.signal,
+      })
+      .then((response) => {
+        setPersons(response.data.persons);
+      })
+      .catch(() => {
+        setPersons([]);
+      });
+
+    return () => controller.abort();
+  }, [debouncedSearch]);
+
+  // La personne choisie reste dans la liste, même absente des derniers résultats
+  const options =
+    selected && !persons.some((person) => person.id === selected.id)
+      ? [selected, ...persons]
+      : persons;
+
+  return (
+    <Select
+      {...props}
+      searchable
+      searchValue={search}
+      onSearchChange={setSearch}
+      // Les personnes sont déjà filtrées et classées par le serveur
+      filter={({ options }) => options}
+      nothingFoundMessage={search.trim() ? "Aucune personne trouvée" : undefined}
+      onChange={(value: string | null, option: ComboboxItem) => {
+        setSelected(options.find((person) => person.id === value) ?? null);
+        onChange?.(value, option);
+      }}
+      data={options.map((person) => ({
+        value: person.id,
+        label: personLabel(person),
+      }))}
+    />
+  );
+}
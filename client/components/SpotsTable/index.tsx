@@ -59,6 +59,7 @@ export default function SpotsTable({ parking }: Props) {
   const [page, setPage] = useState<number>(1);
   const [records, setRecords] = useState<Spot[]>(spots.slice(0, PAGE_SIZE));
   const [loading, setLoading] = useState<boolean>(true);
+  const [reload, setReload] = useState<number>(0);
   const [filters, setFilters] = useState<{
     id: string;
     tag: string;
@@ -94,7 +95,52 @@ export default function SpotsTable({ parking }: Props) {
         .catch(() => setError(true))
         .finally(() => setLoading(false));
     }
-  }, [level, parking]);
+  }, [level, parking, reload]);
+
+  useEffect(() => {
+    if (!parking) return;
+
+    // Changements d'occupation poussés par le serveur, appliqués aux places affichées
+    const source = new EventSource(
+      `${process.env.NEXT_PUBLIC_API_URL}/parkings/${parking.id}/events`
+    );
+    const updateSpot = (id: string, changes: Partial<Spot>) =>
+      setSpots((prevSpots) =>
+        prevSpots.map((spot) => (spot.id === id ? { ...spot, ...changes } : spot))
+      );
+
+    source.addEventListener("park", (event) => {
+      const data = JSON.parse(event.data);
+      updateSpot(data.spot, {
+        car: { id: data.car, license_plate: data.license_plate },
+        is_taken: true,
+      });
+    });
+    source.addEventListener("unpark", (event) => {
+      const data = JSON.parse(event.data);
+      updateSpot(data.spot, {
+        car: { id: null, license_plate: null },
+        is_taken: false,
+      });
+    });
+    source.addEventListener("subscribe", (event) => {
+      const data = JSON.parse(event.data);
+      updateSpot(data.spot, { subscription: data.subscription });
+    });
+    source.addEventListener("unsubscribe", (event) => {
+      const data = JSON.parse(event.data);
+      updateSpot(data.spot, { subscription: null });
+    });
+    // Des événements ont pu être manqués (reconnexion, client trop lent) : rechargement des places
+    let opened = false;
+    source.addEventListener("reset", () => setReload((value) => value + 1));
+    source.onopen = () => {
+      if (opened) setReload((value) => value + 1);
+      opened = true;
+    };
+
+    return () => source.close();
+  }, [parking]);
 
   useEffect(() => {
     const from = (page - 1) * PAGE_SIZE;
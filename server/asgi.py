@@ -0,0 +1,456 @@
+import io
+import os
+import re
+import sys
+import time
+import asyncio
+from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from werkzeug.http import parse_etags
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, selectinload
+from server import (
+    server, format_spot, format_parking_statistics,
+    parking_spots_statement, parking_statistics_statements
+)
+from classes import Parking
+from utils import events, history, ingestion, metrics
+from utils.sqlalchemy import DATABASE_URL, async_database_url, engine_options, run_after_commit, discard_after_commit
+
+# Mode ASGI du serveur : à démarrer avec `uvicorn asgi:app` depuis le répertoire `/server`.
+#
+# Les lectures les plus fréquentes des tableaux de bord (parking, places, statistiques),
+# la suppression d'un parking et les flux d'événements sont servis directement sur la
+# boucle asyncio, avec le moteur asynchrone de SQLAlchemy. Les autres routes (créations,
+# stationnements, abonnements, listes et recherches : des requêtes courtes) sont servies
+# par l'application Flask dans un pool de threads : elles gardent exactement le même
+# comportement qu'en mode WSGI.
+
+# Nombre de threads servant les routes Flask
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 8))
+
+ASYNC_URL = async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_URL, **engine_options(ASYNC_URL))
+
+if async_engine.dialect.name == "sqlite":
+    from utils.sqlalchemy import SQLITE_PRAGMAS
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_sqlite_pragmas(connection, _) -> None:
+        """
+        Application des PRAGMAs SQLite à l'ouverture d'une connexion.
+        """
+        cursor = connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+class AsyncSyncSession(Session):
+    """
+    Session synchrone des sessions asynchrones, pour le code des modèles
+    exécuté avec `AsyncSession.run_sync` : les fonctions enregistrées avec
+    `after_commit` y sont exécutées, et les tables de l'historique créées,
+    comme en mode WSGI.
+    """
+
+event.listen(AsyncSyncSession, "after_commit", run_after_commit)
+event.listen(AsyncSyncSession, "after_transaction_end", discard_after_commit)
+event.listen(AsyncSyncSession, "after_begin", history.prepare_partitions)
+
+AsyncSessionFactory = async_sessionmaker(async_engine, expire_on_commit=False, sync_session_class=AsyncSyncSession)
+
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="flask")
+
+# En-têtes ajoutés à toutes les réponses par l'application Flask
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization"),
+    (b"access-control-allow-methods", b"GET,PUT,POST,DELETE,OPTIONS"),
+    (b"access-control-allow-credentials", b"true")
+]
+
+# Réponse d'une route : code de statut, corps (None pour une réponse vide) et en-têtes
+Result = Tuple[int, Optional[Dict[str, Any]], List[Tuple[bytes, bytes]]]
+
+def not_found() -> Result:
+    return 404, {"status": "error", "message": "PARKING_NOT_FOUND"}, []
+
+async def conditional(
+        db: AsyncSession,
+        parking_id: str,
+        headers: Dict[bytes, bytes],
+        view: Callable[[AsyncSession, str], Awaitable[Result]]
+    ) -> Result:
+    """
+    Réponses conditionnelles d'une route de lecture d'un parking.
+
+    Équivalent asynchrone du décorateur `versioned` de `server.py` : l'ETag est
+    la version du parking et un `If-None-Match` correspondant renvoie 304.
+
+    Paramètres :
+    - db (AsyncSession) : Session asynchrone.
+    - parking_id (str) : Identifiant du parking.
+    - headers (dict) : En-têtes de la requête.
+    - view (Callable) : Route, appelée seulement si la réponse a changé.
+
+    Sortie :
+    - Result : Réponse de la route.
+    """
+    version = await db.scalar(select(Parking.version).where(Parking.id == parking_id))
+    if version is None:
+        return not_found()
+
+    etag = str(version)
+    cache_headers = [(b"etag", f"\"{etag}\"".encode()), (b"cache-control", b"no-cache")]
+    if parse_etags(headers.get(b"if-none-match", b"").decode("latin1")).contains_weak(etag):
+        return 304, None, cache_headers
+
+    status, body, extra = await view(db, parking_id)
+    return status, body, extra + (cache_headers if status == 200 else [])
+
+async def get_parking(db: AsyncSession, parking_id: str, args: Dict[str, str], headers: Dict[bytes, bytes]) -> Result:
+    """
+    Récupère un parking (voir `server.get_parking`).
+    """
+    async def view(db: AsyncSession, parking_id: str) -> Result:
+        # Les relations ne peuvent pas être chargées à la demande en asynchrone
+        parking = await db.scalar(
+            select(Parking)
+            .where(Parking.id == parking_id)
+            .options(selectinload(Parking.spots), selectinload(Parking.subscriptions))
+        )
+        if parking is None:
+            return not_found()
+        return 200, {"status": "success", "parking": parking.to_dict()}, []
+
+    return await conditional(db, parking_id, headers, view)
+
+async def get_parking_spots(db: AsyncSession, parking_id: str, args: Dict[str, str], headers: Dict[bytes, bytes]) -> Result:
+    """
+    Récupère la liste des places d'un parking (voir `server.get_parking_spots`).
+    """
+    async def view(db: AsyncSession, parking_id: str) -> Result:
+        level = args.get("level")
+        if level is not None:
+            try:
+                level = int(level)
+            except ValueError:
+                return 400, {"status": "error", "message": "INVALID_LEVEL"}, []
+
+        spots = (await db.execute(parking_spots_statement(parking_id, level))).all()
+        return 200, {"status": "success", "spots": [format_spot(spot) for spot in spots]}, []
+
+    return await conditional(db, parking_id, headers, view)
+
+async def get_parking_statistics(db: AsyncSession, parking_id: str, args: Dict[str, str], headers: Dict[bytes, bytes]) -> Result:
+    """
+    Récupère les statistiques d'un parking (voir `server.get_parking_statistics`).
+    """
+    async def view(db: AsyncSession, parking_id: str) -> Result:
+        statements = parking_statistics_statements(parking_id)
+        return 200, {
+            "status": "success",
+            "statistics": format_parking_statistics(
+                (await db.execute(statements["spots_by_level"])).all(),
+                (await db.execute(statements["car_brands"])).all(),
+                await db.scalar(statements["total_subscriptions"]),
+                (await db.execute(statements["cars_bad_parked"])).all()
+            )
+        }, []
+
+    return await conditional(db, parking_id, headers, view)
+
+async def delete_parking(db: AsyncSession, parking_id: str, args: Dict[str, str], headers: Dict[bytes, bytes]) -> Result:
+    """
+    Supprime un parking (voir `server.delete_parking`).
+
+    Les requêtes de `Parking.delete` sont exécutées sur la connexion
+    asynchrone : la suppression n'occupe aucun thread du pool.
+    """
+    parking = await db.get(Parking, parking_id)
+    if parking is None:
+        return not_found()
+
+    await db.run_sync(lambda session: parking.delete(session))
+    await db.commit()
+    return 200, {"status": "success"}, []
+
+# Routes servies sur la boucle asyncio : méthode, chemin, route Flask équivalente et fonction
+ROUTES = [
+    ("GET", re.compile(r"^/api/parkings/([^/]+)$"), "/api/parkings/<parking_id>", get_parking),
+    ("GET", re.compile(r"^/api/parkings/([^/]+)/spots$"), "/api/parkings/<parking_id>/spots", get_parking_spots),
+    ("GET", re.compile(r"^/api/parkings/([^/]+)/statistics$"), "/api/parkings/<parking_id>/statistics", get_parking_statistics),
+    ("DELETE", re.compile(r"^/api/parkings/([^/]+)$"), "/api/parkings/<parking_id>", delete_parking)
+]
+EVENTS_ROUTE = re.compile(r"^/api/parkings/([^/]+)/events$")
+INGEST_ROUTE = re.compile(r"^/api/parkings/([^/]+)/stream$")
+
+async def send_response(send: Callable, status: int, body: Optional[Dict[str, Any]], headers: List[Tuple[bytes, bytes]]) -> None:
+    """
+    Envoi d'une réponse JSON, encodée comme par l'application Flask.
+    """
+    content = b"" if body is None else server.json.response(body).get_data()
+    if body is not None:
+        headers = [(b"content-type", server.json.mimetype.encode())] + headers
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": headers + CORS_HEADERS + [(b"content-length", str(len(content)).encode())]
+    })
+    await send({"type": "http.response.body", "body": content})
+
+async def stream_events(parking_id: str, receive: Callable, send: Callable) -> int:
+    """
+    Flux Server-Sent Events des changements d'occupation d'un parking (voir
+    `server.get_parking_events`), sans thread bloqué par connexion.
+
+    Sortie :
+    - int : Code de statut de la réponse.
+    """
+    async with AsyncSessionFactory() as db:
+        found = await db.scalar(select(Parking.id).where(Parking.id == parking_id))
+    if found is None:
+        await send_response(send, *not_found())
+        return 404
+
+    subscriber = events.broker.subscribe(parking_id, events.AsyncSubscriber)
+
+    async def wait_disconnect() -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        subscriber.wake()
+
+    disconnect = asyncio.ensure_future(wait_disconnect())
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ] + CORS_HEADERS
+        })
+        await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+        while not disconnect.done():
+            messages = await subscriber.pull_async(events.EVENTS_HEARTBEAT_INTERVAL)
+            if disconnect.done():
+                break
+            # Un commentaire maintient la connexion ouverte à travers les proxys
+            content = "".join(messages) if messages else ": keep-alive\n\n"
+            await send({"type": "http.response.body", "body": content.encode(), "more_body": True})
+    finally:
+        events.broker.unsubscribe(subscriber)
+        disconnect.cancel()
+    return 200
+
+async def ingest_events(parking_id: str, receive: Callable, send: Callable) -> int:
+    """
+    Ingestion d'un flux NDJSON d'événements de stationnement (voir
+    `server.ingest_parking_events`).
+
+    Le corps de la requête est lu au fil de l'eau sur la boucle asyncio ; les
+    lots sont appliqués dans le pool de threads. Quand la file des événements
+    est pleine, la lecture de la connexion est suspendue.
+
+    Sortie :
+    - int : Code de statut de la réponse.
+    """
+    async with AsyncSessionFactory() as db:
+        found = await db.scalar(select(Parking.id).where(Parking.id == parking_id))
+    if found is None:
+        await send_response(send, *not_found())
+        return 404
+
+    queue: asyncio.Queue = asyncio.Queue(ingestion.INGEST_QUEUE_SIZE)
+
+    async def read_events() -> None:
+        splitter, seq = ingestion.LineSplitter(), 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            more_body = message.get("more_body", False)
+            lines = splitter.feed(message.get("body", b""))
+            if not more_body:
+                lines += splitter.close()
+            for line in lines:
+                if line.strip():
+                    seq += 1
+                    await queue.put((seq, ingestion.decode_event(line)))
+        await queue.put(None)
+
+    reader = asyncio.ensure_future(read_events())
+    loop = asyncio.get_running_loop()
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/x-ndjson"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ] + CORS_HEADERS
+        })
+
+        finished = False
+        while not finished:
+            event = await queue.get()
+            if event is None:
+                break
+
+            batch = [event]
+            deadline = loop.time() + ingestion.INGEST_BATCH_INTERVAL
+            while len(batch) < ingestion.INGEST_BATCH_SIZE:
+                try:
+                    event = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    finished = True
+                    break
+                batch.append(event)
+
+            acks = await loop.run_in_executor(executor, ingestion.apply_batch, parking_id, batch)
+            await send({"type": "http.response.body", "body": acks, "more_body": True})
+
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        reader.cancel()
+    return 200
+
+def build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """
+    Construction de l'environnement WSGI d'une requête ASGI.
+
+    Paramètres :
+    - scope (dict) : Requête ASGI.
+    - body (bytes) : Corps de la requête.
+
+    Sortie :
+    - dict : Environnement WSGI.
+    """
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False
+    }
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin1"), value.decode("latin1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def call_flask(environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """
+    Exécution d'une requête par l'application Flask, dans un thread du pool.
+
+    La réponse est lue et fermée dans le même thread : la session de la
+    requête y est libérée.
+
+    Sortie :
+    - Tuple : Code de statut, en-têtes et corps de la réponse.
+    """
+    response: List[Any] = []
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> None:
+        response[:] = [int(status.split(" ", 1)[0]), [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers]]
+
+    result = server.wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response[0], response[1], body
+
+async def read_body(receive: Callable) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+async def app(scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+    """
+    Application ASGI.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await async_engine.dispose()
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+
+    if method == "POST":
+        match = INGEST_ROUTE.match(path)
+        if match:
+            start = time.perf_counter()
+            status = await ingest_events(match.group(1), receive, send)
+            metrics.requests.observe(
+                method, "/api/parkings/<parking_id>/stream", status, time.perf_counter() - start,
+                "PARKING_NOT_FOUND" if status == 404 else None
+            )
+            return
+
+    if method == "GET":
+        match = EVENTS_ROUTE.match(path)
+        if match:
+            start = time.perf_counter()
+            status = await stream_events(match.group(1), receive, send)
+            metrics.requests.observe(
+                method, "/api/parkings/<parking_id>/events", status, time.perf_counter() - start,
+                "PARKING_NOT_FOUND" if status == 404 else None
+            )
+            return
+
+    for route_method, pattern, route, view in ROUTES:
+        match = pattern.match(path) if method == route_method else None
+        if match:
+            start = time.perf_counter()
+            args = dict(parse_qsl(scope["query_string"].decode("latin1"), keep_blank_values=True))
+            async with AsyncSessionFactory() as db:
+                status, body, headers = await view(db, match.group(1), args, dict(scope["headers"]))
+            await send_response(send, status, body, headers)
+            metrics.requests.observe(
+                method, route, status, time.perf_counter() - start,
+                body.get("message") if body and status >= 400 else None
+            )
+            return
+
+    # Autres routes : application Flask, dans un thread du pool
+    environ = build_environ(scope, await read_body(receive))
+    status, headers, body = await asyncio.get_running_loop().run_in_executor(executor, call_flask, environ)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
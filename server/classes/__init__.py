@@ -2,4 +2,5 @@ from .car import Car
 from .parking import Parking
 from .person import Person
 from .spot import Spot
-from .subscription import Subscription
\ No newline at end of file
+from .subscription import Subscription
+from .errors import ParkingError
\ No newline at end of file
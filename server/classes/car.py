@@ -1,26 +1,31 @@
-from utils.uuid import uuid_v4
-from typing import TYPE_CHECKING, Optional
-from sqlalchemy import Column, String, ForeignKey
+from utils.uuid import uuid_v4, Identifier
+from utils import occupancy, events, history, plates
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from sqlalchemy import Column, String, ForeignKey, exists, select, update
 from sqlalchemy.orm import relationship
-from utils.sqlalchemy import Base, Session as session
+from sqlalchemy.orm.attributes import set_committed_value
+from classes.errors import ParkingError
+from utils.sqlalchemy import Base, Session as session, SessionFactory, after_commit
 
 # Importations conditionnelles pour éviter les importations circulaires
 if TYPE_CHECKING:
     from classes import Person, Spot
+    from utils.plates import PlateIndex
 
 # Définition de la classe Car qui hérite de Base (SQLAlchemy)
 class Car(Base):
     __tablename__ = 'cars'  # Nom de la table dans la base de données
     
     # Définition des colonnes de la table
-    id = Column(String, primary_key=True)
-    license_plate = Column(String, nullable=False)
+    id = Column(Identifier, primary_key=True)
+    license_plate = Column(String, nullable=False, unique=True, index=True)
     brand = Column(String, nullable=False)
     model = Column(String, nullable=False)
     color = Column(String, nullable=False)
 
     # Clé étrangère et relation avec la table 'persons'
-    owner_id = Column(String, ForeignKey('persons.id'))
+    owner_id = Column(Identifier, ForeignKey('persons.id'), index=True)
     owner = relationship('Person', back_populates='cars', uselist=False, enable_typechecks=False, lazy=True)
 
     # Relation avec la table 'spots'
@@ -74,43 +79,173 @@ class Car(Base):
             "spot": self.spot.id if self.spot else None
         }
     
-    def park(self, spot: 'Spot') -> 'Car':
+    def park(self, spot: 'Spot', bump: bool = True) -> 'Car':
         """
         Gare la voiture dans une place de parking.
 
+        La place est prise par une mise à jour conditionnelle : elle n'aboutit
+        que si la place est libre et que la voiture n'est garée nulle part, ce
+        qui rend les stationnements simultanés sûrs sans verrou global.
+
         Paramètres :
         - spot (Spot) : Place de parking où garer la voiture.
+        - bump (bool, optionnel) : Incrémente la version du parking. False si
+          l'appelant l'incrémente une seule fois pour plusieurs changements
+          (voir `Parking.apply_operations`).
 
         Sortie :
         - Car : Voiture garée.
+
+        Exceptions :
+        - ParkingError : CAR_ALREADY_PARKED ou SPOT_ALREADY_TAKEN.
         """
-        # Associe la voiture à la place de parking et marque la place comme prise
-        self.spot = spot
-        spot.car = self
-        spot.is_taken = True
+        from classes.spot import Spot
 
-        # Sauvegarde les modifications dans la base de données
+        # La voiture et la place doivent exister en base avant la mise à jour conditionnelle
+        session.add(spot)
         self.save(session)
 
+        parked_at = history.utcnow()
+        parked_elsewhere = exists().where(Spot.car_id == self.id)
+        taken = session.execute(
+            update(Spot)
+            .where(Spot.id == spot.id, Spot.is_taken == False, Spot.car_id.is_(None), ~parked_elsewhere)
+            .values(is_taken=True, car_id=self.id, parked_at=parked_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        if taken != 1:
+            # La cause de l'échec n'est lue qu'en cas de conflit
+            if session.query(parked_elsewhere).scalar():
+                raise ParkingError("CAR_ALREADY_PARKED")
+            raise ParkingError("SPOT_ALREADY_TAKEN")
+
+        # Les objets en mémoire reflètent la mise à jour, sans nouvelle écriture
+        set_committed_value(spot, 'is_taken', True)
+        set_committed_value(spot, 'car_id', self.id)
+        set_committed_value(spot, 'parked_at', parked_at)
+        set_committed_value(spot, 'car', self)
+        set_committed_value(self, 'spot', spot)
+
+        # L'abonnement n'est chargé que si l'index indique une place réservée
+        is_bad_parked = spot.parking.occupancy.is_reserved(spot.level, spot.spot) and bool(self.is_bad_parked())
+
+        if bump:
+            spot.parking.bump_version(session)
+
+        # Met à jour l'index d'occupation du parking et notifie ses abonnés une fois la transaction validée
+        after_commit(occupancy.update_spot, spot.parking_id, spot.level, spot.spot, is_taken=True, is_bad_parked=is_bad_parked, session=session)
+        after_commit(events.publish, spot.parking_id, "park", {
+            "spot": spot.id,
+            "level": spot.level,
+            "car": self.id,
+            "license_plate": self.license_plate
+        }, session=session)
+
         return self
     
-    def unpark(self) -> 'Car':
+    def unpark(self, bump: bool = True) -> 'Car':
         """
         Désactive la place de parking de la voiture.
 
+        Comme pour `park`, la place est libérée par une mise à jour
+        conditionnelle, qui n'aboutit que si la voiture y est toujours garée.
+        Le stationnement terminé est ajouté à l'historique dans la même
+        transaction (voir `history.record`).
+
+        Paramètres :
+        - bump (bool, optionnel) : Incrémente la version du parking (voir `park`).
+
         Sortie :
         - Car : Voiture désactivée.
+
+        Exceptions :
+        - ParkingError : SPOT_NOT_TAKEN si la voiture n'est pas (ou plus) garée.
         """
-        # Libère la place de parking et dissocie la voiture de la place
-        self.spot.is_taken = False
-        self.spot.car = None
-        self.spot = None
+        from classes.spot import Spot
 
-        # Sauvegarde les modifications dans la base de données
-        self.save(session)
+        spot = self.spot
+        if spot is None:
+            raise ParkingError("SPOT_NOT_TAKEN")
+
+        # `parked_at` n'est pas modifié : la mise à jour renvoie l'arrivée de la voiture
+        released = session.execute(
+            update(Spot)
+            .where(Spot.id == spot.id, Spot.car_id == self.id, Spot.is_taken == True)
+            .values(is_taken=False, car_id=None)
+            .returning(Spot.parked_at)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if released is None:
+            raise ParkingError("SPOT_NOT_TAKEN")
+
+        history.record(session, self.id, spot.id, spot.parking_id, released.parked_at, history.utcnow())
+
+        # Les objets en mémoire reflètent la mise à jour, sans nouvelle écriture
+        set_committed_value(spot, 'is_taken', False)
+        set_committed_value(spot, 'car_id', None)
+        set_committed_value(spot, 'car', None)
+        set_committed_value(self, 'spot', None)
+
+        if bump:
+            spot.parking.bump_version(session)
+
+        # Met à jour l'index d'occupation du parking et notifie ses abonnés une fois la transaction validée
+        after_commit(occupancy.update_spot, spot.parking_id, spot.level, spot.spot, is_taken=False, is_bad_parked=False, session=session)
+        after_commit(events.publish, spot.parking_id, "unpark", {
+            "spot": spot.id,
+            "level": spot.level,
+            "car": self.id
+        }, session=session)
 
         return self
     
+    def history(
+            self,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            limit: int = 50,
+            cursor: Optional[str] = None
+        ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Stationnements terminés de la voiture, du plus récent au plus ancien.
+
+        Paramètres :
+        - start (datetime) OPTIONNEL : Début de la période (UTC).
+        - end (datetime) OPTIONNEL : Fin de la période (UTC).
+        - limit (int, optionnel) : Nombre de stationnements par page.
+        - cursor (str) OPTIONNEL : Curseur renvoyé avec la page précédente.
+
+        Sortie :
+        - Tuple[List[dict], Optional[str]] : Stationnements et curseur de la page suivante (voir `history.search`).
+        """
+        return history.search(session, "car_id", self.id, start, end, limit, cursor)
+
+    @staticmethod
+    def plate_index() -> 'PlateIndex':
+        """
+        Index des plaques d'immatriculation, pour la recherche par préfixe et approchée.
+
+        Sortie :
+        - PlateIndex : Index des plaques du processus (voir `plates.get_index`).
+        """
+        return plates.get_index(Car.load_plates)
+
+    @staticmethod
+    def load_plates() -> List[str]:
+        """
+        Lecture des plaques de toutes les voitures.
+
+        La lecture utilise sa propre session : l'index peut être reconstruit
+        dans un autre thread que celui de la requête.
+
+        Sortie :
+        - List[str] : Plaques des voitures.
+        """
+        with SessionFactory() as db:
+            return db.scalars(select(Car.license_plate)).all()
+
     def is_bad_parked(self) -> bool:
         """
         Vérifie si la voiture est garée sur une place réservée.
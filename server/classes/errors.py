@@ -0,0 +1,11 @@
+class ParkingError(Exception):
+    """
+    Erreur levée lorsqu'une opération de stationnement est impossible
+    (place déjà occupée, voiture déjà garée...).
+
+    L'attribut `message` contient le code d'erreur renvoyé par l'API.
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
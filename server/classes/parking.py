@@ -1,25 +1,39 @@
 from classes.spot import Spot
-from utils.uuid import uuid_v4
-from typing import TYPE_CHECKING, List
-from sqlalchemy import Column, String, Integer
-from sqlalchemy.orm import relationship
-from utils.sqlalchemy import Base, Session as session
+from classes.errors import ParkingError
+from utils.uuid import uuid_v4, uuid_v4_batch, Identifier
+from utils import occupancy, history
+from utils.occupancy import OccupancyIndex
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import Column, String, Integer, inspect, select, or_
+from sqlalchemy.orm import relationship, object_session, selectinload
+from utils.sqlalchemy import Base, Session as session, after_commit
 
 # Importation conditionnelle pour éviter les problèmes de dépendances circulaires
 if TYPE_CHECKING:
-    from classes import Person, Subscription
+    from classes import Car, Person, Subscription
+    from sqlalchemy.orm.session import Session as SessionType
+
+# Nombre de places essayées par une attribution automatique, si d'autres requêtes les prennent entre-temps
+ASSIGN_ATTEMPTS = 8
+# Nombre maximal d'opérations d'un lot (voir `Parking.apply_operations`)
+BATCH_MAX_OPERATIONS = 500
+# Nombre de tags par requête de lecture de places (voir `Parking.get_spots_at`)
+SPOTS_LOOKUP_BATCH = 500
 
 class Parking(Base):
     __tablename__ = 'parkings'
     
     # Définition des colonnes de la table 'parkings'
-    id = Column(String, primary_key=True)
-    name = Column(String, nullable=False)
+    id = Column(Identifier, primary_key=True)
+    name = Column(String, nullable=False, unique=True, index=True)
     address = Column(String, nullable=False)
     zip_code = Column(String, nullable=False)
     city = Column(String, nullable=False)
     levels = Column(Integer, nullable=False)
     spots_per_level = Column(Integer, nullable=False)
+    # Incrémentée à chaque changement d'occupation ou d'abonnement (voir `bump_version`)
+    version = Column(Integer, nullable=False, default=0, server_default='0')
 
     # Définition des relations avec les tables 'Spot' et 'Subscription'
     spots = relationship('Spot', back_populates='parking', enable_typechecks=False, lazy=True)
@@ -32,7 +46,8 @@ class Parking(Base):
         zip_code: str,
         city: str,
         levels: int,
-        spots_per_level: int
+        spots_per_level: int,
+        create_spots: bool = True
         ) -> None:
         """
         Initialisation de la classe Parking.
@@ -44,6 +59,8 @@ class Parking(Base):
         - city (str) : Ville du parking.
         - levels (int) : Nombre d'étages du parking.
         - spots_per_level (int) : Nombre de places par étage du parking.
+        - create_spots (bool, optionnel) : Création des objets Spot du parking.
+          Utiliser `Parking.create` pour insérer les places par lots.
         """
 
         # Génération d'un identifiant unique pour le parking
@@ -54,16 +71,98 @@ class Parking(Base):
         self.city = city
         self.levels = levels
         self.spots_per_level = spots_per_level
+        self.version = 0
 
         # Création des objets Spot pour chaque place de parking
-        self.spots: List['Spot'] = [
-            Spot(level, spot, self)
-            for level in range(levels)
-            for spot in range(spots_per_level)
-        ]
+        if create_spots:
+            self.spots: List['Spot'] = [
+                Spot(level, spot, self)
+                for level in range(levels)
+                for spot in range(spots_per_level)
+            ]
         # Initialisation de la liste des abonnements
         self.subscriptions: List['Subscription'] = []
 
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        address: str,
+        zip_code: str,
+        city: str,
+        levels: int,
+        spots_per_level: int,
+        batch_size: int = 5000
+        ) -> 'Parking':
+        """
+        Création d'un parking et insertion de ses places par lots.
+
+        Les places ne sont pas construites comme objets Spot : leurs lignes sont
+        générées par lots et insérées avec un `executemany`, dans la même
+        transaction que le parking. La transaction n'est pas validée.
+
+        Paramètres :
+        - name (str) : Nom du parking.
+        - address (str) : Adresse du parking.
+        - zip_code (str) : Code postal du parking.
+        - city (str) : Ville du parking.
+        - levels (int) : Nombre d'étages du parking.
+        - spots_per_level (int) : Nombre de places par étage du parking.
+        - batch_size (int, optionnel) : Nombre de places insérées par lot.
+
+        Sortie :
+        - Parking : Parking créé.
+        """
+        parking = cls(name, address, zip_code, city, levels, spots_per_level, create_spots=False)
+        session.add(parking)
+        session.flush()
+
+        for rows in parking.generate_spot_rows(batch_size):
+            session.execute(Spot.__table__.insert(), rows)
+
+        # La relation sera rechargée depuis la base de données au prochain accès
+        session.expire(parking, ['spots'])
+
+        # Toutes les places d'un nouveau parking sont libres
+        after_commit(occupancy.register_index, parking.id, OccupancyIndex(levels, spots_per_level), session=session)
+
+        return parking
+
+    def generate_spot_rows(self, batch_size: int) -> Iterator[List[dict]]:
+        """
+        Génère les lignes de la table 'spots' du parking, par lots.
+
+        Paramètres :
+        - batch_size (int) : Nombre de lignes par lot.
+
+        Sortie :
+        - Iterator[List[dict]] : Lots de lignes à insérer.
+        """
+        # Les numéros de place formatés (voir `Spot.make_tag`) sont communs à tous les étages
+        width = len(str(self.spots_per_level))
+        numbers = [str(spot).zfill(width) for spot in range(self.spots_per_level)]
+        positions = [
+            (level, spot)
+            for level in range(self.levels)
+            for spot in range(self.spots_per_level)
+        ]
+
+        for start in range(0, len(positions), batch_size):
+            batch = positions[start:start + batch_size]
+            yield [
+                {
+                    "id": spot_id,
+                    "level": level,
+                    "spot": spot,
+                    "tag": f"{level}{numbers[spot]}",
+                    "is_taken": False,
+                    "parked_at": None,
+                    "parking_id": self.id,
+                    "car_id": None
+                }
+                for spot_id, (level, spot) in zip(uuid_v4_batch(len(batch)), batch)
+            ]
+
     def to_dict(self) -> dict:
         """
         Convertit l'objet en dictionnaire.
@@ -83,6 +182,62 @@ class Parking(Base):
             "subscriptions": [subscription.id for subscription in self.subscriptions]
         }
     
+    def delete(self, session: 'SessionType' = None) -> None:
+        """
+        Suppression du parking, de ses places et de ses abonnements.
+
+        La suppression est faite par requêtes ensemblistes dans la transaction
+        en cours, qui n'est pas validée : les voitures garées sont libérées avec la suppression des
+        places (le lien voiture/place est porté par `spots.car_id`), et leurs
+        stationnements ajoutés à l'historique, terminés à la date de la suppression.
+
+        Paramètres :
+        - session (SessionType, optionnel) : Session de la base de données.
+          Si aucune session n'est fournie, la session du parking est utilisée.
+        """
+        from classes.subscription import Subscription
+
+        if session is None:
+            session = object_session(self)
+
+        parking_id = self.id
+        spot_ids = select(Spot.id).where(Spot.parking_id == parking_id)
+
+        left_at = history.utcnow()
+        for spot_id, car_id, parked_at in session.execute(
+            select(Spot.id, Spot.car_id, Spot.parked_at)
+            .where(Spot.parking_id == parking_id, Spot.car_id.is_not(None))
+        ):
+            history.record(session, car_id, spot_id, parking_id, parked_at, left_at)
+
+        session.query(Subscription).filter(
+            or_(Subscription.parking_id == parking_id, Subscription.spot_id.in_(spot_ids))
+        ).delete(synchronize_session=False)
+        session.query(Spot).filter(Spot.parking_id == parking_id).delete(synchronize_session=False)
+        session.query(Parking).filter(Parking.id == parking_id).delete(synchronize_session=False)
+
+        after_commit(occupancy.drop_index, parking_id, session=session)
+
+    def bump_version(self, session: 'SessionType' = None, steps: int = 1) -> None:
+        """
+        Incrémentation de la version du parking dans la transaction en cours.
+
+        L'incrémentation est faite en SQL (`version = version + 1`) pour ne pas
+        perdre de changement entre deux requêtes concurrentes. L'attribut
+        `version` de l'objet n'est pas mis à jour avant la validation.
+
+        Paramètres :
+        - session (SessionType, optionnel) : Session de la base de données.
+          Si aucune session n'est fournie, la session du parking est utilisée.
+        - steps (int, optionnel) : Nombre de changements, un par appel à `occupancy.update_spot`.
+        """
+        if session is None:
+            session = object_session(self)
+
+        session.query(Parking).filter(Parking.id == self.id).update(
+            {Parking.version: Parking.version + steps}, synchronize_session=False
+        )
+
     def get_spots_by_level(self, level: int) -> List['Spot']:
         """
         Récupère les places d'un étage donné.
@@ -95,6 +250,90 @@ class Parking(Base):
         """
         return [spot for spot in self.spots if spot.level == int(level)]
     
+    @property
+    def occupancy(self) -> OccupancyIndex:
+        """
+        Index d'occupation du parking.
+
+        Pour un parking persisté, l'index est construit une seule fois à partir
+        d'une requête sur les colonnes des places, puis tenu à jour par
+        `Car.park`, `Car.unpark` et la création/suppression des abonnements.
+        Il est reconstruit si sa version diffère de celle du parking, par
+        exemple après un changement fait par un autre processus.
+
+        Sortie :
+        - OccupancyIndex : Index d'occupation du parking.
+        """
+        # Un parking non persisté n'a pas de lignes en base : l'index est calculé à partir des objets en mémoire
+        if inspect(self).transient:
+            index = OccupancyIndex(self.levels, self.spots_per_level)
+            for spot in self.spots:
+                index.set_taken(spot.level, spot.spot, spot.is_taken)
+                index.set_reserved(spot.level, spot.spot, spot.subscription is not None)
+                index.set_bad_parked(spot.level, spot.spot, bool(spot.car and spot.car.is_bad_parked()))
+            return index
+
+        index = occupancy.get_index(self.id)
+        if index is None or index.version != self.version:
+            from classes.subscription import Subscription
+            from classes.car import Car
+
+            index = OccupancyIndex(self.levels, self.spots_per_level, self.version)
+            rows = (
+                session.query(Spot.level, Spot.spot, Spot.is_taken, Subscription.person_id, Car.owner_id)
+                .outerjoin(Subscription, Subscription.spot_id == Spot.id)
+                .outerjoin(Car, Car.id == Spot.car_id)
+                .filter(Spot.parking_id == self.id)
+            )
+            for level, spot, is_taken, subscriber_id, owner_id in rows:
+                index.set_taken(level, spot, is_taken)
+                index.set_reserved(level, spot, subscriber_id is not None)
+                index.set_bad_parked(level, spot, bool(is_taken and subscriber_id is not None and owner_id is not None and subscriber_id != owner_id))
+            index = occupancy.register_index(self.id, index)
+
+        return index
+
+    def get_spot(self, level: int, spot: int) -> Optional['Spot']:
+        """
+        Récupère une place à partir de son étage et de son numéro.
+
+        Paramètres :
+        - level (int) : Numéro de l'étage.
+        - spot (int) : Numéro de la place.
+
+        Sortie :
+        - Spot : Place correspondante, None si elle n'existe pas.
+        """
+        if inspect(self).transient:
+            return next((s for s in self.spots if s.level == level and s.spot == spot), None)
+        # Recherche par tag, couverte par l'index unique (parking_id, tag)
+        return session.query(Spot).filter_by(parking_id=self.id, tag=Spot.make_tag(level, spot, self.spots_per_level)).first()
+
+    def get_spots_at(self, positions: List[Tuple[int, int]]) -> List['Spot']:
+        """
+        Récupère les places à partir de leurs étages et numéros, sans charger
+        les autres places du parking.
+
+        Paramètres :
+        - positions (List[Tuple[int, int]]) : Étage et numéro de chaque place.
+
+        Sortie :
+        - List[Spot] : Places correspondantes, triées par tag.
+        """
+        if inspect(self).transient:
+            wanted = set(positions)
+            return sorted((s for s in self.spots if (s.level, s.spot) in wanted), key=lambda s: s.tag)
+
+        # Recherche par tag, couverte par l'index unique (parking_id, tag), par lots
+        # pour rester sous la limite de paramètres d'une requête
+        tags = sorted(Spot.make_tag(level, spot, self.spots_per_level) for level, spot in positions)
+        spots: List['Spot'] = []
+        for start in range(0, len(tags), SPOTS_LOOKUP_BATCH):
+            spots += session.query(Spot).filter(
+                Spot.parking_id == self.id, Spot.tag.in_(tags[start:start + SPOTS_LOOKUP_BATCH])
+            ).order_by(Spot.tag).all()
+        return spots
+
     def get_available_spot(self) -> 'Spot':
         """
         Récupère une place de parking disponible.
@@ -102,22 +341,254 @@ class Parking(Base):
         Sortie :
         - Spot : Place de parking disponible.
         """
-        return next((spot for spot in self.spots if not spot.is_taken and not spot.subscription), None)
+        position = self.occupancy.first_free()
+        return self.get_spot(*position) if position else None
     
-    def get_available_spots(self) -> List['Spot']:
+    def assign_spot(
+            self,
+            car: 'Car',
+            policy: str = "lowest_level",
+            entrance: Optional[str] = None,
+            exclude: Optional[Dict[int, int]] = None,
+            bump: bool = True
+        ) -> 'Spot':
+        """
+        Gare une voiture sur une place libre choisie selon une politique d'attribution.
+
+        La place est choisie dans l'index d'occupation (voir `OccupancyIndex.find_free`),
+        sans parcourir les places. Si une autre requête prend la place entre le
+        choix et la mise à jour conditionnelle, une autre place est choisie. Si
+        la place n'existe plus en base (index périmé), l'index est reconstruit
+        et une autre place est choisie.
+
+        Paramètres :
+        - car (Car) : Voiture à garer.
+        - policy (str, optionnel) : Politique d'attribution (voir `occupancy.POLICIES`).
+        - entrance (str) OPTIONNEL : Tag de la place d'entrée, pour la politique "nearest_entrance".
+        - exclude (Dict[int, int]) OPTIONNEL : Bitsets des places à ignorer, par étage,
+          complétés par les places prises entre-temps.
+        - bump (bool, optionnel) : Incrémente la version du parking (voir `Car.park`).
+
+        Sortie :
+        - Spot : Place attribuée.
+
+        Exceptions :
+        - ParkingError : INVALID_POLICY, INVALID_ENTRANCE, PARKING_FULL si aucune
+          place n'est libre, ou l'erreur de `Car.park`.
+        """
+        if policy not in occupancy.POLICIES:
+            raise ParkingError("INVALID_POLICY")
+
+        start = None
+        if entrance is not None:
+            start = Spot.parse_tag(entrance, self.spots_per_level)
+            if start is None or start[0] >= self.levels:
+                raise ParkingError("INVALID_ENTRANCE")
+
+        index = self.occupancy
+        exclude = {} if exclude is None else exclude
+
+        for _ in range(ASSIGN_ATTEMPTS):
+            position = index.find_free(policy, start, exclude)
+            if position is None:
+                break
+            level, number = position
+            spot = self.get_spot(level, number)
+            if spot is None:
+                # Place supprimée sans changement de version : l'index est reconstruit, et la place ignorée
+                occupancy.drop_index(self.id)
+                index = self.occupancy
+                exclude[level] = exclude.get(level, 0) | (1 << number)
+                continue
+            try:
+                car.park(spot, bump)
+                return spot
+            except ParkingError as error:
+                if error.message != "SPOT_ALREADY_TAKEN":
+                    raise
+                # Place prise entre-temps : elle est ignorée pour le choix suivant
+                exclude[level] = exclude.get(level, 0) | (1 << number)
+
+        raise ParkingError("PARKING_FULL")
+
+    @staticmethod
+    def is_valid_operation(operation: Any) -> bool:
         """
-        Récupère les places de parking disponibles.
+        Vérifie la forme d'une opération de `apply_operations`.
+
+        Paramètres :
+        - operation (Any) : Opération reçue du client.
 
         Sortie :
-        - List[Spot] : Liste des places de parking disponibles.
+        - bool : True si l'opération est un dictionnaire dont la plaque et la
+          place sont des chaînes (ou absentes), False sinon.
+        """
+        return isinstance(operation, dict) and all(
+            isinstance(operation.get(key), (str, type(None))) for key in ("license_plate", "spot")
+        )
+
+    def apply_operations(self, operations: List[dict]) -> List[dict]:
         """
-        return [spot for spot in self.spots if not spot.is_taken and not spot.subscription]
+        Applique une série de stationnements et de départs dans la transaction en cours.
+
+        Les voitures et les places de toutes les opérations sont chargées en deux
+        requêtes, puis les opérations sont appliquées dans l'ordre, chacune par la
+        mise à jour conditionnelle de `Car.park` ou `Car.unpark`. La version du
+        parking n'est incrémentée qu'une fois. Une opération impossible n'écrit
+        rien et n'empêche pas les suivantes.
+
+        Chaque opération est un dictionnaire :
+        - action (str) : "park" ou "unpark".
+        - license_plate (str) : Plaque de la voiture (obligatoire pour "park").
+        - spot (str) OPTIONNEL : Identifiant de la place. Sans place, "park" en
+          choisit une (voir `assign_spot`, avec `policy` et `entrance`) et
+          "unpark" libère la place de la voiture. Avec une place et une plaque,
+          "unpark" échoue (CAR_NOT_ON_SPOT) si une autre voiture occupe la place.
+
+        Paramètres :
+        - operations (List[dict]) : Opérations à appliquer.
+
+        Sortie :
+        - List[dict] : Résultat de chaque opération, avec la place concernée ou le code d'erreur.
+        """
+        from classes.car import Car
+
+        valid = [Parking.is_valid_operation(operation) for operation in operations]
+        plates = {operation.get("license_plate") for operation, ok in zip(operations, valid) if ok} - {None}
+        spot_ids = {operation.get("spot") for operation, ok in zip(operations, valid) if ok} - {None}
+
+        cars = {car.license_plate: car for car in session.scalars(
+            select(Car).where(Car.license_plate.in_(plates)).options(selectinload(Car.spot))
+        )} if plates else {}
+        spots = {spot.id: spot for spot in session.scalars(
+            select(Spot).where(Spot.parking_id == self.id, Spot.id.in_(spot_ids))
+            .options(selectinload(Spot.car), selectinload(Spot.subscription))
+        )} if spot_ids else {}
+
+        results = []
+        exclude = {}  # Places prises par les opérations précédentes, pas encore dans l'index
+        applied = 0
+
+        for operation, ok in zip(operations, valid):
+            try:
+                if not ok:
+                    raise ParkingError("INVALID_OPERATION")
+                action = operation.get("action")
+
+                if action == "park":
+                    car = cars.get(operation.get("license_plate"))
+                    if car is None:
+                        raise ParkingError("CAR_NOT_FOUND")
+                    if operation.get("spot") is None:
+                        spot = self.assign_spot(car, operation.get("policy", "lowest_level"), operation.get("entrance"), exclude, bump=False)
+                    else:
+                        spot = spots.get(operation.get("spot"))
+                        if spot is None:
+                            raise ParkingError("SPOT_NOT_FOUND")
+                        car.park(spot, bump=False)
+                    exclude[spot.level] = exclude.get(spot.level, 0) | (1 << spot.spot)
+
+                elif action == "unpark":
+                    if operation.get("spot") is None:
+                        car = cars.get(operation.get("license_plate"))
+                        if car is None:
+                            raise ParkingError("CAR_NOT_FOUND")
+                        spot = car.spot
+                        if spot is None or spot.parking_id != self.id:
+                            raise ParkingError("SPOT_NOT_TAKEN")
+                    else:
+                        spot = spots.get(operation.get("spot"))
+                        if spot is None:
+                            raise ParkingError("SPOT_NOT_FOUND")
+                        car = spot.car
+                        if car is None:
+                            raise ParkingError("SPOT_NOT_TAKEN")
+                        # Une plaque fournie doit être celle de la voiture garée sur la place
+                        plate = operation.get("license_plate")
+                        if plate is not None and plate != car.license_plate:
+                            raise ParkingError("CAR_NOT_ON_SPOT")
+                    car.unpark(bump=False)
+
+                else:
+                    raise ParkingError("INVALID_ACTION")
+
+            except ParkingError as error:
+                results.append({"status": "error", "message": error.message})
+                continue
+
+            applied += 1
+            results.append({
+                "status": "success",
+                "action": action,
+                "license_plate": car.license_plate,
+                "spot": {
+                    "id": spot.id,
+                    "level": spot.level,
+                    "tag": spot.tag
+                }
+            })
+
+        if applied:
+            self.bump_version(session, applied)
+
+        return results
+
+    def get_available_spots(self, level: Optional[int] = None) -> List['Spot']:
+        """
+        Récupère les places de parking disponibles : seules les places libres
+        d'après l'index d'occupation sont lues.
+
+        Paramètres :
+        - level (int) OPTIONNEL : Numéro de l'étage.
+
+        Sortie :
+        - List[Spot] : Liste des places de parking disponibles, triées par tag.
+        """
+        return self.get_spots_at(self.occupancy.free_spots(level))
+
+    def count_available_spots(self, level: Optional[int] = None) -> int:
+        """
+        Compte les places de parking disponibles, sans charger les places.
+
+        Paramètres :
+        - level (int) OPTIONNEL : Numéro de l'étage.
+
+        Sortie :
+        - int : Nombre de places de parking disponibles.
+        """
+        return self.occupancy.free_count(level)
     
-    def get_reserved_spots(self) -> List['Spot']:
+    def get_reserved_spots(self, level: Optional[int] = None) -> List['Spot']:
+        """
+        Récupère les places de parking réservées : seules les places réservées
+        d'après l'index d'occupation sont lues.
+
+        Paramètres :
+        - level (int) OPTIONNEL : Numéro de l'étage.
+
+        Sortie :
+        - List[Spot] : Liste des places de parking réservées, triées par tag.
         """
-        Récupère les places de parking réservées.
+        return self.get_spots_at(self.occupancy.reserved_spots(level))
+
+    def history(
+            self,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            limit: int = 50,
+            cursor: Optional[str] = None
+        ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Stationnements terminés du parking qui chevauchent une période, du départ
+        le plus récent au plus ancien.
+
+        Paramètres :
+        - start (datetime) OPTIONNEL : Début de la période (UTC).
+        - end (datetime) OPTIONNEL : Fin de la période (UTC).
+        - limit (int, optionnel) : Nombre de stationnements par page.
+        - cursor (str) OPTIONNEL : Curseur renvoyé avec la page précédente.
 
         Sortie :
-        - List[Spot] : Liste des places de parking réservées.
+        - Tuple[List[dict], Optional[str]] : Stationnements et curseur de la page suivante (voir `history.search`).
         """
-        return [spot for spot in self.spots if spot.subscription]
\ No newline at end of file
+        return history.search(session, "parking_id", self.id, start, end, limit, cursor)
@@ -1,18 +1,20 @@
-from utils.uuid import uuid_v4
-from typing import TYPE_CHECKING, List
-from sqlalchemy import Column, String
+from utils.uuid import uuid_v4, Identifier
+from utils import occupancy, events, names
+from typing import TYPE_CHECKING, List, Tuple
+from sqlalchemy import Column, String, select
 from sqlalchemy.orm import relationship
-from utils.sqlalchemy import Base, Session as session
+from utils.sqlalchemy import Base, Session as session, SessionFactory, after_commit
 
 # Importation conditionnelle pour éviter les problèmes de dépendances circulaires
 if TYPE_CHECKING:
     from classes import Car, Subscription, Parking
+    from utils.names import NameIndex
 
 class Person(Base):
     __tablename__ = 'persons'
     
     # Définition des colonnes de la table 'persons'
-    id = Column(String, primary_key=True)
+    id = Column(Identifier, primary_key=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     birth_date = Column(String, nullable=False)
@@ -62,6 +64,30 @@ class Person(Base):
             "subscriptions": [subscription.id for subscription in self.subscriptions]
         }
     
+    @staticmethod
+    def name_index() -> 'NameIndex':
+        """
+        Index des noms des personnes, pour la recherche à la saisie.
+
+        Sortie :
+        - NameIndex : Index des noms du processus (voir `names.get_index`).
+        """
+        return names.get_index(Person.load_names)
+
+    @staticmethod
+    def load_names() -> List[Tuple[str, str, str, str]]:
+        """
+        Lecture de l'identifiant, du prénom, du nom et de la date de naissance de toutes les personnes.
+
+        La lecture utilise sa propre session : l'index peut être reconstruit
+        dans un autre thread que celui de la requête.
+
+        Sortie :
+        - List[Tuple[str, str, str, str]] : Champs indexés des personnes.
+        """
+        with SessionFactory() as db:
+            return db.execute(select(Person.id, Person.first_name, Person.last_name, Person.birth_date)).all()
+
     def subscribe(self, parking: 'Parking'):
         """
         Abonne une personne à un parking.
@@ -73,24 +99,27 @@ class Person(Base):
         from classes.subscription import Subscription
         
         # Vérifie s'il y a une place disponible dans le parking
-        if parking.get_available_spot():
-            spot = parking.get_available_spot()
-            # Crée un nouvel abonnement
+        spot = parking.get_available_spot()
+        if spot:
+            # Crée un nouvel abonnement, ajouté aux abonnements de la personne, du
+            # parking et de la place par les relations bidirectionnelles
             subscription = Subscription(
                 person=self,
                 parking=parking,
                 spot=spot
             )
-            # Associe l'abonnement à la place de parking
-            spot.subscription = subscription
-            # Ajoute l'abonnement à la liste des abonnements de la personne et du parking
-            self.subscriptions.append(subscription)
-            parking.subscriptions.append(subscription)
-
-            # Sauvegarde les modifications dans la base de données
-            self.save(session)
-            parking.save(session)
+
+            # Enregistre l'abonnement dans la transaction en cours (la personne,
+            # le parking et la place suivent par cascade)
             subscription.save(session)
-            spot.save(session)
+            parking.bump_version(session)
+
+            # Met à jour l'index d'occupation du parking et notifie ses abonnés une fois la transaction validée
+            after_commit(occupancy.update_spot, spot.parking_id, spot.level, spot.spot, is_reserved=True, session=session)
+            after_commit(events.publish, spot.parking_id, "subscribe", {
+                "spot": spot.id,
+                "level": spot.level,
+                "subscription": subscription.id
+            }, session=session)
             
             return subscription
\ No newline at end of file
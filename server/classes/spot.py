@@ -1,6 +1,8 @@
-from utils.uuid import uuid_v4
+from utils.uuid import uuid_v4, Identifier
+from utils import history
+from datetime import datetime
 from typing import TYPE_CHECKING, Optional
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from utils.sqlalchemy import Base
 
@@ -11,20 +13,27 @@ if TYPE_CHECKING:
 # Définition de la classe Spot qui hérite de Base (SQLAlchemy)
 class Spot(Base):
     __tablename__ = 'spots'  # Nom de la table dans la base de données
+    __table_args__ = (
+        # Un tag est unique dans un parking ; l'index sert aussi aux recherches par parking
+        Index('ix_spots_parking_id_tag', 'parking_id', 'tag', unique=True),
+        # Une voiture n'est garée que sur une seule place, même avec des stationnements simultanés
+        Index('ix_spots_car_id_unique', 'car_id', unique=True),
+    )
     
     # Définition des colonnes de la table
-    id = Column(String, primary_key=True)  # Identifiant unique de la place
+    id = Column(Identifier, primary_key=True)  # Identifiant unique de la place
     level = Column(Integer, nullable=False)  # Niveau de l'étage où se trouve la place
     spot = Column(Integer, nullable=False)  # Numéro de la place
     tag = Column(String, nullable=False)  # Tag unique de la place
     is_taken = Column(Boolean, nullable=False)  # Indicateur si la place est occupée
+    parked_at = Column(DateTime)  # Arrivée (UTC) de la voiture garée, ou de la dernière voiture garée sur la place
 
     # Clé étrangère et relation avec la table Parking
-    parking_id = Column(String, ForeignKey('parkings.id'))
+    parking_id = Column(Identifier, ForeignKey('parkings.id'))
     parking = relationship('Parking', back_populates='spots', uselist=False, enable_typechecks=False, lazy=True)
 
     # Clé étrangère et relation avec la table Car
-    car_id = Column(String, ForeignKey('cars.id'))
+    car_id = Column(Identifier, ForeignKey('cars.id'))
     car = relationship('Car', back_populates='spot', uselist=False, enable_typechecks=False, foreign_keys=[car_id], lazy=True)
 
     # Relation avec la table Subscription
@@ -50,15 +59,56 @@ class Spot(Base):
         self.spot = spot  # Affectation du numéro de la place
         self.parking = parking  # Affectation du parking
         # Création du tag unique basé sur le niveau et le numéro de la place
-        self.tag: str = f"{level}{str(spot).zfill(len(str(parking.spots_per_level)))}"
+        self.tag: str = Spot.make_tag(level, spot, parking.spots_per_level)
         self.is_taken: bool = False  # Initialisation de l'indicateur de place occupée
+        self.parked_at: Optional[datetime] = None  # Aucune voiture garée pour l'instant
         self.car: Optional['Car'] = None  # Initialisation de la relation avec une voiture
         self.subscription: Optional['Subscription'] = None  # Initialisation de la relation avec un abonnement
 
+    @staticmethod
+    def make_tag(level: int, spot: int, spots_per_level: int) -> str:
+        """
+        Création du tag d'une place à partir de son étage et de son numéro.
+
+        Paramètres :
+        - level (int) : Niveau de l'étage où se trouve la place.
+        - spot (int) : Numéro de la place.
+        - spots_per_level (int) : Nombre de places par étage du parking.
+
+        Sortie :
+        - str : Tag de la place (ex : "105" pour la place 5 de l'étage 1 sur 30 places).
+        """
+        return f"{level}{str(spot).zfill(len(str(spots_per_level)))}"
+
+    @staticmethod
+    def parse_tag(tag: str, spots_per_level: int) -> Optional[tuple]:
+        """
+        Lecture de l'étage et du numéro d'une place à partir de son tag (inverse de `make_tag`).
+
+        Paramètres :
+        - tag (str) : Tag de la place.
+        - spots_per_level (int) : Nombre de places par étage du parking.
+
+        Sortie :
+        - tuple : Étage et numéro de la place, None si le tag est invalide.
+        """
+        width = len(str(spots_per_level))
+        tag = str(tag)
+        if len(tag) <= width or not tag.isdigit():
+            return None
+        level, spot = int(tag[:-width]), int(tag[-width:])
+        if spot >= spots_per_level:
+            return None
+        return level, spot
+
     def to_dict(self) -> dict:
         """
         Convertit l'objet en dictionnaire.
 
+        `parked_at` est l'arrivée (ISO 8601, UTC) de la voiture garée, None si
+        la place est libre ou si l'arrivée est inconnue (voiture garée avant
+        l'ajout de la colonne).
+
         Sortie :
         - dict : Dictionnaire contenant les informations de l'objet.
         """
@@ -71,6 +121,7 @@ class Spot(Base):
             "parking": self.parking.id,
             "tag": self.tag,
             "is_taken": self.is_taken,
+            "parked_at": history.format_time(self.parked_at) if self.is_taken else None,
             "car": self.car.id if self.car else None,
             "subscription": self.subscription.id if self.subscription else None
         }
\ No newline at end of file
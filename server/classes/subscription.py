@@ -1,6 +1,6 @@
-from utils.uuid import uuid_v4
+from utils.uuid import uuid_v4, Identifier
 from typing import TYPE_CHECKING
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, ForeignKey
 from sqlalchemy.orm import relationship
 from utils.sqlalchemy import Base
 from importlib import import_module
@@ -14,20 +14,20 @@ class Subscription(Base):
     __tablename__ = 'subscriptions'  # Nom de la table dans la base de données
     
     # Définition des colonnes de la table
-    id = Column(String, primary_key=True)  # Colonne ID, clé primaire
+    id = Column(Identifier, primary_key=True)  # Colonne ID, clé primaire
 
     # Clé étrangère vers la table persons
-    person_id = Column(String, ForeignKey('persons.id'))
+    person_id = Column(Identifier, ForeignKey('persons.id'), index=True)
     # Relation avec la classe Person
     person = relationship('Person', back_populates='subscriptions', enable_typechecks=False, lazy=True)
 
     # Clé étrangère vers la table parkings
-    parking_id = Column(String, ForeignKey('parkings.id'))
+    parking_id = Column(Identifier, ForeignKey('parkings.id'), index=True)
     # Relation avec la classe Parking
     parking = relationship('Parking', back_populates='subscriptions', enable_typechecks=False, lazy=True)
 
     # Clé étrangère vers la table spots
-    spot_id = Column(String, ForeignKey('spots.id'))
+    spot_id = Column(Identifier, ForeignKey('spots.id'), index=True)
     # Relation avec la classe Spot
     spot = relationship('Spot', back_populates='subscription', enable_typechecks=False, foreign_keys=[spot_id], lazy=True)
     
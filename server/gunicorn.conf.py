@@ -0,0 +1,19 @@
+import os
+import multiprocessing
+
+# Configuration de gunicorn, surchargeable par variables d'environnement :
+# gunicorn -c gunicorn.conf.py server:server
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# Avec "gthread", chaque flux d'événements (/events) occupe un thread du worker ;
+# "gevent" (pip install gevent) permet d'en ouvrir plusieurs centaines par worker
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+def post_fork(server, worker):
+    """
+    Ferme les connexions héritées du processus parent (utile avec --preload).
+    """
+    from utils.sqlalchemy import engine
+    engine.dispose(close=False)
@@ -0,0 +1,460 @@
+import os
+import io
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+# Paliers de taille : profils de génération (voir scripts/seed.py), nommés par nombre de places
+TIERS: Dict[str, Dict[str, Any]] = {
+    "1k": {
+        "parkings": 2, "levels": (2, 2), "spots_per_level": (250, 250),
+        "persons": 600, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 250
+    },
+    "10k": {
+        "parkings": 5, "levels": (4, 4), "spots_per_level": (500, 500),
+        "persons": 6000, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 2500
+    },
+    "100k": {
+        "parkings": 20, "levels": (5, 5), "spots_per_level": (1000, 1000),
+        "persons": 60000, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 25000
+    }
+}
+
+# Nombre de mesures de la mémoire par route (tracemalloc ralentit l'exécution :
+# la mémoire est mesurée dans une passe séparée de celle des temps de réponse)
+MEMORY_SAMPLES = 3
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Percentile d'une série de mesures (méthode du rang le plus proche).
+
+    Paramètres :
+    - samples (List[float]) : Mesures.
+    - q (float) : Percentile, entre 0 et 1.
+
+    Sortie :
+    - float : Valeur du percentile.
+    """
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+class Recorder:
+    """
+    Exécution et mesure des requêtes d'une route.
+
+    Seules les requêtes passées par `timed` sont mesurées : les requêtes de
+    préparation (par exemple garer une voiture avant de mesurer `unpark`) sont
+    faites directement avec le client de test.
+    """
+
+    def __init__(self, client: Any, counter: List[int]) -> None:
+        """
+        Initialisation de l'enregistreur.
+
+        Paramètres :
+        - client (FlaskClient) : Client de test de l'application.
+        - counter (List[int]) : Compteur de requêtes SQL, incrémenté par le moteur.
+        """
+        self.client = client
+        self.counter = counter
+        self.memory = False
+        self.latencies: List[float] = []
+        self.statements: List[int] = []
+        self.peaks: List[int] = []
+        self.statuses: Dict[int, int] = {}
+
+    def timed(self, method: str, url: str, **kwargs: Any) -> Any:
+        """
+        Exécute et mesure une requête.
+
+        Paramètres :
+        - method (str) : Méthode HTTP.
+        - url (str) : URL de la requête.
+        - kwargs : Arguments du client de test (json, headers...).
+
+        Sortie :
+        - TestResponse : Réponse de l'application.
+        """
+        if self.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            response = self.client.open(url, method=method, **kwargs)
+            self.peaks.append(tracemalloc.get_traced_memory()[1] - base)
+            return response
+
+        self.counter[0] = 0
+        start = time.perf_counter()
+        response = self.client.open(url, method=method, **kwargs)
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        self.statements.append(self.counter[0])
+        self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+        return response
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Synthèse des mesures de la route.
+
+        Sortie :
+        - dict : Latences (ms), requêtes SQL, pic mémoire (Kio) et codes de retour.
+        """
+        return {
+            "samples": len(self.latencies),
+            "p50_ms": round(percentile(self.latencies, 0.50), 3),
+            "p99_ms": round(percentile(self.latencies, 0.99), 3),
+            "mean_ms": round(statistics.fmean(self.latencies), 3),
+            "max_ms": round(max(self.latencies), 3),
+            "statements": max(self.statements),
+            "peak_memory_kib": round(max(self.peaks) / 1024, 1) if self.peaks else None,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())}
+        }
+
+def benchmark_cases(ctx: Dict[str, Any]) -> Dict[str, Callable[[Any, Recorder, int], None]]:
+    """
+    Scénarios de mesure, un par route de `server.py`.
+
+    Chaque scénario remet la base de données dans son état initial (par exemple
+    `park` est suivi d'un `unpark` non mesuré), sauf la création de voitures et
+    de personnes, placées en dernier. Le flux d'événements
+    (`/api/parkings/<id>/events`) ne se termine pas et n'est pas mesuré.
+
+    Paramètres :
+    - ctx (dict) : Identifiants utilisés par les scénarios (voir `build_context`).
+
+    Sortie :
+    - dict : Scénarios, par route.
+    """
+    pid = ctx["parking_id"]
+    parking = f"/api/parkings/{pid}"
+
+    def etag(client: Any, url: str) -> Dict[str, str]:
+        return {"If-None-Match": client.get(url).headers["ETag"]}
+
+    def create_parking(client: Any, recorder: Recorder, i: int) -> None:
+        response = recorder.timed("POST", "/api/parkings/create", json=dict(ctx["new_parking"], name=f"Benchmark {i}"))
+        client.delete(f"/api/parkings/{response.get_json()['parking']['id']}")
+
+    def delete_parking(client: Any, recorder: Recorder, i: int) -> None:
+        response = client.post("/api/parkings/create", json=dict(ctx["new_parking"], name=f"Benchmark {i}"))
+        recorder.timed("DELETE", f"/api/parkings/{response.get_json()['parking']['id']}")
+
+    def park(client: Any, recorder: Recorder, i: int) -> None:
+        recorder.timed("POST", f"{parking}/spots/{ctx['free_spot_id']}/park", json={"license_plate": ctx["license_plate"]})
+        client.post(f"{parking}/spots/{ctx['free_spot_id']}/unpark")
+
+    def unpark(client: Any, recorder: Recorder, i: int) -> None:
+        client.post(f"{parking}/spots/{ctx['free_spot_id']}/park", json={"license_plate": ctx["license_plate"]})
+        recorder.timed("POST", f"{parking}/spots/{ctx['free_spot_id']}/unpark")
+
+    def assign(client: Any, recorder: Recorder, i: int) -> None:
+        response = recorder.timed("POST", f"{parking}/park", json={"license_plate": ctx["license_plate"]})
+        client.post(f"{parking}/spots/{response.get_json()['spot']['id']}/unpark")
+
+    # Arrivée puis départ de la même voiture : le lot laisse la base dans son état initial
+    operations = [
+        {"action": "park", "license_plate": ctx["license_plate"], "spot": ctx["free_spot_id"]},
+        {"action": "unpark", "license_plate": ctx["license_plate"]}
+    ]
+
+    def apply_operations(client: Any, recorder: Recorder, i: int) -> None:
+        recorder.timed("POST", f"{parking}/operations", json={"operations": operations})
+
+    def ingest(client: Any, recorder: Recorder, i: int) -> None:
+        # Réponse lue entièrement : les lots sont appliqués pendant la lecture des acquittements
+        recorder.timed(
+            "POST", f"{parking}/stream", buffered=True, content_type="application/x-ndjson",
+            data="".join(json.dumps(operation) + "\n" for operation in operations)
+        )
+
+    def subscribe(client: Any, recorder: Recorder, i: int) -> None:
+        response = recorder.timed("POST", f"{parking}/subscriptions/create", json={"owner": ctx["person_id"], "spot": ctx["free_spot_id"]})
+        client.post(f"{parking}/subscriptions/{response.get_json()['subscription']['id']}/delete")
+
+    def unsubscribe(client: Any, recorder: Recorder, i: int) -> None:
+        response = client.post(f"{parking}/subscriptions/create", json={"owner": ctx["person_id"], "spot": ctx["free_spot_id"]})
+        recorder.timed("POST", f"{parking}/subscriptions/{response.get_json()['subscription']['id']}/delete")
+
+    def create_car(client: Any, recorder: Recorder, i: int) -> None:
+        recorder.timed("POST", "/api/cars/create", json={
+            "license_plate": ctx["new_license_plates"][i],
+            "brand": "Renault", "model": "Clio", "color": "Blue",
+            "owner": ctx["person_id"]
+        })
+
+    def create_person(client: Any, recorder: Recorder, i: int) -> None:
+        recorder.timed("POST", "/api/persons/create", json={
+            "firstName": "Jean", "lastName": "Dupont", "birthDate": "1990-01-01T23:00:00.000Z"
+        })
+
+    def get(url: str, conditional: bool = False) -> Callable[[Any, Recorder, int], None]:
+        def case(client: Any, recorder: Recorder, i: int) -> None:
+            recorder.timed("GET", url, headers=etag(client, url) if conditional else None)
+        return case
+
+    return {
+        "GET /metrics": get("/metrics"),
+        "GET /api/parkings": get("/api/parkings"),
+        "GET /api/parkings?limit=50": get("/api/parkings?limit=50"),
+        "POST /api/parkings/create": create_parking,
+        "DELETE /api/parkings/<id>": delete_parking,
+        "GET /api/parkings/<id>": get(parking),
+        "GET /api/parkings/<id> (304)": get(parking, conditional=True),
+        "GET /api/parkings/<id>/spots": get(f"{parking}/spots"),
+        "GET /api/parkings/<id>/spots?level=0": get(f"{parking}/spots?level=0"),
+        "GET /api/parkings/<id>/spots (304)": get(f"{parking}/spots", conditional=True),
+        "GET /api/parkings/<id>/spots/available": get(f"{parking}/spots/available"),
+        "POST /api/parkings/<id>/spots/<id>/park": park,
+        "POST /api/parkings/<id>/spots/<id>/unpark": unpark,
+        "POST /api/parkings/<id>/park": assign,
+        "POST /api/parkings/<id>/operations": apply_operations,
+        "POST /api/parkings/<id>/stream": ingest,
+        "GET /api/parkings/<id>/subscriptions": get(f"{parking}/subscriptions"),
+        "POST /api/parkings/<id>/subscriptions/create": subscribe,
+        "POST /api/parkings/<id>/subscriptions/<id>/delete": unsubscribe,
+        "GET /api/parkings/<id>/statistics": get(f"{parking}/statistics"),
+        "GET /api/parkings/<id>/statistics (304)": get(f"{parking}/statistics", conditional=True),
+        "GET /api/parkings/<id>/history": get(f"{parking}/history"),
+        "GET /api/cars": get("/api/cars"),
+        "GET /api/cars?limit=50": get("/api/cars?limit=50"),
+        "GET /api/cars/search?mode=fuzzy": get(f"/api/cars/search?q={ctx['misread_license_plate']}"),
+        "GET /api/cars/search?mode=prefix": get(f"/api/cars/search?q={ctx['license_plate'][:3]}&mode=prefix"),
+        "GET /api/cars/<id>": get(f"/api/cars/{ctx['car_id']}"),
+        "GET /api/cars/<id>/history": get(f"/api/cars/{ctx['car_id']}/history"),
+        "GET /api/persons": get("/api/persons"),
+        "GET /api/persons?limit=50": get("/api/persons?limit=50"),
+        "GET /api/persons/search": get(f"/api/persons/search?q={ctx['person_name_prefix']}"),
+        "GET /api/persons/<id>": get(f"/api/persons/{ctx['person_id']}"),
+        "POST /api/cars/create": create_car,
+        "POST /api/persons/create": create_person
+    }
+
+def build_context(rows: Dict[str, List[dict]], count: int) -> Dict[str, Any]:
+    """
+    Choix des identifiants utilisés par les scénarios, à partir des lignes générées.
+
+    Le parking mesuré est le plus grand du palier.
+
+    Paramètres :
+    - rows (dict) : Lignes insérées, par table (voir `seed`).
+    - count (int) : Nombre maximal d'itérations par scénario.
+
+    Sortie :
+    - dict : Identifiants des scénarios.
+    """
+    parking = max(rows["parkings"], key=lambda parking: parking["levels"] * parking["spots_per_level"])
+    reserved = {subscription["spot_id"] for subscription in rows["subscriptions"]}
+    subscribed = {subscription["person_id"] for subscription in rows["subscriptions"]}
+    parked = {spot["car_id"] for spot in rows["spots"] if spot["car_id"]}
+
+    free_spot = next(
+        spot for spot in rows["spots"]
+        if spot["parking_id"] == parking["id"] and not spot["is_taken"] and spot["id"] not in reserved
+    )
+    car = next(car for car in rows["cars"] if car["id"] not in parked)
+    person = next(person for person in rows["persons"] if person["id"] not in subscribed)
+
+    # Plaques libres pour la création de voitures (format AA000AA)
+    existing = {car["license_plate"] for car in rows["cars"]}
+    new_license_plates = []
+    number = 0
+    while len(new_license_plates) < count:
+        plate = f"ZZ{number % 900 + 100}{chr(65 + number // 900 // 26 % 26)}{chr(65 + number // 900 % 26)}"
+        if plate not in existing:
+            new_license_plates.append(plate)
+        number += 1
+
+    return {
+        "parking_id": parking["id"],
+        "free_spot_id": free_spot["id"],
+        "license_plate": car["license_plate"],
+        # Plaque mal lue d'un caractère (recherche approchée)
+        "misread_license_plate": car["license_plate"][:3] + ("O" if car["license_plate"][3] == "0" else "0") + car["license_plate"][4:],
+        "car_id": car["id"],
+        "person_id": person["id"],
+        # Début du prénom et du nom (recherche à la saisie)
+        "person_name_prefix": f"{person['first_name'][:2]} {person['last_name'][:3]}",
+        "new_license_plates": new_license_plates,
+        "new_parking": {
+            "address": "1 Rue de la Gare", "zipCode": "75001", "city": "Paris",
+            "levels": 4, "spotsPerLevel": 250
+        }
+    }
+
+def run_tier(tier: str, repeat: int, budget: float, seed: int) -> Dict[str, Any]:
+    """
+    Seed la base de données d'un palier et mesure toutes les routes.
+
+    La base de données utilisée est celle de `DATABASE_URL`, qui doit être
+    définie avant l'appel (le moteur est créé à l'importation des modules).
+
+    Paramètres :
+    - tier (str) : Nom du palier.
+    - repeat (int) : Nombre maximal de mesures par route.
+    - budget (float) : Durée maximale des mesures d'une route, en secondes.
+    - seed (int) : Graine du générateur aléatoire.
+
+    Sortie :
+    - dict : Résultats du palier.
+    """
+    from sqlalchemy import event
+    from scripts.seed import reset_database, seed as seed_database
+    from utils.sqlalchemy import engine
+    from server import server
+
+    print(f"[?] Seeding tier {tier}")
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        reset_database()
+        rows = seed_database(TIERS[tier], seed)
+    seed_seconds = time.perf_counter() - start
+    print(f"[+] Tier {tier} seeded in {seed_seconds:.1f}s ({len(rows['spots'])} spots)\n")
+
+    counter = [0]
+    event.listen(engine, "before_cursor_execute", lambda *_: counter.__setitem__(0, counter[0] + 1))
+
+    client = server.test_client()
+    ctx = build_context(rows, repeat + MEMORY_SAMPLES + 1)
+    routes = {}
+
+    print(f"[?] Benchmarking tier {tier}")
+    for name, case in benchmark_cases(ctx).items():
+        recorder = Recorder(client, counter)
+
+        # Première exécution non mesurée (index d'occupation, caches de requêtes)
+        case(client, Recorder(client, counter), 0)
+
+        start = time.perf_counter()
+        for i in range(1, repeat + 1):
+            case(client, recorder, i)
+            if time.perf_counter() - start > budget:
+                break
+
+        recorder.memory = True
+        tracemalloc.start()
+        for i in range(repeat + 1, repeat + 1 + MEMORY_SAMPLES):
+            case(client, recorder, i)
+        tracemalloc.stop()
+
+        routes[name] = recorder.result()
+        print(f"    {name:<52} p50 {routes[name]['p50_ms']:>9.2f} ms  p99 {routes[name]['p99_ms']:>9.2f} ms  "
+              f"{routes[name]['statements']:>4} SQL  {routes[name]['peak_memory_kib']:>9.1f} KiB")
+    print(f"[+] Tier {tier} benchmarked\n")
+
+    return {
+        "spots": len(rows["spots"]),
+        "rows": {table: len(table_rows) for table, table_rows in rows.items()},
+        "seed_seconds": round(seed_seconds, 2),
+        "routes": routes
+    }
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare deux exécutions du benchmark.
+
+    Paramètres :
+    - previous (dict) : Résultats de référence.
+    - current (dict) : Résultats de l'exécution courante.
+    - threshold (float) : Augmentation relative de la latence p50 considérée comme une régression.
+
+    Sortie :
+    - List[str] : Routes en régression (latence p50 ou nombre de requêtes SQL), par palier.
+    """
+    regressions = []
+    for tier, results in current["tiers"].items():
+        reference = previous.get("tiers", {}).get(tier)
+        if reference is None:
+            continue
+
+        print(f"[?] Tier {tier} compared with the reference")
+        for name, route in results["routes"].items():
+            before = reference["routes"].get(name)
+            if before is None:
+                continue
+
+            ratio = route["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+            regressed = ratio > 1 + threshold or route["statements"] > before["statements"]
+            if regressed:
+                regressions.append(f"{tier} {name}")
+            print(f"    {'!' if regressed else ' '} {name:<52} p50 x{ratio:5.2f}  "
+                  f"SQL {before['statements']:>4} -> {route['statements']:<4}")
+        print()
+
+    return regressions
+
+def main() -> int:
+    """
+    Point d'entrée du benchmark : un sous-processus par palier, chacun avec sa propre base SQLite.
+
+    Sortie :
+    - int : Code de sortie (1 si des régressions ont été détectées).
+    """
+    parser = argparse.ArgumentParser(description="Mesure les performances des routes de l'API.")
+    parser.add_argument("--tiers", nargs="+", choices=TIERS, default=list(TIERS), help="Paliers à mesurer.")
+    parser.add_argument("--repeat", type=int, default=100, help="Nombre maximal de mesures par route.")
+    parser.add_argument("--budget", type=float, default=5.0, help="Durée maximale des mesures d'une route, en secondes.")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire.")
+    parser.add_argument("--output", default="benchmark.json", help="Fichier JSON des résultats.")
+    parser.add_argument("--compare", help="Fichier JSON de référence à comparer aux résultats.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Augmentation relative de la latence p50 tolérée.")
+    parser.add_argument("--run-tier", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Sous-processus : mesure d'un palier dans la base de données de DATABASE_URL
+    if args.run_tier:
+        result = run_tier(args.run_tier, args.repeat, args.budget, args.seed)
+        with open(args.result, "w") as file:
+            json.dump(result, file)
+        return 0
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "budget": args.budget,
+        "seed": args.seed,
+        "tiers": {}
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for tier in args.tiers:
+            database = os.path.join(directory, f"{tier}.db")
+            result = os.path.join(directory, f"{tier}.json")
+            subprocess.run(
+                [
+                    sys.executable, "-m", "scripts.benchmark",
+                    "--run-tier", tier, "--result", result,
+                    "--repeat", str(args.repeat), "--budget", str(args.budget), "--seed", str(args.seed)
+                ],
+                env=dict(os.environ, DATABASE_URL=f"sqlite:///{database}"),
+                check=True
+            )
+            with open(result) as file:
+                results["tiers"][tier] = json.load(file)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"[+] Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        if regressions:
+            print(f"[!] {len(regressions)} regression(s) detected")
+            return 1
+        print("[+] No regression detected")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,513 @@
+import sys
+import json
+import math
+import time
+import queue
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Journée simulée, en heures
+DAY_START = 6.0
+DAY_END = 22.0
+
+# Bornes des classes de l'histogramme des latences, en millisecondes
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+class Client:
+    """
+    Client HTTP de l'API, avec une connexion persistante (un client par thread).
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0) -> None:
+        """
+        Initialisation du client.
+
+        Paramètres :
+        - url (str) : URL du serveur (par exemple http://127.0.0.1:8000).
+        - timeout (float, optionnel) : Délai maximal d'une requête, en secondes.
+        """
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, data: Optional[dict] = None) -> Tuple[int, Dict[str, Any]]:
+        """
+        Envoie une requête à l'API.
+
+        La connexion est rouverte si le serveur l'a fermée.
+
+        Paramètres :
+        - method (str) : Méthode HTTP.
+        - path (str) : Chemin de la requête.
+        - data (dict) OPTIONNEL : Corps de la requête, encodé en JSON.
+
+        Sortie :
+        - Tuple[int, dict] : Code de retour et réponse décodée.
+        """
+        body = json.dumps(data) if data is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return response.status, json.loads(payload) if payload else {}
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self) -> None:
+        """
+        Ferme la connexion.
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class Stats:
+    """
+    Mesures de la charge : latences et résultats, par opération.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialisation des mesures.
+        """
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {"park": [], "unpark": []}
+        self.results: Counter = Counter()
+        self.lags: List[float] = []
+
+    def record(self, operation: str, latency: float, status: int, message: Optional[str]) -> None:
+        """
+        Enregistre le résultat d'une opération.
+
+        Paramètres :
+        - operation (str) : Opération ("park" ou "unpark").
+        - latency (float) : Latence, en millisecondes.
+        - status (int) : Code de retour HTTP (0 si la requête a échoué).
+        - message (str) OPTIONNEL : Code d'erreur renvoyé par l'API.
+        """
+        with self.lock:
+            self.latencies[operation].append(latency)
+            self.results[(operation, status, message or "")] += 1
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Percentile d'une série de mesures (méthode du rang le plus proche).
+
+    Paramètres :
+    - samples (List[float]) : Mesures.
+    - q (float) : Percentile, entre 0 et 1.
+
+    Sortie :
+    - float : Valeur du percentile, 0 si la série est vide.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+def histogram(samples: List[float]) -> List[Tuple[str, int]]:
+    """
+    Histogramme des latences.
+
+    Paramètres :
+    - samples (List[float]) : Latences, en millisecondes.
+
+    Sortie :
+    - List[Tuple[str, int]] : Classes de l'histogramme et nombre de mesures par classe.
+    """
+    counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    for sample in samples:
+        counts[next((i for i, bound in enumerate(HISTOGRAM_BOUNDS) if sample < bound), len(HISTOGRAM_BOUNDS))] += 1
+
+    labels = [f"< {bound} ms" for bound in HISTOGRAM_BOUNDS] + [f">= {HISTOGRAM_BOUNDS[-1]} ms"]
+    return list(zip(labels, counts))
+
+def generate_day(cars: int, commuters_ratio: float, rng: random.Random) -> List[Tuple[float, str, int]]:
+    """
+    Génère les arrivées et départs d'une journée, en heures.
+
+    Deux populations sont simulées :
+    - les pendulaires arrivent autour de 8h15 et repartent autour de 17h30
+      (lois normales), ce qui produit les pics du matin et du soir ;
+    - les visiteurs arrivent uniformément entre 9h et 19h et restent une durée
+      de loi exponentielle (1h30 en moyenne).
+
+    Paramètres :
+    - cars (int) : Nombre de voitures de la journée.
+    - commuters_ratio (float) : Proportion de pendulaires.
+    - rng (Random) : Générateur aléatoire.
+
+    Sortie :
+    - List[Tuple[float, str, int]] : Événements (heure, opération, numéro de voiture), triés.
+    """
+    events = []
+    for car in range(cars):
+        if rng.random() < commuters_ratio:
+            arrival = min(max(rng.gauss(8.25, 0.75), DAY_START), 12.0)
+            departure = rng.gauss(17.5, 0.75)
+        else:
+            arrival = rng.uniform(9.0, 19.0)
+            departure = arrival + rng.expovariate(1 / 1.5)
+
+        departure = min(max(departure, arrival + 0.25), DAY_END)
+        events.append((arrival, "park", car))
+        events.append((departure, "unpark", car))
+
+    events.sort()
+    return events
+
+class LoadGenerator:
+    """
+    Générateur de charge : garer et retirer des voitures d'un parking.
+
+    L'état des places (libres, occupées) est suivi côté client pour choisir les
+    places des arrivées. Une proportion des arrivées (`conflicts`) vise une place
+    tirée au hasard, qu'elle soit libre ou non, pour simuler des bornes qui
+    travaillent sur un état périmé et mettre à l'épreuve la gestion de la concurrence.
+    """
+
+    def __init__(self, url: str, parking: Dict[str, Any], spots: List[str], plates: List[str], conflicts: float, seed: int) -> None:
+        """
+        Initialisation du générateur.
+
+        Paramètres :
+        - url (str) : URL du serveur.
+        - parking (dict) : Parking utilisé.
+        - spots (List[str]) : Identifiants des places libres du parking.
+        - plates (List[str]) : Plaques des voitures non garées.
+        - conflicts (float) : Proportion des arrivées visant une place au hasard.
+        - seed (int) : Graine du générateur aléatoire.
+        """
+        self.url = url
+        self.parking = parking
+        self.all_spots = list(spots)
+        self.free_spots = list(spots)
+        self.plates = plates
+        self.conflicts = conflicts
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # Place de chaque voiture garée, par numéro de voiture
+        self.parked: Dict[int, str] = {}
+        self.stats = Stats()
+        self.local = threading.local()
+
+    def client(self) -> Client:
+        """
+        Client HTTP du thread courant.
+
+        Sortie :
+        - Client : Client du thread.
+        """
+        if not hasattr(self.local, "client"):
+            self.local.client = Client(self.url)
+        return self.local.client
+
+    def call(self, operation: str, spot_id: str, data: Optional[dict] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Appelle la route `park` ou `unpark` et enregistre le résultat.
+
+        Paramètres :
+        - operation (str) : Opération ("park" ou "unpark").
+        - spot_id (str) : Identifiant de la place.
+        - data (dict) OPTIONNEL : Corps de la requête.
+
+        Sortie :
+        - Tuple[bool, str] : True si l'opération a réussi, et code d'erreur renvoyé par l'API.
+        """
+        start = time.perf_counter()
+        try:
+            status, response = self.client().request(
+                "POST", f"/api/parkings/{self.parking['id']}/spots/{spot_id}/{operation}", data
+            )
+            message = response.get("message")
+        except (OSError, http.client.HTTPException, ValueError) as error:
+            status, message = 0, type(error).__name__
+        self.stats.record(operation, (time.perf_counter() - start) * 1000, status, message)
+        return status == 200, message
+
+    def park(self, car: int) -> None:
+        """
+        Arrivée d'une voiture : choix d'une place, puis appel de `park`.
+
+        Paramètres :
+        - car (int) : Numéro de la voiture.
+        """
+        with self.lock:
+            if self.rng.random() < self.conflicts:
+                spot_id = self.rng.choice(self.all_spots)
+                if spot_id in self.free_spots:
+                    self.free_spots.remove(spot_id)
+            elif self.free_spots:
+                i = self.rng.randrange(len(self.free_spots))
+                self.free_spots[i], self.free_spots[-1] = self.free_spots[-1], self.free_spots[i]
+                spot_id = self.free_spots.pop()
+            else:
+                self.stats.results[("park", 0, "CLIENT_PARKING_FULL")] += 1
+                return
+
+        parked, message = self.call("park", spot_id, {"license_plate": self.plates[car]})
+        with self.lock:
+            if parked:
+                self.parked[car] = spot_id
+            # La place est restée libre si l'échec ne vient pas d'une autre voiture
+            elif message != "SPOT_ALREADY_TAKEN":
+                self.free_spots.append(spot_id)
+
+    def unpark(self, car: int) -> None:
+        """
+        Départ d'une voiture garée : appel de `unpark`, puis libération de la place.
+
+        Paramètres :
+        - car (int) : Numéro de la voiture.
+        """
+        with self.lock:
+            spot_id = self.parked.pop(car, None)
+        # La voiture n'a pas pu se garer : pas de départ
+        if spot_id is None:
+            return
+
+        unparked, _ = self.call("unpark", spot_id)
+        if unparked:
+            with self.lock:
+                self.free_spots.append(spot_id)
+
+    def run_day(self, events: List[Tuple[float, str, int]], duration: float, concurrency: int) -> float:
+        """
+        Rejoue une journée en boucle ouverte, compressée en `duration` secondes.
+
+        Les opérations sont envoyées à l'heure prévue quelle que soit la latence
+        du serveur ; le retard des opérations sur leur heure prévue (lag) montre
+        si le serveur suit la cadence.
+
+        Paramètres :
+        - events (List[Tuple[float, str, int]]) : Événements de la journée.
+        - duration (float) : Durée de la journée simulée, en secondes.
+        - concurrency (int) : Nombre de requêtes simultanées maximal.
+
+        Sortie :
+        - float : Durée réelle de la simulation, en secondes.
+        """
+        scale = duration / ((DAY_END - DAY_START) * 3600)
+        operations: "queue.Queue[Optional[Tuple[float, str, int]]]" = queue.Queue()
+
+        def worker() -> None:
+            while True:
+                item = operations.get()
+                if item is None:
+                    return
+                due, operation, car = item
+                with self.stats.lock:
+                    self.stats.lags.append((time.perf_counter() - due) * 1000)
+                getattr(self, operation)(car)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+
+        start = time.perf_counter()
+        for hour, operation, car in events:
+            due = start + (hour - DAY_START) * 3600 * scale
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            operations.put((due, operation, car))
+
+        for _ in threads:
+            operations.put(None)
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def run_saturate(self, duration: float, concurrency: int) -> float:
+        """
+        Enchaîne `park` et `unpark` aussi vite que possible (boucle fermée).
+
+        Mesure le débit maximal du serveur pour une concurrence donnée.
+
+        Paramètres :
+        - duration (float) : Durée de la mesure, en secondes.
+        - concurrency (int) : Nombre de clients simultanés.
+
+        Sortie :
+        - float : Durée réelle de la mesure, en secondes.
+        """
+        cars = list(range(len(self.plates)))
+        self.rng.shuffle(cars)
+        deadline = time.perf_counter() + duration
+
+        def worker() -> None:
+            while time.perf_counter() < deadline:
+                with self.lock:
+                    if not cars:
+                        return
+                    car = cars.pop()
+                self.park(car)
+                self.unpark(car)
+                with self.lock:
+                    cars.insert(0, car)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Synthèse des mesures.
+
+        Paramètres :
+        - elapsed (float) : Durée de la simulation, en secondes.
+
+        Sortie :
+        - dict : Débit, latences, histogrammes et résultats par code d'erreur.
+        """
+        total = sum(len(samples) for samples in self.stats.latencies.values())
+        return {
+            "parking": self.parking["id"],
+            "elapsed_s": round(elapsed, 3),
+            "operations": total,
+            "throughput_ops": round(total / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                operation: {
+                    "count": len(samples),
+                    "p50": round(percentile(samples, 0.50), 2),
+                    "p90": round(percentile(samples, 0.90), 2),
+                    "p99": round(percentile(samples, 0.99), 2),
+                    "max": round(max(samples), 2) if samples else 0.0,
+                    "histogram": dict(histogram(samples))
+                }
+                for operation, samples in self.stats.latencies.items()
+            },
+            "lag_ms": {
+                "p50": round(percentile(self.stats.lags, 0.50), 2),
+                "p99": round(percentile(self.stats.lags, 0.99), 2)
+            },
+            "results": [
+                {"operation": operation, "status": status, "message": message, "count": count}
+                for (operation, status, message), count in sorted(self.stats.results.items())
+            ]
+        }
+
+def print_report(report: Dict[str, Any]) -> None:
+    """
+    Affiche la synthèse des mesures.
+
+    Paramètres :
+    - report (dict) : Synthèse (voir `LoadGenerator.report`).
+    """
+    print(f"[+] {report['operations']} operations in {report['elapsed_s']:.1f}s: {report['throughput_ops']} ops/s")
+    print(f"    schedule lag p50 {report['lag_ms']['p50']} ms, p99 {report['lag_ms']['p99']} ms\n")
+
+    for operation, latency in report["latency_ms"].items():
+        print(f"[+] {operation}: {latency['count']} requests, p50 {latency['p50']} ms, "
+              f"p90 {latency['p90']} ms, p99 {latency['p99']} ms, max {latency['max']} ms")
+        largest = max(latency["histogram"].values(), default=0) or 1
+        for label, count in latency["histogram"].items():
+            print(f"    {label:>11} {count:>7} {'#' * round(40 * count / largest)}")
+        print()
+
+    print("[+] Results")
+    for result in report["results"]:
+        print(f"    {result['operation']:<6} {result['status']:>3} {result['message'] or 'OK':<24} {result['count']}")
+
+def prepare(url: str, parking_id: Optional[str], cars: int) -> Tuple[Dict[str, Any], List[str], List[str]]:
+    """
+    Lit l'état initial du parking et les voitures disponibles.
+
+    Paramètres :
+    - url (str) : URL du serveur.
+    - parking_id (str) OPTIONNEL : Identifiant du parking, par défaut le plus grand.
+    - cars (int) : Nombre de voitures souhaité.
+
+    Sortie :
+    - Tuple[dict, List[str], List[str]] : Parking, places libres et plaques des voitures non garées.
+    """
+    client = Client(url)
+
+    _, response = client.request("GET", "/api/parkings")
+    parkings = response["parkings"]
+    if parking_id is not None:
+        parking = next(parking for parking in parkings if parking["id"] == parking_id)
+    else:
+        parking = max(parkings, key=lambda parking: parking["levels"] * parking["spots_per_level"])
+
+    _, response = client.request("GET", f"/api/parkings/{parking['id']}/spots")
+    spots = [spot["id"] for spot in response["spots"] if not spot["is_taken"] and not spot["subscription"]]
+
+    _, response = client.request("GET", "/api/cars?parked=false")
+    plates = [car["license_plate"] for car in response["cars"]][:cars]
+
+    client.close()
+    return parking, spots, plates
+
+def main() -> int:
+    """
+    Point d'entrée du générateur de charge.
+
+    Sortie :
+    - int : Code de sortie.
+    """
+    parser = argparse.ArgumentParser(description="Génère une charge de park/unpark sur un serveur lancé localement.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL du serveur.")
+    parser.add_argument("--parking", help="Identifiant du parking, par défaut le plus grand.")
+    parser.add_argument("--mode", choices=["day", "saturate"], default="day",
+                        help="'day' rejoue une journée (pics du matin et du soir), 'saturate' mesure le débit maximal.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Durée de la simulation, en secondes.")
+    parser.add_argument("--cars", type=int, default=1000, help="Nombre de voitures utilisées.")
+    parser.add_argument("--commuters", type=float, default=0.6, help="Proportion de pendulaires (mode 'day').")
+    parser.add_argument("--concurrency", type=int, default=8, help="Nombre de requêtes simultanées.")
+    parser.add_argument("--conflicts", type=float, default=0.0, help="Proportion des arrivées visant une place au hasard.")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire.")
+    parser.add_argument("--json", help="Fichier JSON de la synthèse.")
+    args = parser.parse_args()
+
+    print(f"[?] Reading parking state from {args.url}")
+    parking, spots, plates = prepare(args.url, args.parking, args.cars)
+    print(f"[+] Parking '{parking['name']}': {len(spots)} free spots, {len(plates)} cars\n")
+
+    if not plates or not spots:
+        print("[!] No free spot or no unparked car available")
+        return 1
+
+    generator = LoadGenerator(args.url, parking, spots, plates, args.conflicts, args.seed)
+    if args.mode == "day":
+        events = generate_day(len(plates), args.commuters, random.Random(args.seed))
+        print(f"[?] Replaying a day of {len(events)} operations in {args.duration:.0f}s with concurrency {args.concurrency}")
+        elapsed = generator.run_day(events, args.duration, args.concurrency)
+    else:
+        print(f"[?] Saturating the server for {args.duration:.0f}s with concurrency {args.concurrency}")
+        elapsed = generator.run_saturate(args.duration, args.concurrency)
+    print()
+
+    report = generator.report(elapsed)
+    report.update(mode=args.mode, concurrency=args.concurrency)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\n[+] Report written to {args.json}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import sys
+from typing import List
+from sqlalchemy import Column, Index, func, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+from utils.sqlalchemy import Base, engine
+from utils import history
+import classes  # noqa: F401 (enregistre les tables dans Base.metadata)
+
+def find_duplicates(connection: Connection, index: Index) -> List[tuple]:
+    """
+    Recherche les valeurs en double qui empêchent la création d'un index unique.
+
+    Paramètres :
+    - connection (Connection) : Connexion à la base de données.
+    - index (Index) : Index unique à créer.
+
+    Sortie :
+    - List[tuple] : Valeurs en double et leur nombre d'occurrences (au plus 10).
+    """
+    columns = list(index.columns)
+    # Les valeurs NULL ne sont jamais en conflit dans un index unique
+    return connection.execute(
+        select(*columns, func.count())
+        .where(*(column.is_not(None) for column in columns))
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .limit(10)
+    ).all()
+
+def add_column(connection: Connection, column: Column) -> None:
+    """
+    Ajoute une colonne déclarée sur un modèle à une table existante.
+
+    La colonne doit être nullable ou avoir une valeur par défaut côté serveur
+    (`server_default`) pour que les lignes existantes restent valides.
+
+    Paramètres :
+    - connection (Connection) : Connexion à la base de données.
+    - column (Column) : Colonne à ajouter.
+    """
+    definition = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f"ALTER TABLE {column.table.name} ADD COLUMN {definition}")
+
+def migrate() -> bool:
+    """
+    Met à jour le schéma d'une base de données existante.
+
+    Les tables manquantes sont créées, ainsi que les tables de l'historique des
+    stationnements du mois en cours et du suivant, puis les colonnes et les index
+    déclarés sur les modèles qui n'existent pas encore. Si des doublons empêchent la création d'un index
+    unique, ils sont affichés et aucun index n'est créé.
+
+    Sortie :
+    - bool : True si la migration a réussi, False sinon.
+    """
+    print("[?] Creating missing tables")
+    Base.metadata.create_all(engine)
+    print("[+] Tables up to date\n")
+
+    # Les tables de l'historique sont créées à l'avance pour le mois en cours et le suivant
+    print("[?] Creating history tables")
+    current = history.month_of(history.utcnow())
+    with engine.begin() as connection:
+        history.create_partitions(connection, [current, history.next_month(current)])
+    print("[+] History tables up to date\n")
+
+    print("[?] Adding missing columns")
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    add_column(connection, column)
+                    print(f"[+] Column {table.name}.{column.name} added")
+    print("[+] Columns up to date\n")
+
+    print("[?] Creating missing indexes")
+    with engine.begin() as connection:
+        missing = [
+            index
+            for table in Base.metadata.sorted_tables
+            for index in sorted(table.indexes, key=lambda index: index.name)
+            if index.name not in {index["name"] for index in inspect(connection).get_indexes(table.name)}
+        ]
+
+        # Vérifie tous les index uniques avant de modifier le schéma
+        valid = True
+        for index in missing:
+            duplicates = find_duplicates(connection, index) if index.unique else []
+            if duplicates:
+                valid = False
+                print(f"[!] Cannot create unique index {index.name}, duplicated values:")
+                for *values, count in duplicates:
+                    print(f"    {tuple(values)} x{count}")
+
+        if not valid:
+            print("[!] Migration aborted, remove the duplicated rows and try again")
+            return False
+
+        for index in missing:
+            index.create(connection)
+            print(f"[+] Index {index.name} created")
+    print("[+] Indexes up to date\n")
+
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if migrate() else 1)
@@ -1,172 +1,342 @@
 import os
-from utils.sqlalchemy import Base, engine, Session as session
-from classes import Parking, Person, Car, Subscription
-from random import randint, choice
+import argparse
+import time
+from random import Random
+from typing import Dict, List, Any
+from utils.sqlalchemy import Base, engine
+from utils.uuid import uuid_v4_batch
+from utils import history
+from classes import Parking, Person, Car, Spot, Subscription
 
 
 SCRIPT_DIR = os.path.dirname(__file__)
 
+# Nombre de lignes insérées par requête
+BATCH_SIZE = 5000
+
+# Parkings du jeu de données par défaut
+DEFAULT_PARKINGS = [
+    {
+        "name": "Parking République",
+        "address": "12 Avenue de la République",
+        "zip_code": "75011",
+        "city": "Paris",
+        "levels": 3,
+        "spots_per_level": 50
+    },
+    {
+        "name": "Parking Centre Commercial Atlantis",
+        "address": "Rue de la Durantière",
+        "zip_code": "44800",
+        "city": "Saint-Herblain",
+        "levels": 5,
+        "spots_per_level": 100
+    },
+    {
+        "name": "Parking Aéroport Charles de Gaulle P1",
+        "address": "Route des Badauds",
+        "zip_code": "95700",
+        "city": "Roissy-en-France",
+        "levels": 8,
+        "spots_per_level": 200
+    }
+]
+
+# Villes utilisées pour générer les parkings des profils de grande taille
+CITIES = [
+    ("Paris", "75001"), ("Lyon", "69001"), ("Marseille", "13001"), ("Toulouse", "31000"),
+    ("Nice", "06000"), ("Nantes", "44000"), ("Strasbourg", "67000"), ("Montpellier", "34000"),
+    ("Bordeaux", "33000"), ("Lille", "59000"), ("Rennes", "35000"), ("Reims", "51100")
+]
+
+# Profils de génération :
+# - parkings : liste de parkings, ou nombre de parkings à générer
+# - levels / spots_per_level : bornes du nombre d'étages et de places par étage des parkings générés
+# - persons : nombre de personnes
+# - two_cars_ratio : proportion de personnes possédant deux voitures
+# - parked_ratio : proportion de voitures garées
+# - subscriptions : nombre de tentatives d'abonnement
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "small": {
+        "parkings": 3, "levels": (1, 3), "spots_per_level": (10, 40),
+        "persons": 60, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 25
+    },
+    "default": {
+        "parkings": DEFAULT_PARKINGS,
+        "persons": 600, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 250
+    },
+    "large": {
+        "parkings": 50, "levels": (8, 8), "spots_per_level": (500, 500),
+        "persons": 10000, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 5000
+    },
+    "xl": {
+        "parkings": 100, "levels": (10, 10), "spots_per_level": (1000, 1000),
+        "persons": 100000, "two_cars_ratio": 0.5, "parked_ratio": 0.5, "subscriptions": 50000
+    }
+}
+
+def read_dataset(*path: str) -> List[str]:
+    """
+    Lit un fichier du répertoire 'datasets', une valeur par ligne.
+
+    Paramètres :
+    - path (str) : Chemin du fichier, relatif au répertoire 'datasets'.
+
+    Sortie :
+    - List[str] : Valeurs du fichier.
+    """
+    with open(os.path.join(SCRIPT_DIR, 'datasets', *path), "r") as file:
+        return [line for line in file.read().split("\n") if line]
+
 def reset_database():
     """
     Supprime et recrée toutes les tables de la base de données.
     """
-    
+
     print("[?] Dropping tables")
+    with engine.begin() as connection:
+        history.drop_partitions(connection)
     Base.metadata.drop_all(engine)
     print("[+] Tables dropped\n")
-    
+
     print("[?] Creating tables")
     Base.metadata.create_all(engine)
     print("[+] Tables created\n")
 
-def create_parkings():
-    """
-    Seed la base de données avec des parkings.
-    """
-
-    print("[?] Creating parkings")
-    Parking(
-        name="Parking République",
-        address="12 Avenue de la République",
-        zip_code="75011",
-        city="Paris",
-        levels=3,
-        spots_per_level=50
-    ).save(session)
-
-    Parking(
-        name="Parking Centre Commercial Atlantis",
-        address="Rue de la Durantière",
-        zip_code="44800",
-        city="Saint-Herblain",
-        levels=5,
-        spots_per_level=100
-    ).save(session)
-
-    Parking(
-        name="Parking Aéroport Charles de Gaulle P1",
-        address="Route des Badauds",
-        zip_code="95700",
-        city="Roissy-en-France",
-        levels=8,
-        spots_per_level=200
-    ).save(session)
-    print("[+] Parkings created \n")
-
-def create_persons():
-    """
-    Seed la base de données avec des personnes.
-    """
-
-    print("[?] Creating persons")
-    first_names_path = os.path.join(SCRIPT_DIR, 'datasets', 'persons','first_names.txt')
-    last_names_path = os.path.join(SCRIPT_DIR, 'datasets', 'persons','last_names.txt')
-
-    first_names = open(first_names_path, "r").read().split("\n")
-    last_names = open(last_names_path, "r").read().split("\n")
-
-    for i in range(600):
-        Person(
-            first_name=first_names[i % randint(1, len(first_names))],
-            last_name=last_names[i % randint(1, len(last_names))],
-            birth_date=f"{randint(1950, 2000)}-{randint(1, 12):02d}-{randint(1, 28):02d}T23:00:00.000Z",
-        ).save(session)
-
-    print("[+] Persons created\n")
-
-def create_cars():
-    """
-    Seed la base de données avec des voitures.
-    """
-
-    print("[?] Creating cars")
-    brands_path = os.path.join(SCRIPT_DIR, 'datasets', 'cars','brands.txt')
-    models_path = os.path.join(SCRIPT_DIR, 'datasets', 'cars','models.txt')
-    colors_path = os.path.join(SCRIPT_DIR, 'datasets', 'cars','colors.txt')
-    
-    brands = open(brands_path, "r").read().split("\n")
-    models = open(models_path, "r").read().split("\n")
-    colors = open(colors_path, "r").read().split("\n")
-
-    for person in session.query(Person).all():
-        has_two_cars = randint(0, 1)
-        for i in range(2 if has_two_cars else 1):
-            Car(
-                license_plate=f"{chr(randint(65, 90))}{chr(randint(65, 90))}{randint(100, 999)}{chr(randint(65, 90))}{chr(randint(65, 90))}",
-                brand=choice(brands),
-                model=choice(models),
-                color=choice(colors),
-                owner=person
-            ).save(session)
-    
-    print("[+] Cars created\n")
-    
-def park_cars():
-    """
-    Seed la base de données avec des voitures garées.
-    """
-    
-    print("[?] Parking cars")
-    parkings = session.query(Parking).all()
-    cars = session.query(Car).all()
-
-    for i in range(450):
-        car = cars[i]
-        parking = choice(parkings)
-
-        if len(parking.get_available_spots()) == 0:
-            continue
+def generate_parkings(profile: Dict[str, Any], rng: Random) -> Dict[str, List[dict]]:
+    """
+    Génère les lignes des tables 'parkings' et 'spots'.
 
-        spot = choice(parking.get_available_spots())
+    Paramètres :
+    - profile (dict) : Profil de génération.
+    - rng (Random) : Générateur aléatoire.
 
-        if not spot:
-            continue
-        
-        car.park(spot)
+    Sortie :
+    - dict : Lignes générées, par table.
+    """
+    parkings = profile["parkings"]
+    if isinstance(parkings, int):
+        parkings = []
+        for i in range(profile["parkings"]):
+            city, zip_code = CITIES[i % len(CITIES)]
+            parkings.append({
+                "name": f"Parking {city} {i + 1}",
+                "address": f"{rng.randint(1, 200)} Rue de la Gare",
+                "zip_code": zip_code,
+                "city": city,
+                "levels": rng.randint(*profile["levels"]),
+                "spots_per_level": rng.randint(*profile["spots_per_level"])
+            })
+
+    parking_rows = [
+        {"id": parking_id, **parking}
+        for parking_id, parking in zip(uuid_v4_batch(len(parkings), rng), parkings)
+    ]
 
-    print("[+] Cars parked\n")
+    spot_rows = []
+    for parking in parking_rows:
+        positions = [
+            (level, spot)
+            for level in range(parking["levels"])
+            for spot in range(parking["spots_per_level"])
+        ]
+        spot_rows += [
+            {
+                "id": spot_id,
+                "level": level,
+                "spot": spot,
+                "tag": Spot.make_tag(level, spot, parking["spots_per_level"]),
+                "is_taken": False,
+                "parking_id": parking["id"],
+                "car_id": None,
+                "parked_at": None
+            }
+            for spot_id, (level, spot) in zip(uuid_v4_batch(len(positions), rng), positions)
+        ]
 
-def create_subscriptions():
+    return {"parkings": parking_rows, "spots": spot_rows}
+
+def generate_persons(profile: Dict[str, Any], rng: Random) -> Dict[str, List[dict]]:
     """
-    Seed la base de données avec des abonnements.
+    Génère les lignes des tables 'persons' et 'cars'.
+
+    Paramètres :
+    - profile (dict) : Profil de génération.
+    - rng (Random) : Générateur aléatoire.
+
+    Sortie :
+    - dict : Lignes générées, par table.
     """
-    
-    print("[?] Creating subscriptions")
-    persons = session.query(Person).all()
-    parkings = session.query(Parking).all()
+    first_names = read_dataset('persons', 'first_names.txt')
+    last_names = read_dataset('persons', 'last_names.txt')
+    brands = read_dataset('cars', 'brands.txt')
+    models = read_dataset('cars', 'models.txt')
+    colors = read_dataset('cars', 'colors.txt')
+
+    person_rows = [
+        {
+            "id": person_id,
+            "first_name": rng.choice(first_names),
+            "last_name": rng.choice(last_names),
+            "birth_date": f"{rng.randint(1950, 2000)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T23:00:00.000Z"
+        }
+        for person_id in uuid_v4_batch(profile["persons"], rng)
+    ]
+
+    owners = [
+        person["id"]
+        for person in person_rows
+        for _ in range(2 if rng.random() < profile["two_cars_ratio"] else 1)
+    ]
 
-    for i in range(250):
-        person = persons[i]
-        parking = choice(parkings)
+    # Les plaques d'immatriculation sont uniques (le dictionnaire conserve l'ordre de génération)
+    license_plates = {}
+    while len(license_plates) < len(owners):
+        letters = [chr(rng.randint(65, 90)) for _ in range(4)]
+        license_plates[f"{letters[0]}{letters[1]}{rng.randint(100, 999)}{letters[2]}{letters[3]}"] = None
+
+    car_rows = [
+        {
+            "id": car_id,
+            "license_plate": license_plate,
+            "brand": rng.choice(brands),
+            "model": rng.choice(models),
+            "color": rng.choice(colors),
+            "owner_id": owner_id
+        }
+        for car_id, license_plate, owner_id in zip(uuid_v4_batch(len(owners), rng), license_plates, owners)
+    ]
+    rng.shuffle(car_rows)
+
+    return {"persons": person_rows, "cars": car_rows}
+
+def park_cars(rows: Dict[str, List[dict]], profile: Dict[str, Any], rng: Random) -> None:
+    """
+    Gare une partie des voitures sur des places libres choisies au hasard.
+
+    Paramètres :
+    - rows (dict) : Lignes générées, par table.
+    - profile (dict) : Profil de génération.
+    - rng (Random) : Générateur aléatoire.
+    """
+    free_spots: Dict[str, List[dict]] = {parking["id"]: [] for parking in rows["parkings"]}
+    for spot in rows["spots"]:
+        free_spots[spot["parking_id"]].append(spot)
 
-        if not parking.get_available_spot():
+    parking_ids = list(free_spots)
+    # Les voitures sont garées au moment du seed (la date ne dépend pas de la graine)
+    parked_at = history.utcnow()
+    for car in rows["cars"][:int(len(rows["cars"]) * profile["parked_ratio"])]:
+        spots = free_spots[rng.choice(parking_ids)]
+
+        if not spots:
             continue
 
-        spot = choice(parking.spots)
+        # Retire une place libre au hasard en temps constant
+        i = rng.randrange(len(spots))
+        spots[i], spots[-1] = spots[-1], spots[i]
+        spot = spots.pop()
+
+        spot["car_id"] = car["id"]
+        spot["is_taken"] = True
+        spot["parked_at"] = parked_at
+
+def generate_subscriptions(rows: Dict[str, List[dict]], profile: Dict[str, Any], rng: Random) -> None:
+    """
+    Génère les lignes de la table 'subscriptions'.
+
+    Comme pour un abonnement réel, une place déjà occupée peut être réservée :
+    la voiture qui l'occupe est alors mal garée.
+
+    Paramètres :
+    - rows (dict) : Lignes générées, par table.
+    - profile (dict) : Profil de génération.
+    - rng (Random) : Générateur aléatoire.
+    """
+    spots: Dict[str, List[dict]] = {parking["id"]: [] for parking in rows["parkings"]}
+    for spot in rows["spots"]:
+        spots[spot["parking_id"]].append(spot)
 
-        if spot.subscription:
+    parking_ids = list(spots)
+    persons = rows["persons"]
+    reserved = set()
+    subscription_rows = []
+
+    for i in range(min(profile["subscriptions"], len(persons))):
+        parking_id = rng.choice(parking_ids)
+        spot = rng.choice(spots[parking_id])
+
+        if spot["id"] in reserved:
             continue
 
-        subscription = Subscription(
-            person=person,
-            parking=parking,
-            spot=spot
-        )
-
-        person.subscriptions.append(subscription)
-        parking.subscriptions.append(subscription)
-        spot.subscription = subscription
-        
-        person.save(session)
-        parking.save(session)
-        spot.save(session)
-    
-    print("[+] Subscriptions created\n")
+        reserved.add(spot["id"])
+        subscription_rows.append({
+            "person_id": persons[i]["id"],
+            "parking_id": parking_id,
+            "spot_id": spot["id"]
+        })
+
+    for subscription_id, subscription in zip(uuid_v4_batch(len(subscription_rows), rng), subscription_rows):
+        subscription["id"] = subscription_id
+
+    rows["subscriptions"] = subscription_rows
+
+def insert_rows(rows: Dict[str, List[dict]]) -> None:
+    """
+    Insère les lignes générées par lots, dans une seule transaction.
+
+    Paramètres :
+    - rows (dict) : Lignes générées, par table.
+    """
+    tables = [
+        (Parking.__table__, rows["parkings"]),
+        (Person.__table__, rows["persons"]),
+        (Car.__table__, rows["cars"]),
+        (Spot.__table__, rows["spots"]),
+        (Subscription.__table__, rows["subscriptions"])
+    ]
+
+    with engine.begin() as connection:
+        for table, table_rows in tables:
+            for start in range(0, len(table_rows), BATCH_SIZE):
+                connection.execute(table.insert(), table_rows[start:start + BATCH_SIZE])
+            print(f"[+] {len(table_rows)} {table.name} inserted")
+
+def seed(profile: Dict[str, Any], seed: int) -> Dict[str, List[dict]]:
+    """
+    Seed la base de données à partir d'un profil de génération.
+
+    À profil et graine identiques, les données générées sont identiques.
+
+    Paramètres :
+    - profile (dict) : Profil de génération.
+    - seed (int) : Graine du générateur aléatoire.
+
+    Sortie :
+    - dict : Lignes insérées, par table.
+    """
+    rng = Random(seed)
+
+    print("[?] Generating rows")
+    rows = generate_parkings(profile, rng)
+    rows.update(generate_persons(profile, rng))
+    park_cars(rows, profile, rng)
+    generate_subscriptions(rows, profile, rng)
+    print("[+] Rows generated\n")
+
+    print("[?] Inserting rows")
+    insert_rows(rows)
+    print("[+] Rows inserted\n")
+
+    return rows
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed la base de données.")
+    parser.add_argument("--profile", choices=PROFILES, default="default", help="Profil de génération.")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
     reset_database()
-    create_parkings()
-    create_persons()
-    create_cars()
-    park_cars()
-    create_subscriptions()
\ No newline at end of file
+    seed(PROFILES[args.profile], args.seed)
+    print(f"[+] Database seeded with profile '{args.profile}' (seed {args.seed}) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+import urllib.request
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from scripts.loadgen import percentile
+
+# Modes de service comparés : commande de démarrage et variables d'environnement
+MODES = {
+    "wsgi": (["gunicorn", "-c", "gunicorn.conf.py", "-b", "{host}:{port}", "-w", "{workers}", "server:server"], {}),
+    "gevent": (["gunicorn", "-c", "gunicorn.conf.py", "-b", "{host}:{port}", "-w", "{workers}", "server:server"],
+               {"GUNICORN_WORKER_CLASS": "gevent"}),
+    "asgi": (["uvicorn", "asgi:app", "--host", "{host}", "--port", "{port}", "--workers", "{workers}", "--log-level", "warning"], {})
+}
+
+# Lectures d'un tableau de bord, répétées par chaque lecteur
+DASHBOARD_PATHS = ["/api/parkings/{id}", "/api/parkings/{id}/spots", "/api/parkings/{id}/statistics"]
+
+class Reader:
+    """
+    Lecteur d'un tableau de bord : requêtes GET enchaînées sur une connexion persistante.
+    """
+
+    def __init__(self, host: str, port: int, paths: List[str], conditional: float, timeout: float) -> None:
+        """
+        Initialisation du lecteur.
+
+        Paramètres :
+        - host (str), port (int) : Adresse du serveur.
+        - paths (List[str]) : Chemins lus, dans l'ordre.
+        - conditional (float) : Proportion des requêtes revalidées avec `If-None-Match`.
+        - timeout (float) : Délai maximal d'une requête, en secondes.
+        """
+        self.host = host
+        self.port = port
+        self.paths = paths
+        self.conditional = conditional
+        self.timeout = timeout
+        self.etags: Dict[str, str] = {}
+        self.latencies: List[float] = []
+        self.results: Counter = Counter()
+        self.connection: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+
+    async def request(self, path: str, count: int) -> Tuple[int, Optional[str]]:
+        """
+        Envoie une requête GET et lit sa réponse (corps de longueur connue).
+
+        Paramètres :
+        - path (str) : Chemin de la requête.
+        - count (int) : Numéro de la requête, qui décide de sa revalidation.
+
+        Sortie :
+        - Tuple[int, str] : Code de retour et ETag de la réponse.
+        """
+        if self.connection is None:
+            self.connection = await asyncio.open_connection(self.host, self.port)
+        reader, writer = self.connection
+
+        headers = f"Host: {self.host}\r\n"
+        # Revalidation répartie régulièrement : `conditional` requêtes sur 1
+        if path in self.etags and int((count + 1) * self.conditional) > int(count * self.conditional):
+            headers += f"If-None-Match: {self.etags[path]}\r\n"
+        writer.write(f"GET {path} HTTP/1.1\r\n{headers}\r\n".encode())
+        await writer.drain()
+
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin1").split("\r\n")
+        status = int(head[0].split(" ")[1])
+        fields = {name.lower(): value.strip() for name, _, value in (line.partition(":") for line in head[1:] if line)}
+        await reader.readexactly(int(fields.get("content-length", 0)))
+        if fields.get("connection", "").lower() == "close":
+            self.close()
+        return status, fields.get("etag")
+
+    async def run(self, deadline: float) -> None:
+        """
+        Enchaîne les lectures jusqu'à l'échéance.
+
+        Paramètres :
+        - deadline (float) : Échéance, en temps de `time.perf_counter`.
+        """
+        count = 0
+        while time.perf_counter() < deadline:
+            path = self.paths[count % len(self.paths)]
+            start = time.perf_counter()
+            try:
+                status, etag = await asyncio.wait_for(self.request(path, count), self.timeout)
+                if etag:
+                    self.etags[path] = etag
+                self.results[status] += 1
+            except asyncio.TimeoutError:
+                self.results["timeout"] += 1
+                self.close()
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                self.results["error"] += 1
+                self.close()
+                await asyncio.sleep(0.1)
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            count += 1
+        self.close()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection[1].close()
+            self.connection = None
+
+async def open_stream(host: str, port: int, path: str, timeout: float) -> Optional[asyncio.StreamWriter]:
+    """
+    Ouvre un flux d'événements et attend ses en-têtes.
+
+    Sortie :
+    - StreamWriter : Connexion du flux, None si le serveur n'a pas répondu à temps.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return None
+
+    if b" 200 " not in head.split(b"\r\n", 1)[0]:
+        writer.close()
+        return None
+    return writer
+
+async def run_workload(host: str, port: int, parking_id: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Ouvre les flux d'événements, puis mesure les lectures des tableaux de bord.
+
+    Sortie :
+    - dict : Synthèse des mesures.
+    """
+    streams = await asyncio.gather(*(
+        open_stream(host, port, f"/api/parkings/{parking_id}/events", args.timeout) for _ in range(args.streams)
+    ))
+    established = [writer for writer in streams if writer is not None]
+
+    paths = [path.format(id=parking_id) for path in DASHBOARD_PATHS]
+    readers = [Reader(host, port, paths[i % len(paths):] + paths[:i % len(paths)], args.conditional, args.timeout)
+               for i in range(args.concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(reader.run(start + args.duration) for reader in readers))
+    elapsed = time.perf_counter() - start
+
+    for writer in established:
+        writer.close()
+
+    latencies = [latency for reader in readers for latency in reader.latencies]
+    results = sum((reader.results for reader in readers), Counter())
+    succeeded = results[200] + results[304]
+    return {
+        "streams": args.streams,
+        "streams_established": len(established),
+        "requests": len(latencies),
+        "throughput_rps": round(succeeded / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2)
+        },
+        "results": {str(key): count for key, count in sorted(results.items(), key=str)}
+    }
+
+def wait_ready(url: str, timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Attend que le serveur réponde et renvoie la liste des parkings.
+
+    Paramètres :
+    - url (str) : URL du serveur.
+    - timeout (float, optionnel) : Délai maximal, en secondes.
+
+    Sortie :
+    - dict : Réponse de `/api/parkings`.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/api/parkings", timeout=5) as response:
+                return json.load(response)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+def run_mode(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Démarre le serveur dans un mode, mesure la charge puis l'arrête.
+
+    Paramètres :
+    - mode (str) : Mode de service (voir `MODES`).
+    - args (Namespace) : Options de la ligne de commande.
+
+    Sortie :
+    - dict : Synthèse des mesures.
+    """
+    command, environment = MODES[mode]
+    command = [part.format(host=args.host, port=args.port, workers=args.workers) for part in command]
+    server_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        command, cwd=server_directory, env={**os.environ, **environment},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        parkings = wait_ready(f"http://{args.host}:{args.port}")["parkings"]
+        if args.parking is not None:
+            parking = next(parking for parking in parkings if parking["id"] == args.parking)
+        else:
+            parking = max(parkings, key=lambda parking: parking["levels"] * parking["spots_per_level"])
+        return asyncio.run(run_workload(args.host, args.port, parking["id"], args))
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+def main() -> int:
+    """
+    Point d'entrée du benchmark des modes de service.
+
+    Sortie :
+    - int : Code de sortie.
+    """
+    parser = argparse.ArgumentParser(description="Compare les modes de service (WSGI, ASGI) sous une charge de tableaux de bord.")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=["wsgi", "asgi"], help="Modes comparés.")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute du serveur.")
+    parser.add_argument("--port", type=int, default=8100, help="Port d'écoute du serveur.")
+    parser.add_argument("--workers", type=int, default=2, help="Nombre de processus du serveur.")
+    parser.add_argument("--parking", help="Identifiant du parking lu, par défaut le plus grand.")
+    parser.add_argument("--streams", type=int, default=200, help="Nombre de flux d'événements ouverts.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Nombre de lecteurs simultanés.")
+    parser.add_argument("--conditional", type=float, default=0.8, help="Proportion des lectures revalidées (If-None-Match).")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée de la mesure par mode, en secondes.")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Délai maximal d'une requête, en secondes.")
+    parser.add_argument("--output", help="Fichier JSON des résultats.")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        print(f"[?] {mode}: {args.streams} event streams, {args.concurrency} readers for {args.duration:.0f}s")
+        results[mode] = run_mode(mode, args)
+        report = results[mode]
+        print(f"[+] {mode}: {report['streams_established']}/{report['streams']} streams, "
+              f"{report['throughput_rps']} req/s, p50 {report['latency_ms']['p50']} ms, "
+              f"p95 {report['latency_ms']['p95']} ms, p99 {report['latency_ms']['p99']} ms, results {report['results']}\n")
+
+    print(f"{'mode':<8} {'streams':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for mode, report in results.items():
+        print(f"{mode:<8} {report['streams_established']:>9} {report['throughput_rps']:>9} "
+              f"{report['latency_ms']['p50']:>9} {report['latency_ms']['p99']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"options": {k: v for k, v in vars(args).items() if k != "output"}, "results": results}, file, indent=2)
+        print(f"\n[+] Results written to {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
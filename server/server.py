@@ -1,12 +1,22 @@
-from flask import Flask, request
+from flask import Flask, Response, request
+from functools import wraps
 from flask_cors import CORS
-from utils.sqlalchemy import Session as session
-from classes import Parking, Car, Person, Spot, Subscription
-from typing import Dict, Any
+from sqlalchemy import Select, Row, func, case, and_, exists, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload
+from utils.sqlalchemy import Session as session, after_commit
+from utils import occupancy, events, history, ingestion, instrumentation, metrics, names, plates
+from classes import Parking, Car, Person, Spot, Subscription, ParkingError
+from classes.parking import BATCH_MAX_OPERATIONS
+from utils.pagination import DEFAULT_LIMIT, PaginationError, paginate, parse_limit
+from typing import Callable, Dict, Any, List, Optional
 import re
 
 server = Flask(__name__)
 CORS(server)
+# Enregistrée en premier : ses mesures incluent la validation de la transaction
+instrumentation.init_app(server)
+metrics.init_app(server)
 
 @server.after_request
 def after_request(response):
@@ -16,23 +26,151 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
+@server.after_request
+def commit_session(response):
+    """
+    Validation de la transaction de la requête.
+
+    Chaque requête fait au plus une validation : les écritures des modèles
+    (`save`, `delete`...) sont regroupées dans la transaction de la requête,
+    validée si la réponse est un succès et annulée sinon.
+    """
+    if response.status_code < 400:
+        session.commit()
+    else:
+        session.rollback()
+    return response
+
+@server.teardown_request
+def remove_session(_) -> None:
+    """
+    Libération de la session à la fin de la requête.
+
+    Une transaction non validée (par exemple après une exception) est annulée.
+    """
+    session.remove()
+
+def parse_bool(value: str) -> Optional[bool]:
+    """
+    Convertit un paramètre de requête booléen.
+
+    Paramètres :
+    - value (str) : Valeur du paramètre ("true" ou "false").
+
+    Sortie :
+    - bool : Valeur du paramètre, None si elle est invalide.
+    """
+    return {"true": True, "false": False}.get(value.lower())
+
+def versioned(view: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Réponses conditionnelles d'une route de lecture d'un parking.
+
+    L'ETag de la réponse est la version du parking (voir `Parking.version`).
+    Si le client renvoie cet ETag dans `If-None-Match`, la route n'est pas
+    exécutée et une réponse 304 est renvoyée : seule la version du parking est
+    lue en base de données.
+
+    Paramètres :
+    - view (Callable) : Route dont le premier paramètre est `parking_id`.
+
+    Sortie :
+    - Callable : Route décorée.
+    """
+    @wraps(view)
+    def wrapper(parking_id: str, **kwargs: Any) -> Any:
+        version = session.query(Parking.version).filter(Parking.id == parking_id).scalar()
+
+        # Parking inexistant : la route renvoie l'erreur habituelle
+        if version is None:
+            return view(parking_id, **kwargs)
+
+        etag = str(version)
+        if request.if_none_match.contains_weak(etag):
+            response = server.response_class(status=304)
+        else:
+            response = server.make_response(view(parking_id, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        # La réponse peut être mise en cache, mais doit être revalidée à chaque utilisation
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return wrapper
+
+@server.errorhandler(PaginationError)
+def handle_pagination_error(error: PaginationError) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "message": error.message
+    }, 400
+
+@server.errorhandler(ParkingError)
+def handle_parking_error(error: ParkingError) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "message": error.message
+    }, 400
+
+@server.get("/metrics")
+def get_metrics() -> Response:
+    """
+    Mesures du serveur au format d'exposition Prometheus.
+
+    Les mesures des requêtes sont propres au processus ; les jauges des
+    parkings sont lues sur les index d'occupation, reconstruits seulement
+    si la version du parking a changé.
+
+    Sortie :
+    - Response : Mesures au format texte.
+    """
+    parkings = session.query(Parking).order_by(Parking.name, Parking.id).all()
+    lines = metrics.requests.render() + metrics.render_parkings(
+        (parking.id, parking.name, parking.occupancy) for parking in parkings
+    )
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
 @server.get("/api/parkings")
 def get_parkings() -> Dict[str, Any]:
     """
     Récupère la liste des parkings.
 
+    Paramètres :
+    - limit (int) OPTIONNEL : Nombre de parkings par page.
+    - cursor (str) OPTIONNEL : Curseur de la page suivante.
+    - city (str) OPTIONNEL : Ville des parkings.
+
     Sortie :
     - dict : Liste des parkings
     """
-    parkings = session.query(Parking).order_by(Parking.name).all()
+    # Places et abonnements de tous les parkings de la page chargés ensemble
+    query = session.query(Parking).options(
+        selectinload(Parking.spots),
+        selectinload(Parking.subscriptions)
+    )
+
+    city = request.args.get("city")
+    if city is not None:
+        query = query.filter(Parking.city == city)
+
+    cursor = request.args.get("cursor")
+    parkings, next_cursor = paginate(
+        query,
+        [Parking.name, Parking.id],
+        parse_limit(request.args.get("limit"), cursor),
+        cursor
+    )
     return {
         "status": "success",
         "parkings": [
             {
-                "available_spots": len(parking.get_available_spots()),
+                "available_spots": parking.count_available_spots(),
                 **parking.to_dict()
             } for parking in parkings
-        ]
+        ],
+        "next_cursor": next_cursor
     }, 200
 
 @server.post("/api/parkings/create")
@@ -97,21 +235,22 @@ def create_parking() -> Dict[str, Any]:
             "message": "INVALID_SPOTS_PER_LEVEL"
         }, 400
     
-    if session.query(Parking).filter_by(name=name).first():
+    # L'unicité du nom est garantie par l'index unique 'ix_parkings_name'
+    try:
+        parking = Parking.create(
+            name=name, 
+            address=address, 
+            zip_code=zip_code, 
+            city=city, 
+            levels=levels,
+            spots_per_level=spots_per_level
+        )
+    except IntegrityError:
+        session.rollback()
         return {
             "status": "error",
             "message": "PARKING_ALREADY_EXISTS"
         }, 400
-    
-    parking = Parking(
-        name=name, 
-        address=address, 
-        zip_code=zip_code, 
-        city=city, 
-        levels=levels,
-        spots_per_level=spots_per_level
-    )
-    parking.save(session)
 
     return {
         "status": "success",
@@ -131,34 +270,20 @@ def delete_parking(parking_id: str) -> Dict[str, Any]:
     """
     parking = session.get(Parking, parking_id)
 
-    for spot in parking.spots:
-        if spot.car:
-            spot.car.unpark()
-        if spot.subscription:
-            spot.subscription.spot = None
-        spot.delete()
-
-    for subscription in parking.subscriptions:
-        subscription.person.subscriptions.remove(subscription)
-        subscription.delete()
-
-    for car in session.query(Car).all():
-        if car.spot and car.spot.parking.id == parking_id:
-            car.unpark()
-
-    for person in session.query(Person).all():
-        for subscription in person.subscriptions:
-            if subscription.spot.parking.id == parking_id:
-                person.subscriptions.remove(subscription)
-                subscription.delete()
+    if not parking:
+        return {
+            "status": "error",
+            "message": "PARKING_NOT_FOUND"
+        }, 404
 
-    parking.delete()
+    parking.delete(session)
 
     return {
         "status": "success",
     }, 200
 
 @server.get("/api/parkings/<parking_id>")
+@versioned
 def get_parking(parking_id: str) -> Dict[str, Any]:
     """
     Récupère un parking.
@@ -182,7 +307,112 @@ def get_parking(parking_id: str) -> Dict[str, Any]:
         "parking": parking.to_dict()
     }, 200
 
+def history_page(owner: Any) -> Dict[str, Any]:
+    """
+    Page de l'historique des stationnements d'une voiture ou d'un parking.
+
+    Paramètres (de la requête) :
+    - start (str) OPTIONNEL : Début de la période, au format ISO 8601.
+    - end (str) OPTIONNEL : Fin de la période, au format ISO 8601.
+    - limit (int) OPTIONNEL : Nombre de stationnements par page (50 par défaut).
+    - cursor (str) OPTIONNEL : Curseur de la page suivante.
+
+    Paramètres :
+    - owner (Car | Parking) : Voiture ou parking dont l'historique est lu.
+
+    Sortie :
+    - dict : Stationnements terminés et curseur de la page suivante.
+    """
+    start = end = None
+
+    if request.args.get("start") is not None:
+        start = history.parse_time(request.args["start"])
+        if start is None:
+            return {
+                "status": "error",
+                "message": "INVALID_START"
+            }, 400
+
+    if request.args.get("end") is not None:
+        end = history.parse_time(request.args["end"])
+        if end is None:
+            return {
+                "status": "error",
+                "message": "INVALID_END"
+            }, 400
+
+    if start is not None and end is not None and start >= end:
+        return {
+            "status": "error",
+            "message": "INVALID_PERIOD"
+        }, 400
+
+    cursor = request.args.get("cursor")
+    # Un historique n'est jamais renvoyé en entier
+    limit = parse_limit(request.args.get("limit"), cursor) or DEFAULT_LIMIT
+    sessions, next_cursor = owner.history(start, end, limit, cursor)
+
+    return {
+        "status": "success",
+        "sessions": sessions,
+        "next_cursor": next_cursor
+    }, 200
+
+def parking_spots_statement(parking_id: str, level: Optional[int] = None) -> Select:
+    """
+    Requête des places d'un parking, avec la plaque de leur voiture et leur abonnement.
+
+    Partagée par la route `/api/parkings/<parking_id>/spots` et le mode ASGI
+    (voir `asgi.py`). Seules les colonnes utiles sont lues, sans construire
+    d'objets : la mise en forme d'un grand parking reste rapide.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+    - level (int) OPTIONNEL : Numéro de l'étage.
+
+    Sortie :
+    - Select : Requête des places, triées par code.
+    """
+    statement = (
+        select(
+            Spot.id, Spot.is_taken, Spot.level, Spot.parking_id, Spot.spot, Spot.tag,
+            Car.id, Car.license_plate, Subscription.id
+        )
+        .outerjoin(Car, Car.id == Spot.car_id)
+        .outerjoin(Subscription, Subscription.spot_id == Spot.id)
+        .where(Spot.parking_id == parking_id)
+    )
+    if level is not None:
+        statement = statement.where(Spot.level == level)
+    return statement.order_by(Spot.tag)
+
+def format_spot(row: Row) -> Dict[str, Any]:
+    """
+    Mise en forme d'une place lue par `parking_spots_statement`.
+
+    Paramètres :
+    - row (Row) : Ligne de la requête.
+
+    Sortie :
+    - dict : Place, avec la plaque de sa voiture.
+    """
+    spot_id, is_taken, level, parking_id, spot, tag, car_id, license_plate, subscription_id = row
+    return {
+        "car": {
+            "id": car_id,
+            "license_plate": license_plate
+        },
+        "id": spot_id,
+        "is_taken": is_taken,
+        "level": level,
+        "parking": parking_id,
+        "spot": spot,
+        "subscription": subscription_id,
+        "tag": tag
+    }
+
 @server.get("/api/parkings/<parking_id>/spots")
+@versioned
 def get_parking_spots(parking_id: str) -> Dict[str, Any]:
     """
     Récupère la liste des places d'un parking.
@@ -203,43 +433,31 @@ def get_parking_spots(parking_id: str) -> Dict[str, Any]:
         }, 404
     
     level = request.args.get("level")
-    spots = parking.spots
-
     if level is not None:
         try:
             level = int(level)
-            spots = parking.get_spots_by_level(level)
         except ValueError:
             return {
                 "status": "error",
                 "message": "INVALID_LEVEL"
             }, 400
 
-    spots.sort(key=lambda spot: spot.tag)
+    spots = session.execute(parking_spots_statement(parking.id, level)).all()
+
     return {
         "status": "success",
-        "spots": [{
-            "car": {
-                "id": spot.car.id if spot.car else None,
-                "license_plate": spot.car.license_plate if spot.car else None
-            },
-            "id": spot.id,
-            "is_taken": spot.is_taken,
-            "level": spot.level,
-            "parking": spot.parking.id,
-            "spot": spot.spot,
-            "subscription": spot.subscription.id if spot.subscription else None,
-            "tag": spot.tag
-        } for spot in spots]
+        "spots": [format_spot(spot) for spot in spots]
     }, 200
 
 @server.get("/api/parkings/<parking_id>/spots/available")
 def get_available_spots(parking_id: str) -> Dict[str, Any]:
     """
-    Récupère la liste des places de parking libres.
+    Récupère la liste des places de parking libres, d'après l'index
+    d'occupation : seules les places libres sont lues en base.
 
     Paramètres :
     - parking_id (str) : Identifiant du parking.
+    - level (int) OPTIONNEL : Numéro de l'étage.
 
     Sortie :
     - dict : Liste des places de parking libres.
@@ -252,8 +470,19 @@ def get_available_spots(parking_id: str) -> Dict[str, Any]:
             "message": "PARKING_NOT_FOUND"
         }, 404
 
-    spots = parking.get_available_spots()
-    spots.sort(key=lambda spot: spot.tag)
+    level = request.args.get("level")
+    if level is not None:
+        try:
+            level = int(level)
+        except ValueError:
+            level = -1
+        if not 0 <= level < parking.levels:
+            return {
+                "status": "error",
+                "message": "INVALID_LEVEL"
+            }, 400
+
+    spots = parking.get_available_spots(level)
     return {
         "status": "success",
         "spots": [{
@@ -263,6 +492,46 @@ def get_available_spots(parking_id: str) -> Dict[str, Any]:
         } for spot in spots]
     }, 200
 
+@server.get("/api/parkings/<parking_id>/events")
+def get_parking_events(parking_id: str) -> Response:
+    """
+    Flux Server-Sent Events des changements d'occupation d'un parking.
+
+    Les événements 'park', 'unpark', 'subscribe' et 'unsubscribe' sont envoyés
+    après la validation du changement, avec l'identifiant et l'étage de la
+    place concernée. Un événement 'reset' signale que des événements ont été
+    perdus : l'état complet doit être rechargé.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Sortie :
+    - Response : Flux d'événements.
+    """
+    if not session.query(exists().where(Parking.id == parking_id)).scalar():
+        return {
+            "status": "error",
+            "message": "PARKING_NOT_FOUND"
+        }, 404
+
+    # Le flux n'utilise pas la base de données : la session est libérée à la fin de la requête.
+    # L'abonnement est fait au début du flux, pour être toujours libéré à sa fermeture.
+    def stream():
+        subscriber = events.broker.subscribe(parking_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                messages = subscriber.pull(events.EVENTS_HEARTBEAT_INTERVAL)
+                # Un commentaire maintient la connexion et détecte les clients déconnectés
+                yield "".join(messages) if messages else ": keep-alive\n\n"
+        finally:
+            events.broker.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @server.post('/api/parkings/<parking_id>/spots/<spot_id>/park')
 def park_car(parking_id: str, spot_id: str) -> Dict[str, Any]:
     """
@@ -310,25 +579,144 @@ def park_car(parking_id: str, spot_id: str) -> Dict[str, Any]:
             "message": "CAR_NOT_FOUND"
         }, 404
 
-    if car.spot:
+    # Mise à jour conditionnelle : une place prise ou une voiture déjà garée lève une ParkingError
+    car.park(spot)
+
+    return {
+        "status": "success",
+        "car": car.to_dict()
+    }, 200
+
+
+@server.post('/api/parkings/<parking_id>/park')
+def assign_car(parking_id: str) -> Dict[str, Any]:
+    """
+    Gare une voiture sur une place choisie par le serveur.
+
+    La place est choisie dans l'index d'occupation du parking selon une
+    politique d'attribution : "lowest_level" (étage le plus bas, par défaut),
+    "fill_evenly" (étage le moins rempli) ou "nearest_entrance" (place la plus
+    proche du tag `entrance`).
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Entrée :
+    - dict : Plaque d'immatriculation de la voiture, politique et entrée (optionnelles).
+
+    Sortie :
+    - dict : Voiture garée et place attribuée.
+    """
+    parking = session.get(Parking, parking_id)
+
+    if not parking:
+        return {
+            "status": "error",
+            "message": "PARKING_NOT_FOUND"
+        }, 404
+
+    data = request.json
+
+    if not data:
         return {
             "status": "error",
-            "message": "CAR_ALREADY_PARKED"
+            "message": "NO_DATA"
         }, 400
-    
-    if spot.is_taken:
+
+    car = session.query(Car).filter_by(license_plate=data.get("license_plate")).first()
+
+    if not car:
         return {
             "status": "error",
-            "message": "SPOT_ALREADY_TAKEN"
+            "message": "CAR_NOT_FOUND"
+        }, 404
+
+    # Place prise entre-temps : une autre place est choisie ; politique invalide, parking complet... : ParkingError
+    spot = parking.assign_spot(car, data.get("policy", "lowest_level"), data.get("entrance"))
+
+    return {
+        "status": "success",
+        "car": car.to_dict(),
+        "spot": {
+            "id": spot.id,
+            "level": spot.level,
+            "tag": spot.tag
+        }
+    }, 200
+
+@server.post('/api/parkings/<parking_id>/operations')
+def apply_parking_operations(parking_id: str) -> Dict[str, Any]:
+    """
+    Applique un lot de stationnements et de départs (bornes d'entrée et de sortie).
+
+    Les opérations sont appliquées dans l'ordre et validées ensemble ; une
+    opération impossible n'empêche pas les suivantes et son résultat porte le
+    code d'erreur habituel (CAR_NOT_FOUND, SPOT_ALREADY_TAKEN...).
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Entrée :
+    - dict : Liste `operations` (voir `Parking.apply_operations`).
+
+    Sortie :
+    - dict : Résultat de chaque opération, dans l'ordre.
+    """
+    parking = session.get(Parking, parking_id)
+
+    if not parking:
+        return {
+            "status": "error",
+            "message": "PARKING_NOT_FOUND"
+        }, 404
+
+    data = request.json
+
+    if not data or not isinstance(data.get("operations"), list):
+        return {
+            "status": "error",
+            "message": "NO_DATA"
+        }, 400
+
+    if len(data["operations"]) > BATCH_MAX_OPERATIONS:
+        return {
+            "status": "error",
+            "message": "TOO_MANY_OPERATIONS"
         }, 400
-    
-    car.park(spot)
 
     return {
         "status": "success",
-        "car": car.to_dict()
+        "results": parking.apply_operations(data["operations"])
     }, 200
 
+@server.post('/api/parkings/<parking_id>/stream')
+def ingest_parking_events(parking_id: str) -> Response:
+    """
+    Ingestion d'un flux continu d'événements d'entrée et de sortie (caméras de lecture de plaques).
+
+    Le corps de la requête est lu au fil de l'eau, une opération JSON par
+    ligne (voir `Parking.apply_operations`). Les événements sont appliqués par
+    petits lots et chaque lot est acquitté dès sa validation, une ligne
+    NDJSON par événement. Le client qui n'en lit pas les acquittements est
+    ralenti : la lecture de son flux est suspendue.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Sortie :
+    - Response : Flux des acquittements.
+    """
+    if not session.query(exists().where(Parking.id == parking_id)).scalar():
+        return {
+            "status": "error",
+            "message": "PARKING_NOT_FOUND"
+        }, 404
+
+    # Le flux est lu après la fin de la requête : chaque lot utilise sa propre transaction
+    return Response(ingestion.ingest(parking_id, request.stream), mimetype="application/x-ndjson", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 @server.post('/api/parkings/<parking_id>/spots/<spot_id>/unpark')
 def unpark_car(parking_id: str, spot_id: str) -> Dict[str, Any]:
@@ -358,13 +746,15 @@ def unpark_car(parking_id: str, spot_id: str) -> Dict[str, Any]:
             "message": "SPOT_NOT_FOUND"
         }, 404
 
-    if not spot.is_taken:
+    car = spot.car
+
+    if not spot.is_taken or car is None:
         return {
             "status": "error",
             "message": "SPOT_NOT_TAKEN"
         }, 400
 
-    car = spot.car
+    # Mise à jour conditionnelle : une place libérée entre-temps lève une ParkingError
     car.unpark()
 
     return {
@@ -372,6 +762,29 @@ def unpark_car(parking_id: str, spot_id: str) -> Dict[str, Any]:
         "car": car.to_dict()
     }, 200
 
+@server.get("/api/parkings/<parking_id>/history")
+def get_parking_history(parking_id: str) -> Dict[str, Any]:
+    """
+    Récupère les stationnements terminés d'un parking qui chevauchent une
+    période (arrivée avant `end`, départ à partir de `start`), du départ le
+    plus récent au plus ancien (voir `history_page`).
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Sortie :
+    - dict : Stationnements du parking.
+    """
+    parking = session.get(Parking, parking_id)
+
+    if not parking:
+        return {
+            "status": "error",
+            "message": "PARKING_NOT_FOUND"
+        }, 404
+
+    return history_page(parking)
+
 @server.get("/api/parkings/<parking_id>/subscriptions")
 def get_parking_subscriptions(parking_id: str) -> Dict[str, Any]:
     """
@@ -391,7 +804,18 @@ def get_parking_subscriptions(parking_id: str) -> Dict[str, Any]:
             "message": "PARKING_NOT_FOUND"
         }, 404
 
-    subscriptions = sorted(parking.subscriptions, key=lambda subscription: subscription.spot.tag)
+    # Places et personnes chargées avec les abonnements, en une seule requête
+    subscriptions = (
+        session.query(Subscription)
+        .join(Subscription.spot)
+        .filter(Subscription.parking_id == parking.id)
+        .options(
+            contains_eager(Subscription.spot),
+            joinedload(Subscription.person).load_only(Person.first_name, Person.last_name)
+        )
+        .order_by(Spot.tag)
+        .all()
+    )
     return {
         "status": "success",
         "subscriptions": [
@@ -496,6 +920,13 @@ def create_subscription(parking_id: str) -> Dict[str, Any]:
         parking=parking
     )
     subscription.save(session)
+    parking.bump_version(session)
+    after_commit(occupancy.update_spot, spot.parking_id, spot.level, spot.spot, is_reserved=True)
+    after_commit(events.publish, spot.parking_id, "subscribe", {
+        "spot": spot.id,
+        "level": spot.level,
+        "subscription": subscription.id
+    })
 
     return {
         "status": "success",
@@ -541,13 +972,151 @@ def delete_subscription(parking_id: str, subscription_id: str) -> Dict[str, Any]
             "message": "SUBSCRIPTION_NOT_FOUND"
         }, 404
 
-    subscription.delete()
+    spot = subscription.spot
+    if subscription.parking:
+        subscription.parking.bump_version(session)
+    subscription.delete(session)
+
+    if spot:
+        after_commit(occupancy.update_spot, spot.parking_id, spot.level, spot.spot, is_reserved=False, is_bad_parked=False)
+        after_commit(events.publish, spot.parking_id, "unsubscribe", {
+            "spot": spot.id,
+            "level": spot.level,
+            "subscription": subscription_id
+        })
 
     return {
         "status": "success",
     }, 200
 
+def parking_statistics_statements(parking_id: str) -> Dict[str, Select]:
+    """
+    Requêtes des statistiques d'un parking.
+
+    Partagées par la route `/api/parkings/<parking_id>/statistics` et le mode
+    ASGI (voir `asgi.py`), qui les exécute avec le moteur asynchrone.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Sortie :
+    - dict : Requêtes, à passer dans l'ordre à `format_parking_statistics`.
+    """
+    # Nombre de places, de places libres et de places réservées par étage
+    is_reserved = exists().where(Subscription.spot_id == Spot.id)
+    spots_by_level = (
+        select(
+            Spot.level,
+            func.count(Spot.id),
+            func.sum(case((and_(Spot.is_taken == False, ~is_reserved), 1), else_=0)),
+            func.sum(case((is_reserved, 1), else_=0))
+        )
+        .where(Spot.parking_id == parking_id)
+        .group_by(Spot.level)
+    )
+
+    # Nombre de voitures garées dans le parking, par marque
+    car_brands = (
+        select(Car.brand, func.count(Car.id))
+        .join(Spot, Spot.car_id == Car.id)
+        .where(Spot.parking_id == parking_id)
+        .group_by(Car.brand)
+    )
+
+    total_subscriptions = (
+        select(func.count(Subscription.id))
+        .where(Subscription.parking_id == parking_id)
+    )
+
+    # Voitures garées sur une place réservée à une autre personne
+    owner = aliased(Person)
+    subscriber = aliased(Person)
+    cars_bad_parked = (
+        select(
+            Car.id, Car.brand, Car.color, Car.license_plate,
+            owner.id, owner.first_name, owner.last_name,
+            Spot.id, Spot.tag,
+            subscriber.id, subscriber.first_name, subscriber.last_name
+        )
+        .join(Spot, Spot.car_id == Car.id)
+        .join(Subscription, Subscription.spot_id == Spot.id)
+        .join(owner, owner.id == Car.owner_id)
+        .join(subscriber, subscriber.id == Subscription.person_id)
+        .where(
+            Spot.parking_id == parking_id,
+            Spot.is_taken == True,
+            Subscription.person_id != Car.owner_id
+        )
+        .order_by(Spot.tag)
+    )
+
+    return {
+        "spots_by_level": spots_by_level,
+        "car_brands": car_brands,
+        "total_subscriptions": total_subscriptions,
+        "cars_bad_parked": cars_bad_parked
+    }
+
+def format_parking_statistics(
+        spots_by_level: List[Row],
+        car_brands: List[Row],
+        total_subscriptions: int,
+        cars_bad_parked: List[Row]
+    ) -> Dict[str, Any]:
+    """
+    Mise en forme des résultats des requêtes de `parking_statistics_statements`.
+
+    Sortie :
+    - dict : Statistiques du parking.
+    """
+    levels = {level: count for level, count, _, _ in spots_by_level}
+    total_spots = sum(levels.values())
+    available_spots = sum(available for _, _, available, _ in spots_by_level)
+    reserved_spots = sum(reserved for _, _, _, reserved in spots_by_level)
+    car_brands = dict(car_brands)
+
+    return {
+        "total_spots": total_spots,
+        "total_levels": len(levels),
+        "total_cars": sum(car_brands.values()),
+        "total_subscriptions": total_subscriptions,
+        "available_spots": available_spots,
+        "taken_spots": total_spots - available_spots,
+        "reserved_spots": reserved_spots,
+        "not_reserved_spots": total_spots - reserved_spots,
+        "car_brands": car_brands,
+        "cars_bad_parked": [{
+            "id": car_id,
+            "brand": brand,
+            "color": color,
+            "license_plate": license_plate,
+            "owner": {
+                "id": owner_id,
+                "first_name": owner_first_name,
+                "last_name": owner_last_name
+            },
+            "spot": {
+                "id": spot_id,
+                "tag": spot_tag,
+                "owner": {
+                    "id": subscriber_id,
+                    "first_name": subscriber_first_name,
+                    "last_name": subscriber_last_name
+                }
+            }
+        }
+        for (
+            car_id, brand, color, license_plate,
+            owner_id, owner_first_name, owner_last_name,
+            spot_id, spot_tag,
+            subscriber_id, subscriber_first_name, subscriber_last_name
+        ) in cars_bad_parked],
+
+        "levels": levels
+    }
+
 @server.get("/api/parkings/<parking_id>/statistics")
+@versioned
 def get_parking_statistics(parking_id: str) -> Dict[str, Any]:
     """
     Récupère les statistiques d'un parking.
@@ -565,62 +1134,16 @@ def get_parking_statistics(parking_id: str) -> Dict[str, Any]:
             "status": "error",
             "message": "PARKING_NOT_FOUND"
         }, 404
-    
-    available_spots = len(parking.get_available_spots())
-    taken_spots = len(parking.spots) - available_spots
-
-    reserved_spots = len(parking.get_reserved_spots())
-    not_reserved_spots = len(parking.spots) - reserved_spots
-
-    cars = session.query(Car).all()
-    car_brands = {}
-
-    for car in cars:
-        if car.spot and car.spot.parking.id == parking_id:
-            car_brands[car.brand] = car_brands.get(car.brand, 0) + 1
-
-    cars_bad_parked = [car for car in cars if car.is_bad_parked() and car.spot.parking.id == parking_id]
-
-    levels = {}
-    for spot in parking.spots:
-        levels[spot.level] = levels.get(spot.level, 0) + 1
 
+    statements = parking_statistics_statements(parking_id)
     return {
         "status": "success",
-        "statistics": {
-            "total_spots": len(parking.spots),
-            "total_levels": len(levels),
-            "total_cars": len([car for car in cars if car.spot and car.spot.parking.id == parking_id]),
-            "total_subscriptions": len(parking.subscriptions),
-            "available_spots": available_spots,
-            "taken_spots": taken_spots,
-            "reserved_spots": reserved_spots,
-            "not_reserved_spots": not_reserved_spots,
-            "car_brands": car_brands,
-            "cars_bad_parked": [{
-                "id": car.id,
-                "brand": car.brand,
-                "color": car.color,
-                "license_plate": car.license_plate,
-                "owner": {
-                    "id": car.owner.id,
-                    "first_name": car.owner.first_name,
-                    "last_name": car.owner.last_name
-                },
-                "spot": {
-                    "id": car.spot.id,
-                    "tag": car.spot.tag,
-                    "owner": {
-                        "id": car.spot.subscription.person.id,
-                        "first_name": car.spot.subscription.person.first_name,
-                        "last_name": car.spot.subscription.person.last_name
-                    }
-                }
-            }
-            for car in cars_bad_parked],
-
-            "levels": levels
-        }
+        "statistics": format_parking_statistics(
+            session.execute(statements["spots_by_level"]).all(),
+            session.execute(statements["car_brands"]).all(),
+            session.execute(statements["total_subscriptions"]).scalar(),
+            session.execute(statements["cars_bad_parked"]).all()
+        )
     }, 200
 
 @server.get("/api/cars")
@@ -628,13 +1151,48 @@ def get_cars() -> Dict[str, Any]:
     """
     Récupère la liste des voitures.
 
+    Paramètres :
+    - limit (int) OPTIONNEL : Nombre de voitures par page.
+    - cursor (str) OPTIONNEL : Curseur de la page suivante.
+    - parked (bool) OPTIONNEL : Voitures garées ou non.
+    - owner (str) OPTIONNEL : Identifiant du propriétaire.
+
     Sortie :
     - dict : Liste des voitures
     """
-    cars = session.query(Car).order_by(Car.license_plate).all()
+    # Seuls les identifiants du propriétaire et de la place sont renvoyés
+    query = session.query(Car).options(
+        joinedload(Car.owner).load_only(Person.id),
+        joinedload(Car.spot).load_only(Spot.id)
+    )
+
+    parked = request.args.get("parked")
+    if parked is not None:
+        parked = parse_bool(parked)
+        if parked is None:
+            return {
+                "status": "error",
+                "message": "INVALID_PARKED"
+            }, 400
+
+        is_parked = Car.spot.has()
+        query = query.filter(is_parked if parked else ~is_parked)
+
+    owner_id = request.args.get("owner")
+    if owner_id is not None:
+        query = query.filter(Car.owner_id == owner_id)
+
+    cursor = request.args.get("cursor")
+    cars, next_cursor = paginate(
+        query,
+        [Car.license_plate, Car.id],
+        parse_limit(request.args.get("limit"), cursor),
+        cursor
+    )
     return {
         "status": "success",
-        "cars": [car.to_dict() for car in cars]
+        "cars": [car.to_dict() for car in cars],
+        "next_cursor": next_cursor
     }, 200
 
 @server.post("/api/cars/create")
@@ -680,7 +1238,7 @@ def create_car() -> Dict[str, Any]:
             "message": "INVALID_MODEL"
         }, 400
 
-    if not license_plate or not re.match(r"^[A-Z]{2}[0-9]{3}[A-Z]{2}$", license_plate):
+    if not license_plate or not plates.PLATE_PATTERN.match(license_plate):
         return {
             "status": "error",
             "message": "INVALID_LICENSE_PLATE"
@@ -700,12 +1258,6 @@ def create_car() -> Dict[str, Any]:
             "message": "OWNER_NOT_FOUND"
         }, 404
     
-    if session.query(Car).filter_by(license_plate=license_plate).first():
-        return {
-            "status": "error",
-            "message": "CAR_ALREADY_EXISTS"
-        }, 400
-    
     car = Car(
         license_plate=license_plate,
         brand=brand,
@@ -714,13 +1266,84 @@ def create_car() -> Dict[str, Any]:
         owner=owner
     )
 
-    car.save(session)
+    # L'unicité de la plaque est garantie par l'index unique 'ix_cars_license_plate'
+    try:
+        car.save(session)
+    except IntegrityError:
+        session.rollback()
+        return {
+            "status": "error",
+            "message": "CAR_ALREADY_EXISTS"
+        }, 400
+
+    # Ajout de la plaque à l'index de recherche une fois la transaction validée
+    after_commit(plates.add_plate, license_plate, session=session)
 
     return {
         "status": "success",
         "car": car.to_dict()
     }, 201
 
+@server.get("/api/cars/search")
+def search_cars() -> Dict[str, Any]:
+    """
+    Recherche des voitures par plaque d'immatriculation, dans l'index des plaques.
+
+    Paramètres :
+    - q (str) : Plaque ou début de plaque (espaces et tirets ignorés).
+    - mode (str) OPTIONNEL : "fuzzy" (par défaut) pour les plaques à un
+      caractère près (caractère mal lu, oublié ou en trop), "prefix" pour les
+      plaques commençant par `q`.
+    - limit (int) OPTIONNEL : Nombre maximal de voitures (20 par défaut).
+
+    Sortie :
+    - dict : Voitures trouvées, avec leur distance à la plaque recherchée
+      (mode "fuzzy") ou le nombre total de plaques correspondantes (mode "prefix").
+    """
+    query = plates.normalize(request.args.get("q", ""))
+
+    if not query:
+        return {
+            "status": "error",
+            "message": "INVALID_QUERY"
+        }, 400
+
+    mode = request.args.get("mode", "fuzzy")
+
+    if mode not in ("fuzzy", "prefix"):
+        return {
+            "status": "error",
+            "message": "INVALID_MODE"
+        }, 400
+
+    limit = parse_limit(request.args.get("limit"), None) or plates.PLATE_SEARCH_LIMIT
+    index = Car.plate_index()
+
+    if mode == "prefix":
+        found, total = index.search_prefix(query, limit)
+        distances = {}
+    else:
+        matches = index.search_fuzzy(query, limit)
+        found, total = [plate for plate, _ in matches], None
+        distances = dict(matches)
+
+    cars = {car.license_plate: car for car in session.query(Car).options(
+        joinedload(Car.owner).load_only(Person.id),
+        joinedload(Car.spot).load_only(Spot.id)
+    ).filter(Car.license_plate.in_(found))} if found else {}
+
+    result = {
+        "status": "success",
+        # Une plaque de l'index absente de la base (index pas encore reconstruit) est ignorée
+        "cars": [
+            dict(cars[plate].to_dict(), **({"distance": distances[plate]} if plate in distances else {}))
+            for plate in found if plate in cars
+        ]
+    }
+    if total is not None:
+        result["total"] = total
+    return result, 200
+
 @server.get("/api/cars/<car_id>")
 def get_car(car_id: str) -> Dict[str, Any]:
     """
@@ -765,18 +1388,111 @@ def get_car(car_id: str) -> Dict[str, Any]:
         }
     }, 200
 
+@server.get("/api/cars/<car_id>/history")
+def get_car_history(car_id: str) -> Dict[str, Any]:
+    """
+    Récupère les stationnements terminés d'une voiture, du plus récent au plus
+    ancien (voir `history_page`), et son stationnement en cours.
+
+    Paramètres :
+    - car_id (str) : Identifiant de la voiture.
+
+    Sortie :
+    - dict : Stationnements de la voiture.
+    """
+    car = session.get(Car, car_id)
+
+    if not car:
+        return {
+            "status": "error",
+            "message": "CAR_NOT_FOUND"
+        }, 404
+
+    result, status = history_page(car)
+
+    if status == 200:
+        spot = car.spot
+        result["current"] = {
+            "spot": spot.id,
+            "parking": spot.parking_id,
+            "entered_at": history.format_time(spot.parked_at)
+        } if spot else None
+
+    return result, status
+
 @server.get("/api/persons")
 def get_persons() -> Dict[str, Any]:
     """
     Récupère la liste des personnes.
 
+    Paramètres :
+    - limit (int) OPTIONNEL : Nombre de personnes par page.
+    - cursor (str) OPTIONNEL : Curseur de la page suivante.
+    - subscribed (bool) OPTIONNEL : Personnes abonnées à un parking ou non.
+
     Sortie :
     - dict : Liste des personnes
     """
-    persons = session.query(Person).order_by(Person.first_name).all()
+    # Seuls les identifiants des voitures et des abonnements sont renvoyés
+    query = session.query(Person).options(
+        selectinload(Person.cars).load_only(Car.id),
+        selectinload(Person.subscriptions).load_only(Subscription.id)
+    )
+
+    subscribed = request.args.get("subscribed")
+    if subscribed is not None:
+        subscribed = parse_bool(subscribed)
+        if subscribed is None:
+            return {
+                "status": "error",
+                "message": "INVALID_SUBSCRIBED"
+            }, 400
+
+        is_subscribed = Person.subscriptions.any()
+        query = query.filter(is_subscribed if subscribed else ~is_subscribed)
+
+    cursor = request.args.get("cursor")
+    persons, next_cursor = paginate(
+        query,
+        [Person.first_name, Person.id],
+        parse_limit(request.args.get("limit"), cursor),
+        cursor
+    )
+    return {
+        "status": "success",
+        "persons": [person.to_dict() for person in persons],
+        "next_cursor": next_cursor
+    }, 200
+
+@server.get("/api/persons/search")
+def search_persons() -> Dict[str, Any]:
+    """
+    Recherche des personnes par prénom et nom, dans l'index des noms.
+
+    Paramètres :
+    - q (str) : Début(s) du prénom et du nom, dans n'importe quel ordre (accents
+      et majuscules ignorés).
+    - limit (int) OPTIONNEL : Nombre maximal de personnes (10 par défaut).
+
+    Sortie :
+    - dict : Personnes trouvées, avec les seuls champs affichés par les listes de
+      choix, et nombre total de personnes correspondantes.
+    """
+    query = request.args.get("q", "")
+
+    if not names.tokenize(query):
+        return {
+            "status": "error",
+            "message": "INVALID_QUERY"
+        }, 400
+
+    limit = parse_limit(request.args.get("limit"), None) or names.NAME_SEARCH_LIMIT
+    found, total = Person.name_index().search(query, limit)
+
     return {
         "status": "success",
-        "persons": [person.to_dict() for person in persons]
+        "persons": [entry._asdict() for entry in found],
+        "total": total
     }, 200
 
 @server.post("/api/persons/create")
@@ -826,7 +1542,9 @@ def create_person() -> Dict[str, Any]:
         birth_date=birth_date
     )
 
-    person.save()
+    person.save(session)
+    # Ajoute la personne à l'index des noms une fois la transaction validée
+    after_commit(names.add_person, person.id, first_name, last_name, birth_date, session=session)
 
     return {
         "status": "success",
@@ -0,0 +1,42 @@
+import contextlib
+import os
+from typing import Iterator, List
+
+# Les tests utilisent une base de données SQLite en mémoire, et non la base de développement
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import event
+from utils.sqlalchemy import Base, Session, engine
+from utils import history
+import classes  # noqa: F401 (enregistre les tables dans Base.metadata)
+
+def reset_database() -> None:
+    """
+    Vide la base de données de test en recréant toutes les tables (y compris celles de l'historique).
+    """
+    Session.remove()
+    with engine.begin() as connection:
+        history.drop_partitions(connection)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+@contextlib.contextmanager
+def count_statements() -> Iterator[List[str]]:
+    """
+    Enregistre les requêtes SQL exécutées dans le bloc.
+
+    Sortie :
+    - List[str] : Requêtes exécutées, complétée à la sortie du bloc.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+reset_database()
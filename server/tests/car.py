@@ -1,7 +1,14 @@
 import unittest
-from unittest.mock import MagicMock
-from classes import Car, Person, Parking, Subscription
-from utils.sqlalchemy import Session
+from tests import count_statements, reset_database
+from unittest.mock import MagicMock, patch
+from classes import Car, Person, Parking, Subscription, ParkingError
+from utils.sqlalchemy import Session, engine
+from utils import events, history, plates
+from utils.pagination import PaginationError, encode_cursor
+from datetime import datetime
+from sqlalchemy import Table
+from sqlalchemy.exc import IntegrityError, OperationalError
+from server import server
 
 class TestCar(unittest.TestCase):
 
@@ -11,6 +18,9 @@ class TestCar(unittest.TestCase):
         self.parking = Parking("Parking Test", "1 rue de la Paix", "75000", "Paris", 5, 30)
         self.subscription = Subscription(Person("Jane", "Doe", "2000-01-01"), self.parking, self.parking.spots[0])
 
+    def tearDown(self):
+        reset_database()
+
     def test_car_initialization(self):
         self.assertEqual(self.car.license_plate, "ABC123")
         self.assertEqual(self.car.brand, "Toyota")
@@ -41,6 +51,114 @@ class TestCar(unittest.TestCase):
         self.assertIsNone(self.parking.spots[0].car)
         self.assertFalse(self.parking.spots[0].is_taken)
 
+    def test_park_taken_spot(self):
+        self.car.park(self.parking.spots[1])
+        other = Car("DEF456", "Renault", "Clio", "Red", Person("Jack", "Doe", "2000-01-01"))
+        with self.assertRaises(ParkingError) as context:
+            other.park(self.parking.spots[1])
+        self.assertEqual(context.exception.message, "SPOT_ALREADY_TAKEN")
+        self.assertIsNone(other.spot)
+
+    def test_park_already_parked(self):
+        self.car.park(self.parking.spots[1])
+        with self.assertRaises(ParkingError) as context:
+            self.car.park(self.parking.spots[2])
+        self.assertEqual(context.exception.message, "CAR_ALREADY_PARKED")
+        self.assertFalse(self.parking.spots[2].is_taken)
+
+    def test_unpark_not_parked(self):
+        with self.assertRaises(ParkingError) as context:
+            self.car.unpark()
+        self.assertEqual(context.exception.message, "SPOT_NOT_TAKEN")
+
+    def test_plate_index(self):
+        Car("AB120CD", "Renault", "Clio", "Red", self.owner).save(Session)
+        Car("AB128CD", "Renault", "Clio", "Red", self.owner).save(Session)
+        Car("AB12OCD", "Renault", "Clio", "Red", self.owner)  # Hors format : non indexée
+        self.car.save(Session, commit=True)
+        plates.drop_index()
+
+        index = Car.plate_index()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search_fuzzy("AB12OCD"), [("AB120CD", 1), ("AB128CD", 1)])
+        self.assertEqual(index.search_fuzzy("AB12BCD"), [("AB128CD", 1), ("AB120CD", 1)])
+        self.assertEqual(index.search_fuzzy("AB120C"), [("AB120CD", 1)])
+        self.assertEqual(index.search_prefix(plates.normalize("ab-12")), (["AB120CD", "AB128CD"], 2))
+
+        plates.add_plate("AB121CD")
+        self.assertIn("AB121CD", index)
+        plates.drop_index()
+
+    def test_history(self):
+        spot = self.parking.spots[1]
+        for _ in range(3):
+            self.car.park(spot)
+            self.assertIsNotNone(spot.parked_at)
+            self.car.unpark()
+        Session.commit()
+
+        sessions, cursor = self.car.history(limit=2)
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(sessions[0]["spot"], spot.id)
+        self.assertGreaterEqual(sessions[0]["left_at"], sessions[0]["entered_at"])
+        self.assertGreater(sessions[0]["entered_at"], sessions[1]["left_at"])
+        sessions, cursor = self.car.history(limit=2, cursor=cursor)
+        self.assertEqual((len(sessions), cursor), (1, None))
+        # Un curseur aux valeurs non scalaires est refusé
+        with self.assertRaises(PaginationError):
+            self.car.history(limit=2, cursor=encode_cursor([{"a": 1}, "x"]))
+
+        # Un départ annulé n'est pas enregistré
+        self.car.park(spot)
+        Session.commit()
+        self.car.unpark()
+        Session.rollback()
+        self.assertEqual(len(self.parking.history()[0]), 3)
+
+    def test_history_period(self):
+        self.parking.save(Session)
+        stays = {
+            "january": (datetime(2025, 1, 10), datetime(2025, 1, 11)),
+            "overlap": (datetime(2025, 1, 31, 22), datetime(2025, 2, 1, 2)),
+            "long": (datetime(2025, 1, 20), datetime(2025, 3, 5)),
+            "march": (datetime(2025, 3, 10), datetime(2025, 3, 11)),
+        }
+        for name, (entered_at, left_at) in stays.items():
+            history.record(Session, name, self.parking.spots[0].id, self.parking.id, entered_at, left_at)
+        Session.commit()
+
+        def cars(start, end):
+            return [session["car"] for session in self.parking.history(start, end)[0]]
+
+        self.assertEqual(cars(datetime(2025, 2, 1), datetime(2025, 2, 2)), ["long", "overlap"])
+        self.assertEqual(cars(datetime(2025, 1, 10, 12), datetime(2025, 1, 21)), ["long", "january"])
+        self.assertEqual(cars(datetime(2025, 3, 6), None), ["march"])
+        self.assertEqual(cars(None, datetime(2025, 1, 15)), ["january"])
+
+    def test_history_partitions(self):
+        def partitions():
+            with engine.connect() as connection:
+                return history._read_partitions(connection)
+
+        # Les tables du mois en cours et du suivant sont créées au début de la transaction
+        current = history.month_of(history.utcnow())
+        Session.execute(history.partition(current).select()).all()
+        self.assertLessEqual({current, history.next_month(current)}, partitions())
+
+        # Une autre table est créée dans sa propre transaction, conservée si la requête est annulée
+        history.ensure_partition(Session, (2020, 1))
+        Session.rollback()
+        self.assertIn((2020, 1), partitions())
+
+        # Table créée en même temps par un autre worker : l'échec de la création est ignoré
+        error = OperationalError("CREATE TABLE", {}, Exception("table already exists"))
+        history._partitions.discard((2020, 1))
+        with patch.object(Table, "create", side_effect=error):
+            self.assertEqual(history.ensure_partition(Session, (2020, 1)).name, "parking_history_202001")
+            with self.assertRaises(OperationalError):
+                history.ensure_partition(Session, (2020, 2))
+        self.assertNotIn((2020, 2), partitions())
+
     def test_is_bad_parked(self):
         self.car.park(self.parking.spots[0])
         self.assertTrue(self.car.is_bad_parked())
@@ -48,5 +166,111 @@ class TestCar(unittest.TestCase):
         self.subscription.person = self.car.owner
         self.assertFalse(self.car.is_bad_parked())
 
+    def test_unique_license_plate(self):
+        self.car.save(Session)
+        duplicate = Car("ABC123", "Renault", "Clio", "Red", Person("Jack", "Doe", "2000-01-01"))
+        with self.assertRaises(IntegrityError):
+            duplicate.save(Session)
+        Session.rollback()
+
+    def test_park_after_commit(self):
+        self.parking.save(Session, commit=True)
+        index = self.parking.occupancy
+
+        self.car.park(self.parking.spots[1])
+        self.assertTrue(index.is_free(0, 1))
+        Session.commit()
+        self.assertTrue(index.is_taken(0, 1))
+
+    def test_park_rollback(self):
+        self.parking.save(Session, commit=True)
+        index = self.parking.occupancy
+
+        self.car.park(self.parking.spots[1])
+        Session.rollback()
+        self.assertTrue(index.is_free(0, 1))
+        Session.commit()
+        self.assertTrue(index.is_free(0, 1))
+
+    def test_park_bad_parked_index(self):
+        self.parking.save(Session, commit=True)
+        index = self.parking.occupancy
+
+        self.car.park(self.parking.spots[0])
+        Session.commit()
+        self.assertEqual(index.bad_parked_count(), 1)
+
+        self.car.unpark()
+        Session.commit()
+        self.assertEqual(index.bad_parked_count(), 0)
+
+    def test_park_events(self):
+        self.parking.save(Session, commit=True)
+        subscriber = events.broker.subscribe(self.parking.id)
+
+        self.car.park(self.parking.spots[1])
+        self.assertEqual(subscriber.pull(0), [])
+        Session.commit()
+
+        messages = subscriber.pull(0)
+        self.assertEqual(len(messages), 1)
+        self.assertIn("event: park", messages[0])
+        self.assertIn(self.parking.spots[1].id, messages[0])
+        events.broker.unsubscribe(subscriber)
+        self.assertEqual(events.broker.count(self.parking.id), 0)
+
+    def test_list_route(self):
+        client = server.test_client()
+        self.parking.save(Session)
+        for plate in ("AB100CD", "AB101CD", "AB102CD"):
+            Car(plate, "Renault", "Clio", "Red", self.owner).save(Session)
+        self.car.park(self.parking.spots[1])
+        Session.commit()
+        owner_id = self.owner.id
+
+        # Première page, page suivante et fin de la liste
+        page = client.get("/api/cars?limit=2").json
+        self.assertEqual([car["license_plate"] for car in page["cars"]], ["AB100CD", "AB101CD"])
+        self.assertIsNotNone(page["next_cursor"])
+        page = client.get("/api/cars", query_string={"limit": 2, "cursor": page["next_cursor"]}).json
+        self.assertEqual([car["license_plate"] for car in page["cars"]], ["AB102CD", "ABC123"])
+        self.assertIsNone(page["next_cursor"])
+        self.assertEqual(len(client.get("/api/cars").json["cars"]), 4)
+
+        # Filtres
+        page = client.get("/api/cars?parked=true").json
+        self.assertEqual([car["license_plate"] for car in page["cars"]], ["ABC123"])
+        self.assertEqual(len(client.get("/api/cars?parked=false").json["cars"]), 3)
+        self.assertEqual(len(client.get("/api/cars", query_string={"owner": owner_id}).json["cars"]), 4)
+        self.assertEqual(client.get("/api/cars?parked=maybe").json["message"], "INVALID_PARKED")
+
+        # Curseurs et limites invalides
+        for cursor in ("not a cursor", encode_cursor(["AB100CD"]), encode_cursor([{"a": 1}, "x"])):
+            response = client.get("/api/cars", query_string={"cursor": cursor})
+            self.assertEqual((response.status_code, response.json["message"]), (400, "INVALID_CURSOR"))
+        for limit in ("0", "501", "abc", "-1", "\u00b2", "\u0663"):
+            response = client.get("/api/cars", query_string={"limit": limit})
+            self.assertEqual((response.status_code, response.json["message"]), (400, "INVALID_LIMIT"))
+
+    def test_list_route_statements(self):
+        client = server.test_client()
+        counts = []
+        for i in range(3):
+            parking = Parking(f"Parking {i}", "1 rue de la Paix", "75000", "Paris", 1, 4)
+            parking.save(Session)
+            for j in range(4):
+                car = Car(f"AB{i}{j}CD", "Renault", "Clio", "Red", Person("John", f"Doe {i}{j}", "2000-01-01"))
+                car.save(Session)
+                car.park(parking.spots[j])
+            Session.commit()
+
+            with count_statements() as statements:
+                self.assertEqual(len(client.get("/api/cars").json["cars"]), 4 * (i + 1))
+            counts.append(len(statements))
+
+        # Le nombre de requêtes ne dépend pas du nombre de voitures
+        self.assertEqual(counts, [counts[0]] * 3)
+        self.assertLessEqual(counts[0], 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,5 +1,15 @@
+import contextlib
+import io
+import json
 import unittest
-from classes import Parking, Spot
+from unittest.mock import patch
+from tests import count_statements, reset_database
+from classes import Car, Parking, Person, Spot, Subscription, ParkingError
+from utils.sqlalchemy import Session
+from utils import history, ingestion
+from sqlalchemy import inspect
+from server import server
+from scripts import seed
 
 class TestParking(unittest.TestCase):
 
@@ -13,6 +23,9 @@ class TestParking(unittest.TestCase):
             spots_per_level=2
         )
 
+    def tearDown(self):
+        reset_database()
+
     def test_initialization(self):
         self.assertEqual(self.parking.name, "Test Parking")
         self.assertEqual(self.parking.address, "123 Test St")
@@ -53,9 +66,406 @@ class TestParking(unittest.TestCase):
             self.assertFalse(spot.is_taken)
             self.assertIsNone(spot.subscription)
 
+    def test_get_available_spots_persisted(self):
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        self.parking.save(Session)
+        car.park(self.parking.spots[2])
+        Session.commit()
+        parking_id = self.parking.id
+        Session.expire_all()
+
+        # Seules les places libres de l'étage sont lues, sans charger les places du parking
+        parking = Session.get(Parking, parking_id)
+        spots = parking.get_available_spots(1)
+        self.assertEqual([(spot.level, spot.spot) for spot in spots], [(1, 1)])
+        self.assertIn("spots", inspect(parking).unloaded)
+        self.assertEqual(len(parking.get_available_spots()), 3)
+
     def test_get_reserved_spots(self):
         reserved_spots = self.parking.get_reserved_spots()
         self.assertEqual(len(reserved_spots), 0)
 
+    def test_generate_spot_rows(self):
+        rows = [row for batch in self.parking.generate_spot_rows(3) for row in batch]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([row["tag"] for row in rows], [spot.tag for spot in self.parking.spots])
+        self.assertEqual(len({row["id"] for row in rows}), 4)
+        self.assertTrue(all(row["parking_id"] == self.parking.id for row in rows))
+        self.assertTrue(all(not row["is_taken"] for row in rows))
+
+    def test_count_available_spots(self):
+        self.parking.spots[0].is_taken = True
+        self.assertEqual(self.parking.count_available_spots(), 3)
+        self.assertEqual(self.parking.count_available_spots(0), 1)
+        self.assertEqual(self.parking.count_available_spots(1), 2)
+
+    def test_occupancy(self):
+        index = self.parking.occupancy
+        self.assertEqual(index.first_free(), (0, 0))
+
+        index.set_taken(0, 0, True)
+        index.set_reserved(0, 1, True)
+        self.assertEqual(index.first_free(), (1, 0))
+        self.assertEqual(index.free_spots(), [(1, 0), (1, 1)])
+        self.assertEqual(index.free_spots(0), [])
+        self.assertEqual(index.reserved_spots(), [(0, 1)])
+        self.assertEqual(index.taken_count(), 1)
+        self.assertEqual(index.reserved_count(), 1)
+
+        index.set_taken(0, 0, False)
+        self.assertTrue(index.is_free(0, 0))
+        self.assertFalse(index.is_free(0, 1))
+
+    def test_find_free(self):
+        index = Parking("Find Parking", "1 rue de la Paix", "75000", "Paris", 3, 10).occupancy
+        index.set_taken(0, 0, True)
+        index.set_taken(0, 1, True)
+        index.set_taken(1, 5, True)
+        self.assertEqual(index.find_free(), (0, 2))
+        self.assertEqual(index.find_free("fill_evenly"), (2, 0))
+        self.assertEqual(index.find_free("nearest_entrance", (1, 5)), (1, 4))
+        self.assertEqual(index.find_free("nearest_entrance", (0, 0)), (0, 2))
+        self.assertEqual(index.find_free(exclude={0: 0b1111111111}), (1, 0))
+
+        for spot in range(10):
+            index.set_taken(1, spot, True)
+        self.assertEqual(index.find_free("nearest_entrance", (1, 5)), (0, 5))
+        self.assertIsNone(index.find_free(exclude={0: (1 << 10) - 1, 2: (1 << 10) - 1}))
+
+    def test_assign_spot(self):
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        other = Car("DEF456", "Renault", "Clio", "Red", Person("Jane", "Doe", "2000-01-01"))
+        self.parking.save(Session)
+
+        spot = self.parking.assign_spot(other, "nearest_entrance", "11")
+        self.assertEqual(spot.tag, "11")
+        self.assertEqual(other.spot, spot)
+
+        # L'index n'est mis à jour qu'après la validation : la place prise est ignorée au second essai
+        spot = self.parking.assign_spot(car, "nearest_entrance", "11")
+        self.assertEqual(spot.tag, "10")
+        self.assertEqual(car.spot, spot)
+
+        with self.assertRaises(ParkingError) as context:
+            self.parking.assign_spot(car)
+        self.assertEqual(context.exception.message, "CAR_ALREADY_PARKED")
+
+    def test_assign_spot_full(self):
+        self.parking.save(Session, commit=True)
+        for level in range(2):
+            for spot in range(2):
+                self.parking.occupancy.set_taken(level, spot, True)
+
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        with self.assertRaises(ParkingError) as context:
+            self.parking.assign_spot(car)
+        self.assertEqual(context.exception.message, "PARKING_FULL")
+
+    def test_assign_spot_stale_index(self):
+        self.parking.save(Session, commit=True)
+        parking_id = self.parking.id
+        index = self.parking.occupancy
+
+        # Places supprimées par un autre processus, sans changement de version du parking
+        Session.query(Spot).filter(Spot.parking_id == parking_id, Spot.level == 0).delete()
+        Session.commit()
+
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        spot = self.parking.assign_spot(car)
+        self.assertEqual((spot.level, spot.spot), (1, 0))
+        self.assertIsNot(self.parking.occupancy, index)
+        Session.commit()
+
+        # Aucune place restante : le parking est complet, sans erreur interne
+        Session.query(Spot).filter(Spot.parking_id == parking_id, Spot.level == 1, Spot.spot == 1).delete()
+        Session.commit()
+        with self.assertRaises(ParkingError) as context:
+            self.parking.assign_spot(Car("DEF456", "Renault", "Clio", "Red", Person("Jane", "Doe", "2000-01-01")))
+        self.assertEqual(context.exception.message, "PARKING_FULL")
+
+    def test_apply_operations(self):
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        other = Car("DEF456", "Renault", "Clio", "Red", Person("Jane", "Doe", "2000-01-01"))
+        self.parking.save(Session)
+        car.save(Session)
+        other.save(Session, commit=True)
+        spot = self.parking.spots[3]
+
+        results = self.parking.apply_operations([
+            {"action": "park", "license_plate": "ABC123", "spot": spot.id},
+            {"action": "park", "license_plate": "DEF456", "spot": spot.id},
+            {"action": "park", "license_plate": "DEF456"},
+            {"action": "park", "license_plate": "XYZ789"},
+            {"action": "unpark", "license_plate": "ABC123"},
+            {"action": "unpark", "spot": spot.id},
+            {"action": "leave", "license_plate": "ABC123"},
+            {"action": "park", "license_plate": ["ABC123"]},
+            {"action": "unpark", "spot": {"a": 1}},
+            {"action": "unpark", "license_plate": "ABC123", "spot": self.parking.spots[0].id}
+        ])
+        self.assertEqual([result.get("message") for result in results], [
+            None, "SPOT_ALREADY_TAKEN", None, "CAR_NOT_FOUND", None, "SPOT_NOT_TAKEN", "INVALID_ACTION",
+            "INVALID_OPERATION", "INVALID_OPERATION", "CAR_NOT_ON_SPOT"
+        ])
+        self.assertEqual(results[2]["spot"]["tag"], "00")
+        Session.commit()
+
+        # Une seule incrémentation de version pour les trois changements, comme l'index
+        self.assertEqual(self.parking.version, 3)
+        self.assertEqual(self.parking.occupancy.version, 3)
+        self.assertTrue(self.parking.occupancy.is_taken(0, 0))
+        self.assertFalse(self.parking.occupancy.is_taken(1, 1))
+        self.assertIsNone(car.spot)
+        self.assertEqual(other.spot.tag, "00")
+
+    def test_ingest(self):
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        self.parking.save(Session)
+        car.save(Session, commit=True)
+        parking_id = self.parking.id
+        Session.remove()
+
+        stream = io.BytesIO(
+            b'{"id": "e1", "action": "park", "license_plate": "ABC123"}\n'
+            b'not json\n'
+            b'\n'
+            b'{"action": "park", "license_plate": "XYZ789"}\n'
+            b'{"action": "park", "license_plate": ["ABC123"]}\n'
+            b'{"action": "unpark", "license_plate": "ABC123"}'
+        )
+        acks = [json.loads(line) for chunk in ingestion.ingest(parking_id, stream) for line in chunk.splitlines()]
+        self.assertEqual([ack["seq"] for ack in acks], [1, 2, 3, 4, 5])
+        self.assertEqual(acks[0]["id"], "e1")
+        self.assertEqual(acks[0]["spot"]["tag"], "00")
+        self.assertEqual([ack.get("message") for ack in acks], [None, "INVALID_JSON", "CAR_NOT_FOUND", "INVALID_OPERATION", None])
+        self.assertEqual(Session.get(Parking, parking_id).version, 2)
+
+        # Une mise à jour en mémoire en échec après la validation n'annule pas l'acquittement
+        Session.remove()
+        with patch("utils.occupancy.update_spot", side_effect=RuntimeError), self.assertLogs("gopark.ingestion"):
+            ack = json.loads(ingestion.apply_batch(parking_id, [(1, {"action": "park", "license_plate": "ABC123"})]))
+        self.assertEqual(ack["status"], "success")
+        self.assertEqual(Session.get(Parking, parking_id).version, 3)
+
+    def test_line_splitter(self):
+        long_line = b"x" * (ingestion.INGEST_MAX_LINE + 10)
+        body = b"a\n" + long_line + b"\nb\n" + long_line
+        # Découpage identique quelle que soit la taille des blocs reçus
+        for size in (1, 7, 4096, len(body)):
+            splitter = ingestion.LineSplitter()
+            lines = [line for start in range(0, len(body), size) for line in splitter.feed(body[start:start + size])]
+            lines += splitter.close()
+            self.assertEqual([line[:1] for line in lines], [b"a", b"x", b"b", b"x"])
+            self.assertEqual([ingestion.decode_event(line).message for line in lines[1::2]], ["LINE_TOO_LONG"] * 2)
+
+        self.assertEqual(list(ingestion.read_lines(io.BytesIO(b"a\n\nb"))), [b"a", b"", b"b"])
+
+    def test_bump_version(self):
+        self.parking.save(Session, commit=True)
+        index = self.parking.occupancy
+        self.assertEqual(index.version, 0)
+
+        # Changement fait sans passer par l'index (par exemple par un autre processus)
+        self.parking.spots[0].is_taken = True
+        self.parking.bump_version(Session)
+        Session.commit()
+
+        self.assertEqual(self.parking.version, 1)
+        self.assertIsNot(self.parking.occupancy, index)
+        self.assertTrue(self.parking.occupancy.is_taken(0, 0))
+
+    def test_delete(self):
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        self.parking.save(Session)
+        car.park(self.parking.spots[1])
+        Session.commit()
+        parking_id, spot_id = self.parking.id, self.parking.spots[1].id
+
+        # Le stationnement en cours est terminé par la suppression
+        self.parking.delete(Session)
+        Session.commit()
+        self.assertIsNone(Session.get(Parking, parking_id))
+        stays, _ = history.search(Session, "car_id", car.id)
+        self.assertEqual(len(stays), 1)
+        self.assertEqual((stays[0]["spot"], stays[0]["parking"]), (spot_id, parking_id))
+        self.assertIsNotNone(stays[0]["entered_at"])
+
+    def test_list_route(self):
+        client = server.test_client()
+        self.parking.save(Session)
+        Parking("A Parking", "1 rue de la Paix", "75000", "Paris", 1, 2).save(Session)
+        Parking("B Parking", "2 rue de la Paix", "75000", "Paris", 1, 2).save(Session, commit=True)
+
+        page = client.get("/api/parkings?limit=2").json
+        self.assertEqual([parking["name"] for parking in page["parkings"]], ["A Parking", "B Parking"])
+        self.assertEqual(page["parkings"][0]["available_spots"], 2)
+        page = client.get("/api/parkings", query_string={"limit": 2, "cursor": page["next_cursor"]}).json
+        self.assertEqual([parking["name"] for parking in page["parkings"]], ["Test Parking"])
+        self.assertIsNone(page["next_cursor"])
+
+        page = client.get("/api/parkings?city=Paris").json
+        self.assertEqual([parking["name"] for parking in page["parkings"]], ["A Parking", "B Parking"])
+        self.assertEqual(client.get("/api/parkings?limit=1.5").json["message"], "INVALID_LIMIT")
+
+    def test_conditional_routes(self):
+        client = server.test_client()
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        self.parking.save(Session)
+        Session.add(car)
+        Session.commit()
+        parking_id, spot_id = self.parking.id, self.parking.spots[0].id
+        urls = [f"/api/parkings/{parking_id}{path}" for path in ("", "/spots", "/statistics")]
+
+        etags = {}
+        for url in urls:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["Cache-Control"], "no-cache")
+            etags[url] = response.headers["ETag"]
+
+            # Version inchangée : la route n'est pas exécutée
+            response = client.get(url, headers={"If-None-Match": etags[url]})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b"")
+            self.assertEqual(response.headers["ETag"], etags[url])
+
+        # Chaque stationnement change la version, donc l'ETag
+        for action in ("park", "unpark"):
+            response = client.post(f"/api/parkings/{parking_id}/spots/{spot_id}/{action}", json={"license_plate": "ABC123"})
+            self.assertEqual(response.status_code, 200)
+
+            for url in urls:
+                response = client.get(url, headers={"If-None-Match": etags[url]})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response.headers["ETag"], etags[url])
+                self.assertEqual(response.json["status"], "success")
+                etags[url] = response.headers["ETag"]
+
+        self.assertEqual(client.get("/api/parkings/unknown/spots", headers={"If-None-Match": "*"}).status_code, 404)
+
+    def test_metrics_route(self):
+        client = server.test_client()
+        car = Car("ABC123", "Toyota", "Corolla", "Blue", Person("John", "Doe", "2000-01-01"))
+        subscriber = Person("Jane", "Doe", "2000-01-01")
+        self.parking.save(Session)
+        Session.add_all([car, subscriber])
+        Session.commit()
+        parking_id, subscriber_id, spots = self.parking.id, subscriber.id, [spot.id for spot in self.parking.spots]
+
+        # Places 0 et 1 réservées, place 0 occupée par la voiture d'une autre personne
+        for spot_id in spots[:2]:
+            response = client.post(f"/api/parkings/{parking_id}/subscriptions/create", json={"owner": subscriber_id, "spot": spot_id})
+            self.assertEqual(response.status_code, 201)
+        response = client.post(f"/api/parkings/{parking_id}/spots/{spots[0]}/park", json={"license_plate": "ABC123"})
+        self.assertEqual(response.status_code, 200)
+        response = client.post(f"/api/parkings/{parking_id}/spots/{spots[2]}/park", json={"license_plate": "UNKNOWN"})
+        self.assertEqual(response.status_code, 404)
+
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/plain")
+        lines = response.text.splitlines()
+
+        self.assertIn("# TYPE gopark_parking_spots_taken gauge", lines)
+        labels = f'{{parking="{parking_id}",name="Test Parking"}}'
+        self.assertIn(f"gopark_parking_spots_taken{labels} 1", lines)
+        self.assertIn(f"gopark_parking_spots_reserved{labels} 2", lines)
+        self.assertIn(f"gopark_parking_spots_free{labels} 2", lines)
+        self.assertIn(f"gopark_parking_cars_bad_parked{labels} 1", lines)
+
+        # Mesures des requêtes, par route et par code d'erreur (propres au processus, donc cumulées entre les tests)
+        route = "/api/parkings/<parking_id>/spots/<spot_id>/park"
+        for prefix in (
+            f'gopark_http_requests_total{{method="POST",route="{route}",status="200"}} ',
+            f'gopark_http_errors_total{{method="POST",route="{route}",message="CAR_NOT_FOUND"}} ',
+            f'gopark_http_request_duration_seconds_count{{method="POST",route="{route}"}} '
+        ):
+            self.assertTrue(any(line.startswith(prefix) for line in lines), prefix)
+
+    def test_statistics_route(self):
+        client = server.test_client()
+        profile = {
+            "parkings": 2, "levels": (1, 3), "spots_per_level": (5, 15),
+            "persons": 40, "two_cars_ratio": 0.5, "parked_ratio": 0.6, "subscriptions": 30
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = seed.seed(profile, 42)
+
+        baseline = {}
+        for parking in Session.query(Parking).all():
+            # Statistiques calculées comme avant les requêtes agrégées, en parcourant les objets
+            cars = [car for car in Session.query(Car).all() if car.spot and car.spot.parking.id == parking.id]
+            available_spots = len([spot for spot in parking.spots if not spot.is_taken and not spot.subscription])
+            reserved_spots = len([spot for spot in parking.spots if spot.subscription])
+            car_brands, levels = {}, {}
+            for car in cars:
+                car_brands[car.brand] = car_brands.get(car.brand, 0) + 1
+            for spot in parking.spots:
+                levels[str(spot.level)] = levels.get(str(spot.level), 0) + 1
+
+            baseline[parking.id] = {
+                "total_spots": len(parking.spots),
+                "total_levels": len(levels),
+                "total_cars": len(cars),
+                "total_subscriptions": len(parking.subscriptions),
+                "available_spots": available_spots,
+                "taken_spots": len(parking.spots) - available_spots,
+                "reserved_spots": reserved_spots,
+                "not_reserved_spots": len(parking.spots) - reserved_spots,
+                "car_brands": car_brands,
+                "cars_bad_parked": [{
+                    "id": car.id,
+                    "brand": car.brand,
+                    "color": car.color,
+                    "license_plate": car.license_plate,
+                    "owner": {
+                        "id": car.owner.id,
+                        "first_name": car.owner.first_name,
+                        "last_name": car.owner.last_name
+                    },
+                    "spot": {
+                        "id": car.spot.id,
+                        "tag": car.spot.tag,
+                        "owner": {
+                            "id": car.spot.subscription.person.id,
+                            "first_name": car.spot.subscription.person.first_name,
+                            "last_name": car.spot.subscription.person.last_name
+                        }
+                    }
+                }
+                # Les voitures mal garées sont triées par place
+                for car in sorted(cars, key=lambda car: car.spot.tag) if car.is_bad_parked()],
+                "levels": levels
+            }
+
+        self.assertEqual(set(baseline), {parking["id"] for parking in rows["parkings"]})
+        for parking_id, expected in baseline.items():
+            response = client.get(f"/api/parkings/{parking_id}/statistics")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, {"status": "success", "statistics": expected})
+
+        # Le jeu de données couvre les voitures mal garées
+        self.assertTrue(any(statistics["cars_bad_parked"] for statistics in baseline.values()))
+
+    def test_list_route_statements(self):
+        client = server.test_client()
+        counts = []
+        for i in range(3):
+            for j in range(4):
+                parking = Parking(f"Parking {i}{j}", "1 rue de la Paix", "75000", "Paris", 2, 3)
+                person = Person("John", f"Doe {i}{j}", "2000-01-01")
+                parking.save(Session)
+                Car(f"AB{i}{j}CD", "Toyota", "Corolla", "Blue", person).park(parking.spots[0])
+                Subscription(person, parking, parking.spots[1]).save(Session)
+            Session.commit()
+
+            with count_statements() as statements:
+                self.assertEqual(len(client.get("/api/parkings").json["parkings"]), 4 * (i + 1))
+            counts.append(len(statements))
+
+        # Le nombre de requêtes ne dépend pas du nombre de parkings
+        self.assertEqual(counts, [counts[0]] * 3)
+        self.assertLessEqual(counts[0], 3)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
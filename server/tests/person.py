@@ -1,6 +1,10 @@
 import unittest
+from tests import count_statements, reset_database
+from utils import names
+from utils.sqlalchemy import Session
 from datetime import datetime
 from classes import Person, Parking, Subscription, Spot
+from server import server
 
 class TestPerson(unittest.TestCase):
 
@@ -20,6 +24,9 @@ class TestPerson(unittest.TestCase):
             spots_per_level=2
         )
 
+    def tearDown(self):
+        reset_database()
+
     def test_initialization(self):
         self.assertEqual(self.person.first_name, "John")
         self.assertEqual(self.person.last_name, "Doe")
@@ -48,5 +55,69 @@ class TestPerson(unittest.TestCase):
         self.assertIsInstance(self.parking.subscriptions[0].spot, Spot)
         self.assertEqual(self.parking.subscriptions[0].spot.subscription, self.parking.subscriptions[0])
 
+    def test_name_index(self):
+        self.person.save(Session)
+        Person("Élodie", "Durand", "1985-05-12").save(Session)
+        Person("Jean-Marc", "Dupont", "1970-03-30").save(Session)
+        Person("Jean", "Dupuis", "1992-11-02").save(Session, commit=True)
+        names.drop_index()
+
+        index = Person.name_index()
+        self.assertEqual(len(index), 4)
+        found, total = index.search("du")
+        self.assertEqual([entry.last_name for entry in found], ["Dupont", "Dupuis", "Durand"])
+        self.assertEqual(total, 3)
+        self.assertEqual([entry.first_name for entry in index.search("ELODIE")[0]], ["Élodie"])
+        self.assertEqual([entry.first_name for entry in index.search("dup jean")[0]], ["Jean-Marc", "Jean"])
+        self.assertEqual(index.search("jean marc", 1), ([index.search("dupont")[0][0]], 1))
+        self.assertEqual(index.search("zoe"), ([], 0))
+
+        names.add_person("id", "Zoé", "Martin", "2001-01-01")
+        self.assertEqual(index.search("zoe")[0][0].id, "id")
+        names.drop_index()
+
+    def test_list_route(self):
+        client = server.test_client()
+        self.parking.save(Session)
+        Person("Alice", "Martin", "1980-02-02").save(Session)
+        Person("Bob", "Martin", "1981-03-03").save(Session)
+        self.person.save(Session)
+        Subscription(self.person, self.parking, self.parking.spots[0]).save(Session, commit=True)
+
+        page = client.get("/api/persons?limit=2").json
+        self.assertEqual([person["first_name"] for person in page["persons"]], ["Alice", "Bob"])
+        page = client.get("/api/persons", query_string={"limit": 2, "cursor": page["next_cursor"]}).json
+        self.assertEqual([person["first_name"] for person in page["persons"]], ["John"])
+        self.assertEqual(len(page["persons"][0]["subscriptions"]), 1)
+        self.assertIsNone(page["next_cursor"])
+
+        page = client.get("/api/persons?subscribed=true").json
+        self.assertEqual([person["first_name"] for person in page["persons"]], ["John"])
+        self.assertEqual(len(client.get("/api/persons?subscribed=false").json["persons"]), 2)
+        self.assertEqual(client.get("/api/persons?subscribed=maybe").json["message"], "INVALID_SUBSCRIBED")
+        self.assertEqual(client.get("/api/persons?cursor=x").json["message"], "INVALID_CURSOR")
+
+    def test_list_route_statements(self):
+        client = server.test_client()
+        parking = Parking("Large Parking", "1 rue de la Paix", "75000", "Paris", 1, 12)
+        parking.save(Session, commit=True)
+        parking_id = parking.id
+        counts = []
+        for i in range(3):
+            parking = Session.get(Parking, parking_id)
+            for j in range(4):
+                person = Person("John", f"Doe {i}{j}", "2000-01-01")
+                person.save(Session)
+                Subscription(person, parking, parking.spots[4 * i + j]).save(Session)
+            Session.commit()
+
+            with count_statements() as statements:
+                self.assertEqual(len(client.get("/api/persons").json["persons"]), 4 * (i + 1))
+            counts.append(len(statements))
+
+        # Le nombre de requêtes ne dépend pas du nombre de personnes
+        self.assertEqual(counts, [counts[0]] * 3)
+        self.assertLessEqual(counts[0], 3)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
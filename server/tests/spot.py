@@ -29,5 +29,18 @@ class TestSpot(unittest.TestCase):
         self.assertIsNone(spot_dict["car"])
         self.assertIsNone(spot_dict["subscription"])
 
+    def test_make_tag(self):
+        self.assertEqual(Spot.make_tag(1, 5, 30), "105")
+        self.assertEqual(Spot.make_tag(3, 7, 100), "3007")
+        self.assertEqual(Spot.make_tag(12, 9, 10), "1209")
+
+    def test_parse_tag(self):
+        self.assertEqual(Spot.parse_tag("105", 30), (1, 5))
+        self.assertEqual(Spot.parse_tag("3007", 100), (3, 7))
+        self.assertEqual(Spot.parse_tag("1209", 10), (12, 9))
+        self.assertIsNone(Spot.parse_tag("5", 30))
+        self.assertIsNone(Spot.parse_tag("140", 30))
+        self.assertIsNone(Spot.parse_tag("A05", 30))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,249 @@
+import os
+import json
+import asyncio
+import itertools
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+# Nombre maximal d'événements en attente par abonné : au-delà, l'abonné est
+# trop lent et reçoit un événement 'reset' l'invitant à recharger l'état complet
+EVENTS_MAX_PENDING = int(os.environ.get("EVENTS_MAX_PENDING", 256))
+# Délai maximal entre deux messages d'un flux, en secondes
+EVENTS_HEARTBEAT_INTERVAL = float(os.environ.get("EVENTS_HEARTBEAT_INTERVAL", 15))
+
+def format_event(name: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """
+    Mise en forme d'un événement au format Server-Sent Events.
+
+    Paramètres :
+    - name (str) : Nom de l'événement.
+    - data (dict) : Données de l'événement, encodées en JSON.
+    - event_id (int) OPTIONNEL : Identifiant de l'événement.
+
+    Sortie :
+    - str : Événement à écrire dans le flux.
+    """
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+RESET_EVENT = format_event("reset", {})
+
+class Subscriber:
+    """
+    Abonné à un canal d'événements (un flux SSE ouvert).
+
+    Les événements publiés sont ajoutés à une file bornée, vidée par le flux
+    de l'abonné : la publication ne bloque jamais, quel que soit le rythme de
+    lecture des clients.
+    """
+
+    def __init__(self, channel: str, max_pending: int = EVENTS_MAX_PENDING) -> None:
+        """
+        Initialisation de l'abonné.
+
+        Paramètres :
+        - channel (str) : Canal de l'abonné.
+        - max_pending (int, optionnel) : Nombre maximal d'événements en attente.
+        """
+        self.channel = channel
+        self.max_pending = max_pending
+        self.pending: Deque[str] = deque()
+        self.overflow = False
+        self.condition = threading.Condition(threading.Lock())
+
+    def push(self, message: str) -> None:
+        """
+        Ajoute un événement à la file de l'abonné.
+
+        Si la file est pleine, elle est remplacée par un unique événement
+        'reset' et les événements suivants sont ignorés jusqu'à sa lecture.
+
+        Paramètres :
+        - message (str) : Événement mis en forme.
+        """
+        with self.condition:
+            if self.overflow:
+                return
+            if len(self.pending) >= self.max_pending:
+                self.pending.clear()
+                self.pending.append(RESET_EVENT)
+                self.overflow = True
+            else:
+                self.pending.append(message)
+            self.condition.notify()
+
+    def pull(self, timeout: float) -> List[str]:
+        """
+        Récupère les événements en attente, en attendant au plus `timeout` secondes.
+
+        Paramètres :
+        - timeout (float) : Délai d'attente maximal, en secondes.
+
+        Sortie :
+        - List[str] : Événements en attente, vide si le délai est écoulé.
+        """
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            messages = list(self.pending)
+            self.pending.clear()
+            self.overflow = False
+            return messages
+
+class AsyncSubscriber(Subscriber):
+    """
+    Abonné lu depuis une boucle asyncio (mode ASGI, voir `asgi.py`).
+
+    Les événements peuvent être publiés depuis n'importe quel thread : la
+    boucle de l'abonné est réveillée sans qu'aucun thread n'attende le flux.
+    """
+
+    def __init__(self, channel: str, max_pending: int = EVENTS_MAX_PENDING) -> None:
+        """
+        Initialisation de l'abonné, depuis la boucle asyncio qui lit le flux.
+
+        Paramètres :
+        - channel (str) : Canal de l'abonné.
+        - max_pending (int, optionnel) : Nombre maximal d'événements en attente.
+        """
+        super().__init__(channel, max_pending)
+        self.loop = asyncio.get_running_loop()
+        self.ready = asyncio.Event()
+
+    def push(self, message: str) -> None:
+        super().push(message)
+        self.wake()
+
+    def wake(self) -> None:
+        """
+        Réveille le flux de l'abonné, depuis n'importe quel thread.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self.ready.set)
+        except RuntimeError:
+            # Boucle déjà fermée : le flux est terminé
+            pass
+
+    async def pull_async(self, timeout: float) -> List[str]:
+        """
+        Récupère les événements en attente, en attendant au plus `timeout` secondes.
+
+        Paramètres :
+        - timeout (float) : Délai d'attente maximal, en secondes.
+
+        Sortie :
+        - List[str] : Événements en attente, vide si le délai est écoulé.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.ready.clear()
+        return self.pull(0)
+
+class EventBroker:
+    """
+    Diffusion d'événements aux abonnés d'un canal (un canal par parking).
+
+    Chaque événement est mis en forme une seule fois, puis ajouté à la file de
+    chaque abonné du canal. Le broker est propre au processus : avec plusieurs
+    workers, un abonné ne reçoit que les événements publiés par son worker.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialisation du broker.
+        """
+        self._channels: Dict[str, Set[Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, channel: str, factory: Callable[[str], Subscriber] = Subscriber) -> Subscriber:
+        """
+        Abonne un nouveau flux à un canal.
+
+        Paramètres :
+        - channel (str) : Canal.
+        - factory (Callable, optionnel) : Classe de l'abonné (`AsyncSubscriber` pour un flux asyncio).
+
+        Sortie :
+        - Subscriber : Abonné créé.
+        """
+        subscriber = factory(channel)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """
+        Désabonne un flux de son canal.
+
+        Paramètres :
+        - subscriber (Subscriber) : Abonné.
+        """
+        with self._lock:
+            subscribers = self._channels.get(subscriber.channel)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._channels[subscriber.channel]
+
+    def publish(self, channel: str, name: str, data: Dict[str, Any]) -> int:
+        """
+        Publie un événement sur un canal.
+
+        Paramètres :
+        - channel (str) : Canal.
+        - name (str) : Nom de l'événement.
+        - data (dict) : Données de l'événement.
+
+        Sortie :
+        - int : Nombre d'abonnés auxquels l'événement a été transmis.
+        """
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+            event_id = next(self._sequence)
+
+        if not subscribers:
+            return 0
+
+        message = format_event(name, data, event_id)
+        for subscriber in subscribers:
+            subscriber.push(message)
+        return len(subscribers)
+
+    def count(self, channel: Optional[str] = None) -> int:
+        """
+        Nombre d'abonnés d'un canal, ou de tous les canaux.
+
+        Paramètres :
+        - channel (str) OPTIONNEL : Canal.
+
+        Sortie :
+        - int : Nombre d'abonnés.
+        """
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+# Broker du processus
+broker = EventBroker()
+
+def publish(channel: str, name: str, data: Dict[str, Any]) -> int:
+    """
+    Publie un événement sur un canal du broker du processus.
+
+    Paramètres :
+    - channel (str) : Canal.
+    - name (str) : Nom de l'événement.
+    - data (dict) : Données de l'événement.
+
+    Sortie :
+    - int : Nombre d'abonnés auxquels l'événement a été transmis.
+    """
+    return broker.publish(channel, name, data)
@@ -0,0 +1,365 @@
+import os
+import re
+import time
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import Column, DateTime, Index, Table, event, inspect, insert, select, and_, or_
+from sqlalchemy.exc import DBAPIError
+from utils.uuid import uuid_v4, Identifier
+from utils.sqlalchemy import Base, SessionFactory
+from utils.pagination import PaginationError, encode_cursor, decode_cursor
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Connection, Engine
+    from sqlalchemy.orm import SessionTransaction
+    from sqlalchemy.orm.session import Session as SessionType
+
+# Tables de l'historique des stationnements, une par mois de départ (ex : parking_history_202610)
+PARTITION_PREFIX = "parking_history_"
+PARTITION_PATTERN = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+# Délai, en secondes, avant de relire la liste des tables (créées par les autres workers)
+HISTORY_PARTITIONS_MAX_AGE = float(os.environ.get("HISTORY_PARTITIONS_MAX_AGE", 60))
+
+# Mois d'une table : (année, mois)
+Month = Tuple[int, int]
+
+def utcnow() -> datetime:
+    """
+    Date et heure courantes en UTC, sans fuseau horaire (format stocké en base).
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def parse_time(value: str) -> Optional[datetime]:
+    """
+    Lecture d'une date ISO 8601 (ex : "2026-10-01T00:00:00.000Z").
+
+    Paramètres :
+    - value (str) : Date à lire ; sans fuseau horaire, elle est considérée en UTC.
+
+    Sortie :
+    - datetime : Date en UTC sans fuseau horaire, None si la date est invalide.
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def format_time(moment: Optional[datetime]) -> Optional[str]:
+    """
+    Mise en forme d'une date UTC pour l'API (ex : "2026-10-01T08:30:00.000Z").
+    """
+    return moment.isoformat(timespec="milliseconds") + "Z" if moment is not None else None
+
+def month_of(moment: datetime) -> Month:
+    return moment.year, moment.month
+
+def next_month(month: Month) -> Month:
+    year, number = month
+    return (year + 1, 1) if number == 12 else (year, number + 1)
+
+def partition_name(month: Month) -> str:
+    return f"{PARTITION_PREFIX}{month[0]:04d}{month[1]:02d}"
+
+_tables_lock = threading.Lock()
+
+def partition(month: Month) -> Table:
+    """
+    Table de l'historique d'un mois, déclarée dans `Base.metadata` au premier appel.
+
+    Une ligne est un stationnement terminé, rangé dans la table du mois de
+    son départ : les écritures ne vont que dans la table du mois en cours.
+    L'arrivée (`entered_at`) est inconnue pour les voitures garées avant
+    l'ajout de `spots.parked_at`.
+
+    Paramètres :
+    - month (Month) : Année et mois.
+
+    Sortie :
+    - Table : Table du mois (pas forcément créée en base, voir `ensure_partition`).
+    """
+    name = partition_name(month)
+    with _tables_lock:
+        table = Base.metadata.tables.get(name)
+        if table is None:
+            table = Table(
+                name, Base.metadata,
+                Column("id", Identifier, primary_key=True),
+                Column("car_id", Identifier, nullable=False),
+                Column("spot_id", Identifier, nullable=False),
+                Column("parking_id", Identifier, nullable=False),
+                Column("entered_at", DateTime),
+                Column("left_at", DateTime, nullable=False),
+                # Historique d'une voiture, du plus récent au plus ancien (l'identifiant
+                # départage les départs simultanés : l'index suffit au tri d'une page)
+                Index(f"ix_{name}_car_id_left_at", "car_id", "left_at", "id"),
+                # Stationnements d'un parking terminés dans une période (l'arrivée est
+                # comparée à la fin de la période sans lire la table)...
+                Index(f"ix_{name}_parking_id_left_at", "parking_id", "left_at", "id", "entered_at"),
+                # ... et ceux commencés avant la fin d'une période, terminés après
+                Index(f"ix_{name}_parking_id_entered_at", "parking_id", "entered_at"),
+            )
+        return table
+
+# Mois dont la table existe en base, et date de la dernière lecture de la liste des tables
+_partitions: Set[Month] = set()
+_partitions_loaded_at: Optional[float] = None
+_partitions_lock = threading.Lock()
+
+def _add_partition(month: Month) -> None:
+    with _partitions_lock:
+        _partitions.add(month)
+
+def _read_partitions(connection: 'Connection') -> Set[Month]:
+    """
+    Mois des tables de l'historique présentes en base, sans passer par le cache.
+    """
+    months = set()
+    for name in inspect(connection).get_table_names():
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            months.add((int(match.group(1)), int(match.group(2))))
+    return months
+
+def existing_partitions(connection: 'Connection') -> List[Month]:
+    """
+    Mois dont la table de l'historique existe en base, du plus ancien au plus récent.
+
+    La liste est relue au plus toutes les `HISTORY_PARTITIONS_MAX_AGE` secondes.
+
+    Paramètres :
+    - connection (Connection) : Connexion à la base de données.
+
+    Sortie :
+    - List[Month] : Mois des tables existantes.
+    """
+    global _partitions_loaded_at
+    now = time.monotonic()
+    if _partitions_loaded_at is None or now - _partitions_loaded_at > HISTORY_PARTITIONS_MAX_AGE:
+        months = _read_partitions(connection)
+        with _partitions_lock:
+            _partitions.clear()
+            _partitions.update(months)
+            _partitions_loaded_at = now
+    with _partitions_lock:
+        return sorted(_partitions)
+
+def create_partition(bind: 'Engine', month: Month) -> Table:
+    """
+    Crée la table de l'historique d'un mois si elle n'existe pas encore.
+
+    La table est créée dans sa propre transaction, et non dans celle de la
+    requête : la création n'est pas annulée avec la requête, et ne bloque pas
+    les autres requêtes jusqu'à sa fin. Si un autre worker crée la table en
+    même temps, l'échec de la création est ignoré.
+
+    Paramètres :
+    - bind (Engine) : Moteur de la base de données.
+    - month (Month) : Année et mois.
+
+    Sortie :
+    - Table : Table du mois.
+    """
+    table = partition(month)
+    try:
+        with bind.connect() as connection, connection.begin():
+            table.create(connection, checkfirst=True)
+    except DBAPIError:
+        with bind.connect() as connection:
+            if month not in _read_partitions(connection):
+                raise
+    _add_partition(month)
+    return table
+
+def ensure_partition(session: 'SessionType', month: Month) -> Table:
+    """
+    Table de l'historique d'un mois, créée si elle n'existe pas encore.
+
+    Les tables du mois en cours et du suivant sont déjà créées au début de la
+    transaction (voir `prepare_partitions`) : seule la table d'un autre mois
+    peut être créée ici, dans sa propre transaction (voir `create_partition`).
+
+    Paramètres :
+    - session (SessionType) : Session de la base de données.
+    - month (Month) : Année et mois.
+
+    Sortie :
+    - Table : Table du mois.
+    """
+    if month not in _partitions:
+        return create_partition(session.get_bind(), month)
+    return partition(month)
+
+def prepare_partitions(session: 'SessionType', transaction: 'SessionTransaction', connection: 'Connection') -> None:
+    """
+    Crée les tables de l'historique du mois en cours et du suivant au début
+    d'une transaction, si elles n'existent pas encore.
+
+    La création a lieu avant toute écriture de la transaction : sur SQLite,
+    la connexion de la création n'attend pas le verrou d'écriture de la
+    session. Une fois les tables créées, seul le cache est lu.
+    """
+    current = month_of(utcnow())
+    for month in (current, next_month(current)):
+        if month not in _partitions:
+            create_partition(connection.engine, month)
+
+event.listen(SessionFactory, "after_begin", prepare_partitions)
+
+def create_partitions(connection: 'Connection', months: List[Month]) -> None:
+    """
+    Crée à l'avance les tables de plusieurs mois (voir `scripts/migrate.py`).
+
+    Paramètres :
+    - connection (Connection) : Connexion à la base de données.
+    - months (List[Month]) : Mois des tables à créer.
+    """
+    for month in months:
+        partition(month).create(connection, checkfirst=True)
+
+def drop_partitions(connection: 'Connection') -> None:
+    """
+    Supprime toutes les tables de l'historique présentes en base.
+
+    `Base.metadata.drop_all` ne supprime que les tables déjà déclarées par
+    `partition` dans le processus : les tables des autres mois restent sinon
+    en base (voir `scripts/seed.py`). Les tables sont aussi retirées de
+    `Base.metadata`, pour que `create_all` ne les recrée pas.
+
+    Paramètres :
+    - connection (Connection) : Connexion à la base de données.
+    """
+    global _partitions_loaded_at
+    for month in sorted(_read_partitions(connection)):
+        partition(month).drop(connection)
+    with _tables_lock:
+        for table in [table for name, table in Base.metadata.tables.items() if PARTITION_PATTERN.match(name)]:
+            Base.metadata.remove(table)
+    with _partitions_lock:
+        _partitions.clear()
+        _partitions_loaded_at = None
+
+def record(
+        session: 'SessionType',
+        car_id: str,
+        spot_id: str,
+        parking_id: str,
+        entered_at: Optional[datetime],
+        left_at: datetime
+    ) -> None:
+    """
+    Ajoute un stationnement terminé à l'historique, dans la transaction en cours.
+
+    Paramètres :
+    - session (SessionType) : Session de la base de données.
+    - car_id (str) : Identifiant de la voiture.
+    - spot_id (str) : Identifiant de la place.
+    - parking_id (str) : Identifiant du parking.
+    - entered_at (datetime) : Arrivée de la voiture (None si inconnue).
+    - left_at (datetime) : Départ de la voiture.
+    """
+    table = ensure_partition(session, month_of(left_at))
+    session.execute(insert(table).values(
+        id=uuid_v4(),
+        car_id=car_id,
+        spot_id=spot_id,
+        parking_id=parking_id,
+        entered_at=entered_at,
+        left_at=left_at
+    ))
+
+def to_dict(row: Any) -> Dict[str, Any]:
+    """
+    Convertit une ligne de l'historique en dictionnaire.
+    """
+    return {
+        "id": row.id,
+        "car": row.car_id,
+        "spot": row.spot_id,
+        "parking": row.parking_id,
+        "entered_at": format_time(row.entered_at),
+        "left_at": format_time(row.left_at)
+    }
+
+def search(
+        session: 'SessionType',
+        column: str,
+        value: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Stationnements terminés d'une voiture ou d'un parking qui chevauchent une
+    période, du départ le plus récent au plus ancien.
+
+    Seules les tables des mois pouvant contenir un résultat sont lues, de la
+    plus récente à la plus ancienne, jusqu'à remplir la page : un départ
+    postérieur au début de la période place le stationnement dans la table
+    du mois de `start` ou dans une table plus récente. Chaque table est lue
+    par un index (voir `partition`), avec les seules conditions qui ne sont
+    pas toujours vraies pour ses lignes.
+
+    Paramètres :
+    - session (SessionType) : Session de la base de données.
+    - column (str) : "car_id" ou "parking_id".
+    - value (str) : Identifiant de la voiture ou du parking.
+    - start (datetime) OPTIONNEL : Début de la période (départ à partir de cette date).
+    - end (datetime) OPTIONNEL : Fin de la période (arrivée avant cette date).
+    - limit (int, optionnel) : Nombre de stationnements par page.
+    - cursor (str) OPTIONNEL : Curseur renvoyé avec la page précédente.
+
+    Sortie :
+    - Tuple[List[dict], Optional[str]] : Stationnements de la page et curseur de la page suivante.
+
+    Exceptions :
+    - PaginationError : INVALID_CURSOR si le curseur est invalide.
+    """
+    after = None
+    if cursor is not None:
+        left_at, row_id = decode_cursor(cursor, 2)
+        after = parse_time(left_at) if isinstance(left_at, str) else None
+        if after is None or not isinstance(row_id, str):
+            raise PaginationError("INVALID_CURSOR")
+
+    months = existing_partitions(session.connection())
+    if start is not None:
+        months = [month for month in months if month >= month_of(start)]
+    if after is not None:
+        months = [month for month in months if month <= month_of(after)]
+
+    rows: List[Any] = []
+    for month in reversed(months):
+        table = partition(month)
+        conditions = [table.c[column] == value]
+        if start is not None and month == month_of(start):
+            conditions.append(table.c.left_at >= start)
+        if end is not None and month >= month_of(end):
+            conditions.append(table.c.entered_at < end)
+        if after is not None and month == month_of(after):
+            # (left_at, id) < (after, row_id), avec une borne sur left_at utilisable par l'index
+            conditions.append(table.c.left_at <= after)
+            conditions.append(or_(
+                table.c.left_at < after,
+                and_(table.c.left_at == after, table.c.id < row_id)
+            ))
+
+        rows += session.execute(
+            select(table)
+            .where(*conditions)
+            .order_by(table.c.left_at.desc(), table.c.id.desc())
+            .limit(limit + 1 - len(rows))
+        ).all()
+        if len(rows) > limit:
+            break
+
+    if len(rows) <= limit:
+        return [to_dict(row) for row in rows], None
+
+    rows = rows[:limit]
+    # Le curseur garde la précision de la base (microsecondes)
+    return [to_dict(row) for row in rows], encode_cursor([rows[-1].left_at.isoformat(), rows[-1].id])
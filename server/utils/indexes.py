@@ -0,0 +1,103 @@
+import time
+import threading
+from typing import Any, Callable, Generic, Iterable, List, Optional, TypeVar
+
+Index = TypeVar("Index")
+
+class IndexRegistry(Generic[Index]):
+    """
+    Index en mémoire du processus, construit depuis la base de données.
+
+    L'index est construit au premier accès. Plus vieux que `max_age` secondes,
+    il est reconstruit dans un thread, l'ancien index restant utilisé en
+    attendant : les ajouts faits par les autres processus y apparaissent au
+    plus tard après ce délai.
+
+    L'index doit avoir un attribut `built_at` (`time.monotonic()` à sa
+    construction) et une méthode `add`.
+    """
+
+    def __init__(self, factory: Callable[[Iterable[Any]], Index], max_age: float) -> None:
+        """
+        Initialisation du registre.
+
+        Paramètres :
+        - factory (Callable) : Construit l'index à partir des éléments lus en base.
+        - max_age (float) : Âge maximal de l'index, en secondes (0 : jamais reconstruit).
+        """
+        self.factory = factory
+        self.max_age = max_age
+        self.index: Optional[Index] = None
+        # Éléments ajoutés pendant une construction, à reporter dans le nouvel index
+        self.pending: Optional[List[Any]] = None
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def _build(self, loader: Callable[[], Iterable[Any]]) -> Index:
+        """
+        Construction de l'index à partir des éléments de la base de données.
+
+        Les éléments ajoutés pendant la lecture, qu'elle les ait vus ou non,
+        sont ajoutés ensuite : aucun n'est perdu. `build_lock` doit être acquis.
+        """
+        with self.lock:
+            self.pending = []
+        try:
+            index = self.factory(loader())
+        except Exception:
+            with self.lock:
+                self.pending = None
+            raise
+        with self.lock:
+            for item in self.pending:
+                index.add(item)
+            self.pending = None
+            self.index = index
+        return index
+
+    def _refresh(self, loader: Callable[[], Iterable[Any]]) -> None:
+        try:
+            self._build(loader)
+        finally:
+            self.build_lock.release()
+
+    def get(self, loader: Callable[[], Iterable[Any]]) -> Index:
+        """
+        Récupère l'index, construit ou reconstruit si nécessaire.
+
+        Paramètres :
+        - loader (Callable) : Fonction qui renvoie tous les éléments de la base de données.
+
+        Sortie :
+        - Index : Index du processus.
+        """
+        index = self.index
+        if index is None:
+            with self.build_lock:
+                return self.index if self.index is not None else self._build(loader)
+
+        if self.max_age > 0 and time.monotonic() - index.built_at > self.max_age:
+            if self.build_lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh, args=(loader,), daemon=True).start()
+        return index
+
+    def add(self, item: Any) -> None:
+        """
+        Ajoute un élément créé à l'index, s'il a été construit.
+
+        Paramètres :
+        - item (Any) : Élément ajouté.
+        """
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(item)
+            index = self.index
+        if index is not None:
+            index.add(item)
+
+    def drop(self) -> None:
+        """
+        Supprime l'index, qui sera reconstruit au prochain accès.
+        """
+        with self.lock:
+            self.index = None
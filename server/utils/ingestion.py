@@ -0,0 +1,284 @@
+import io
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+from classes.errors import ParkingError
+from utils.sqlalchemy import Session as session, commit_deferred
+
+# Taille maximale d'un lot d'événements appliqué en une transaction
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 100))
+# Attente maximale, en secondes, avant d'appliquer un lot incomplet
+INGEST_BATCH_INTERVAL = float(os.environ.get("INGEST_BATCH_INTERVAL", 0.05))
+# Nombre d'événements lus en avance : au-delà, la lecture de la connexion est suspendue
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 1000))
+# Longueur maximale d'une ligne, en octets
+INGEST_MAX_LINE = int(os.environ.get("INGEST_MAX_LINE", 65536))
+# Taille maximale d'une lecture du corps de la requête, en octets
+INGEST_READ_SIZE = 65536
+
+logger = logging.getLogger("gopark.ingestion")
+
+# Événement lu : numéro de ligne et opération (voir `Parking.apply_operations`), ou erreur de lecture
+Event = Tuple[int, Union[Dict[str, Any], ParkingError]]
+
+def decode_event(line: bytes) -> Union[Dict[str, Any], ParkingError]:
+    """
+    Lecture d'une ligne NDJSON.
+
+    Paramètres :
+    - line (bytes) : Ligne lue, avec ou sans retour à la ligne.
+
+    Sortie :
+    - dict : Opération de l'événement, ou ParkingError (INVALID_JSON,
+      INVALID_OPERATION, LINE_TOO_LONG) si la ligne est invalide.
+    """
+    from classes.parking import Parking
+
+    if len(line) > INGEST_MAX_LINE:
+        return ParkingError("LINE_TOO_LONG")
+    try:
+        operation = json.loads(line)
+    except ValueError:
+        return ParkingError("INVALID_JSON")
+    return operation if Parking.is_valid_operation(operation) else ParkingError("INVALID_OPERATION")
+
+def apply_batch(parking_id: str, batch: List[Event]) -> bytes:
+    """
+    Applique un lot d'événements dans une transaction et met en forme les acquittements.
+
+    La session est libérée après le lot : la fonction peut être appelée depuis
+    n'importe quel thread.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+    - batch (List[Event]) : Événements du lot, dans l'ordre.
+
+    Sortie :
+    - bytes : Une ligne NDJSON d'acquittement par événement, avec son numéro (`seq`).
+    """
+    from classes.parking import Parking
+
+    operations = [operation for _, operation in batch if not isinstance(operation, ParkingError)]
+    callbacks = []
+    try:
+        parking = session.get(Parking, parking_id)
+        if parking is None:
+            results = [{"status": "error", "message": "PARKING_NOT_FOUND"} for _ in operations]
+        else:
+            results = parking.apply_operations(operations)
+        callbacks = commit_deferred(session)
+    except Exception:
+        # Lot annulé (base verrouillée, connexion perdue...) : aucun de ses événements n'est
+        # appliqué, et les acquittements des lots suivants restent envoyés
+        session.rollback()
+        results = [{"status": "error", "message": "BATCH_FAILED"} for _ in operations]
+    finally:
+        session.remove()
+
+    # Le lot est validé : l'échec d'une mise à jour en mémoire (index, notifications) ne
+    # change pas ses acquittements (l'index d'occupation est reconstruit d'après sa version)
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception("after_commit callback failed for parking %s", parking_id)
+
+    results = iter(results)
+    lines = []
+    for seq, operation in batch:
+        ack: Dict[str, Any] = {"seq": seq}
+        if isinstance(operation, ParkingError):
+            ack.update(status="error", message=operation.message)
+        else:
+            if "id" in operation:
+                ack["id"] = operation["id"]
+            ack.update(next(results))
+        lines.append(json.dumps(ack, separators=(",", ":")))
+    return ("\n".join(lines) + "\n").encode()
+
+class LineSplitter:
+    """
+    Découpage en lignes d'un corps de requête reçu par blocs.
+
+    Une ligne de plus de `INGEST_MAX_LINE` octets est rendue tronquée à
+    `INGEST_MAX_LINE + 1` octets (voir `decode_event`) dès que cette taille
+    est dépassée, une seule fois : la suite de la ligne est ignorée.
+    """
+
+    def __init__(self) -> None:
+        # Début de la ligne en cours, reçu dans les blocs précédents
+        self.buffer = bytearray()
+        # Fin d'une ligne trop longue, déjà rendue, en cours de lecture
+        self.skipping = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Ajoute un bloc reçu. Seul le bloc est parcouru : le coût ne dépend pas
+        de la taille des blocs précédents.
+
+        Paramètres :
+        - chunk (bytes) : Bloc reçu.
+
+        Sortie :
+        - List[bytes] : Lignes terminées par le bloc, sans retour à la ligne.
+        """
+        lines = []
+        start = 0
+        end = chunk.find(b"\n")
+        while end >= 0:
+            if self.skipping:
+                self.skipping = False
+            else:
+                self.buffer += chunk[start:end]
+                lines.append(bytes(self.buffer))
+            self.buffer = bytearray()
+            start = end + 1
+            end = chunk.find(b"\n", start)
+
+        if not self.skipping:
+            self.buffer += chunk[start:]
+            if len(self.buffer) > INGEST_MAX_LINE:
+                lines.append(bytes(self.buffer[:INGEST_MAX_LINE + 1]))
+                self.buffer, self.skipping = bytearray(), True
+        return lines
+
+    def close(self) -> List[bytes]:
+        """
+        Fin du corps : dernière ligne, sans retour à la ligne final.
+
+        Sortie :
+        - List[bytes] : Dernière ligne, si elle n'a pas déjà été rendue.
+        """
+        line, self.buffer = bytes(self.buffer), bytearray()
+        if self.skipping:
+            self.skipping = False
+            return []
+        return [line] if line else []
+
+def read_chunks(stream: IO[bytes]) -> Iterator[bytes]:
+    """
+    Lecture du corps de la requête par blocs, rendus dès leur réception.
+
+    Une lecture de `n` octets d'un serveur WSGI comme gunicorn n'est rendue
+    qu'une fois les `n` octets reçus, ce qui retarderait un événement isolé.
+    Selon le flux, la lecture utilisée rend ce qui est déjà reçu : `read1`
+    d'un flux bufferisé, `read` d'un flux brut (un seul appel système), ou
+    `readline` (gunicorn : bloc rendu au premier retour à la ligne).
+
+    Paramètres :
+    - stream (IO[bytes]) : Corps de la requête.
+
+    Sortie :
+    - Iterator[bytes] : Blocs d'au plus `INGEST_READ_SIZE` octets.
+    """
+    if isinstance(stream, io.BufferedIOBase):
+        read = stream.read1
+    elif isinstance(stream, io.RawIOBase):
+        read = stream.read
+    else:
+        read = stream.readline
+    while True:
+        chunk = read(INGEST_READ_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+def read_lines(stream: IO[bytes]) -> Iterator[bytes]:
+    """
+    Lecture des lignes du corps de la requête (voir `LineSplitter`).
+
+    Paramètres :
+    - stream (IO[bytes]) : Corps de la requête.
+
+    Sortie :
+    - Iterator[bytes] : Lignes, sans retour à la ligne (tronquées si elles sont trop longues).
+    """
+    splitter = LineSplitter()
+    for chunk in read_chunks(stream):
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+def read_events(stream: IO[bytes], events: queue.Queue, stop: threading.Event) -> None:
+    """
+    Lecture des lignes d'une requête, dans un thread dédié.
+
+    La file est bornée : quand le traitement prend du retard, la lecture est
+    suspendue et le client est ralenti par le contrôle de flux de TCP.
+    None marque la fin de la requête.
+
+    Paramètres :
+    - stream (IO[bytes]) : Corps de la requête.
+    - events (queue.Queue) : File des événements lus.
+    - stop (threading.Event) : Signal d'arrêt, à la fermeture de la réponse.
+    """
+    def put(item: Optional[Event]) -> bool:
+        while not stop.is_set():
+            try:
+                events.put(item, timeout=1.0)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    seq = 0
+    try:
+        for line in read_lines(stream):
+            if stop.is_set():
+                return
+            if not line.strip():
+                continue
+            seq += 1
+            if not put((seq, decode_event(line))):
+                return
+    except (OSError, ValueError):
+        # Connexion interrompue par le client
+        pass
+    put(None)
+
+def ingest(parking_id: str, stream: IO[bytes]) -> Iterator[bytes]:
+    """
+    Ingestion d'un flux NDJSON d'événements de stationnement.
+
+    Les événements sont regroupés en lots d'au plus `INGEST_BATCH_SIZE`
+    événements ou `INGEST_BATCH_INTERVAL` secondes, appliqués chacun dans une
+    transaction (voir `Parking.apply_operations`). Les acquittements d'un lot
+    sont envoyés dès sa validation.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+    - stream (IO[bytes]) : Corps de la requête.
+
+    Sortie :
+    - Iterator[bytes] : Acquittements, une ligne NDJSON par événement.
+    """
+    events: queue.Queue = queue.Queue(INGEST_QUEUE_SIZE)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_events, args=(stream, events, stop), daemon=True)
+    reader.start()
+
+    try:
+        finished = False
+        while not finished:
+            event = events.get()
+            if event is None:
+                break
+
+            batch = [event]
+            deadline = time.monotonic() + INGEST_BATCH_INTERVAL
+            while len(batch) < INGEST_BATCH_SIZE:
+                try:
+                    event = events.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    finished = True
+                    break
+                batch.append(event)
+
+            yield apply_batch(parking_id, batch)
+    finally:
+        stop.set()
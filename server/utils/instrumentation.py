@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import time
+import heapq
+import cProfile
+import logging
+import threading
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from sqlalchemy import event
+from utils.sqlalchemy import SessionFactory, engine
+
+if TYPE_CHECKING:
+    from flask import Flask, Response
+
+# Instrumentation des requêtes (désactivée par défaut)
+INSTRUMENTATION = os.environ.get("INSTRUMENTATION", "false").lower() == "true"
+# Nombre de profils cProfile conservés, ceux des requêtes les plus lentes (0 pour désactiver le profilage)
+PROFILE_SLOWEST = int(os.environ.get("PROFILE_SLOWEST", 0))
+# Répertoire des profils (fichiers .prof, lisibles avec pstats ou snakeviz)
+PROFILE_DIRECTORY = os.environ.get("PROFILE_DIRECTORY", "profiles")
+
+logger = logging.getLogger("gopark.requests")
+
+class RequestStats:
+    """
+    Mesures d'une requête : temps total, requêtes SQL, lignes chargées et
+    chargements paresseux (lazy loading) de relations.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialisation des mesures, au début de la requête.
+        """
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.lazy_loads = 0
+        self.profiler: Optional[cProfile.Profile] = None
+
+# Mesures de la requête en cours (propres à chaque thread ou greenlet)
+current: ContextVar[Optional[RequestStats]] = ContextVar("current", default=None)
+
+class SlowestProfiles:
+    """
+    Conservation des profils des requêtes les plus lentes.
+
+    Les profils sont écrits dans `PROFILE_DIRECTORY` ; quand `PROFILE_SLOWEST`
+    profils sont conservés, un nouveau profil plus lent remplace le plus rapide.
+    """
+
+    def __init__(self, directory: str, size: int) -> None:
+        """
+        Initialisation.
+
+        Paramètres :
+        - directory (str) : Répertoire des profils.
+        - size (int) : Nombre de profils conservés.
+        """
+        self.directory = directory
+        self.size = size
+        self.heap: List[Tuple[float, str]] = []
+        self.lock = threading.Lock()
+
+    def offer(self, duration: float, name: str, profiler: cProfile.Profile) -> Optional[str]:
+        """
+        Propose le profil d'une requête.
+
+        Paramètres :
+        - duration (float) : Durée de la requête, en millisecondes.
+        - name (str) : Description de la requête (méthode et chemin).
+        - profiler (cProfile.Profile) : Profil de la requête.
+
+        Sortie :
+        - str : Chemin du profil s'il est conservé, None sinon.
+        """
+        with self.lock:
+            if len(self.heap) >= self.size and duration <= self.heap[0][0]:
+                return None
+
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(
+                self.directory,
+                f"{duration:010.1f}ms-{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')}-{time.time_ns()}.prof"
+            )
+            profiler.dump_stats(path)
+
+            if len(self.heap) < self.size:
+                heapq.heappush(self.heap, (duration, path))
+            else:
+                _, evicted = heapq.heapreplace(self.heap, (duration, path))
+                if os.path.exists(evicted):
+                    os.remove(evicted)
+            return path
+
+profiles = SlowestProfiles(PROFILE_DIRECTORY, PROFILE_SLOWEST)
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """
+    Début d'une requête SQL.
+    """
+    if current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def end_statement(conn) -> None:
+    """
+    Fin d'une requête SQL : nombre de requêtes et temps passé en base de données.
+    """
+    starts = conn.info.get("query_start")
+    if starts:
+        start = starts.pop()
+        stats = current.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += time.perf_counter() - start
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    end_statement(conn)
+
+def handle_error(context) -> None:
+    """
+    Échec d'une requête SQL : `after_cursor_execute` n'est pas appelé, le
+    début de la requête est retiré ici pour ne pas fausser les suivantes.
+    """
+    if context.connection is not None:
+        end_statement(context.connection)
+
+def loaded_as_persistent(session, instance) -> None:
+    """
+    Chargement d'une ligne en objet par l'ORM.
+    """
+    stats = current.get()
+    if stats is not None:
+        stats.rows += 1
+
+def do_orm_execute(orm_execute_state) -> None:
+    """
+    Exécution d'une requête ORM : comptage des chargements paresseux de relations.
+    """
+    stats = current.get()
+    if stats is not None and orm_execute_state.is_relationship_load and orm_execute_state.lazy_loaded_from is not None:
+        stats.lazy_loads += 1
+
+def start_request() -> None:
+    """
+    Début d'une requête : initialisation des mesures et, si `PROFILE_SLOWEST`
+    est positif, du profilage. La durée d'une requête n'est connue qu'à sa
+    fin : toutes les requêtes sont profilées, seuls les profils des plus
+    lentes sont écrits (voir `SlowestProfiles`).
+    """
+    stats = RequestStats()
+    if PROFILE_SLOWEST > 0:
+        stats.profiler = cProfile.Profile()
+        try:
+            stats.profiler.enable()
+        except ValueError:
+            # Un autre profileur est actif dans ce thread
+            stats.profiler = None
+    current.set(stats)
+
+def finish_request(response: 'Response') -> 'Response':
+    """
+    Fin d'une requête : en-tête `Server-Timing` et ligne de journal structurée.
+
+    Paramètres :
+    - response (Response) : Réponse de la requête.
+
+    Sortie :
+    - Response : Réponse complétée.
+    """
+    from flask import request
+
+    stats = current.get()
+    if stats is None:
+        return response
+    current.set(None)
+
+    if stats.profiler is not None:
+        stats.profiler.disable()
+
+    duration = (time.perf_counter() - stats.start) * 1000
+    db_time = stats.db_time * 1000
+    response.headers["Server-Timing"] = ", ".join([
+        f"app;dur={duration - db_time:.2f}",
+        f"db;dur={db_time:.2f};desc=\"{stats.statements} statements\"",
+        f"rows;desc=\"{stats.rows}\"",
+        f"lazy;desc=\"{stats.lazy_loads}\""
+    ])
+    response.headers["Timing-Allow-Origin"] = "*"
+
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "route": request.url_rule.rule if request.url_rule else None,
+        "status": response.status_code,
+        "duration_ms": round(duration, 2),
+        "db_ms": round(db_time, 2),
+        "statements": stats.statements,
+        "rows": stats.rows,
+        "lazy_loads": stats.lazy_loads
+    }
+    if stats.profiler is not None:
+        record["profile"] = profiles.offer(duration, f"{request.method} {request.path}", stats.profiler)
+
+    logger.info(json.dumps(record))
+    return response
+
+def discard_request(_) -> None:
+    """
+    Fin d'une requête interrompue par une exception : arrêt du profilage.
+    """
+    stats = current.get()
+    if stats is not None:
+        if stats.profiler is not None:
+            stats.profiler.disable()
+        current.set(None)
+
+def init_app(app: 'Flask') -> None:
+    """
+    Active l'instrumentation des requêtes d'une application si `INSTRUMENTATION` est activée.
+
+    Sans instrumentation, aucun événement n'est enregistré et les requêtes ne
+    sont pas ralenties.
+
+    Paramètres :
+    - app (Flask) : Application.
+    """
+    if not INSTRUMENTATION:
+        return
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+    event.listen(SessionFactory, "loaded_as_persistent", loaded_as_persistent)
+    event.listen(SessionFactory, "do_orm_execute", do_orm_execute)
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(discard_request)
@@ -0,0 +1,197 @@
+import time
+import bisect
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from utils.occupancy import OccupancyIndex
+
+if TYPE_CHECKING:
+    from flask import Flask, Response
+
+# Bornes des histogrammes de durée des requêtes, en secondes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape_label(value: str) -> str:
+    """
+    Échappement d'une valeur de label au format d'exposition Prometheus.
+
+    Paramètres :
+    - value (str) : Valeur du label.
+
+    Sortie :
+    - str : Valeur échappée.
+    """
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(**labels: str) -> str:
+    """
+    Mise en forme des labels d'une mesure.
+
+    Sortie :
+    - str : Labels entre accolades.
+    """
+    return "{" + ",".join(f"{name}=\"{escape_label(value)}\"" for name, value in labels.items()) + "}"
+
+class RequestMetrics:
+    """
+    Compteurs et histogrammes des requêtes HTTP du processus.
+
+    Les requêtes sont regroupées par route (règle Flask, par exemple
+    `/api/parkings/<parking_id>`) : le nombre de séries ne dépend pas des
+    identifiants reçus.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Initialisation des mesures.
+
+        Paramètres :
+        - buckets (Tuple[float, ...], optionnel) : Bornes des histogrammes de durée, en secondes.
+        """
+        self.buckets = buckets
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.errors: Dict[Tuple[str, str, str], int] = {}
+        # Par route : nombre de requêtes par intervalle (non cumulé), somme des durées
+        self.durations: Dict[Tuple[str, str], Tuple[List[int], List[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, duration: float, message: Optional[str] = None) -> None:
+        """
+        Enregistre une requête.
+
+        Paramètres :
+        - method (str) : Méthode HTTP.
+        - route (str) : Route de la requête.
+        - status (int) : Code de statut de la réponse.
+        - duration (float) : Durée de la requête, en secondes.
+        - message (str) OPTIONNEL : Code d'erreur de la réponse.
+        """
+        position = bisect.bisect_left(self.buckets, duration)
+        with self.lock:
+            self.requests[method, route, status] = self.requests.get((method, route, status), 0) + 1
+            if message is not None:
+                self.errors[method, route, message] = self.errors.get((method, route, message), 0) + 1
+
+            counts, total = self.durations.setdefault((method, route), ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[position] += 1
+            total[0] += duration
+
+    def render(self) -> List[str]:
+        """
+        Mise en forme des mesures au format d'exposition Prometheus.
+
+        Sortie :
+        - List[str] : Lignes de l'exposition.
+        """
+        with self.lock:
+            requests = sorted(self.requests.items())
+            errors = sorted(self.errors.items())
+            durations = sorted((key, list(counts), total[0]) for key, (counts, total) in self.durations.items())
+
+        lines = [
+            "# HELP gopark_http_requests_total Nombre de requêtes HTTP traitées.",
+            "# TYPE gopark_http_requests_total counter"
+        ]
+        for (method, route, status), count in requests:
+            lines.append(f"gopark_http_requests_total{format_labels(method=method, route=route, status=status)} {count}")
+
+        lines += [
+            "# HELP gopark_http_errors_total Nombre de réponses d'erreur, par code d'erreur.",
+            "# TYPE gopark_http_errors_total counter"
+        ]
+        for (method, route, message), count in errors:
+            lines.append(f"gopark_http_errors_total{format_labels(method=method, route=route, message=message)} {count}")
+
+        lines += [
+            "# HELP gopark_http_request_duration_seconds Durée des requêtes HTTP.",
+            "# TYPE gopark_http_request_duration_seconds histogram"
+        ]
+        for (method, route), counts, total in durations:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"gopark_http_request_duration_seconds_bucket{format_labels(method=method, route=route, le=le)} {cumulative}")
+            labels = format_labels(method=method, route=route)
+            lines.append(f"gopark_http_request_duration_seconds_sum{labels} {total}")
+            lines.append(f"gopark_http_request_duration_seconds_count{labels} {cumulative}")
+
+        return lines
+
+# Mesures des requêtes du processus
+requests = RequestMetrics()
+
+def render_parkings(parkings: Iterable[Tuple[str, str, OccupancyIndex]]) -> List[str]:
+    """
+    Mise en forme des jauges d'occupation des parkings.
+
+    Les jauges sont lues sur les index d'occupation, tenus à jour à chaque
+    stationnement et abonnement : leur calcul ne fait aucune requête.
+
+    Paramètres :
+    - parkings (Iterable[Tuple[str, str, OccupancyIndex]]) : Identifiant, nom et index de chaque parking.
+
+    Sortie :
+    - List[str] : Lignes de l'exposition.
+    """
+    gauges = (
+        ("gopark_parking_spots_taken", "Nombre de places occupées.", OccupancyIndex.taken_count),
+        ("gopark_parking_spots_reserved", "Nombre de places réservées par un abonnement.", OccupancyIndex.reserved_count),
+        ("gopark_parking_spots_free", "Nombre de places libres (ni occupées, ni réservées).", OccupancyIndex.free_count),
+        ("gopark_parking_cars_bad_parked", "Nombre de voitures garées sur une place réservée à une autre personne.", OccupancyIndex.bad_parked_count)
+    )
+    parkings = list(parkings)
+
+    lines = []
+    for name, description, count in gauges:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+        for parking_id, parking_name, index in parkings:
+            lines.append(f"{name}{format_labels(parking=parking_id, name=parking_name)} {count(index)}")
+    return lines
+
+def record_request(response: 'Response') -> 'Response':
+    """
+    Enregistre la durée, le statut et le code d'erreur d'une requête.
+
+    Paramètres :
+    - response (Response) : Réponse de la requête.
+
+    Sortie :
+    - Response : Réponse de la requête.
+    """
+    from flask import g, request
+
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+
+    message = None
+    if response.status_code >= 400:
+        data = response.get_json(silent=True) if response.is_json else None
+        message = data.get("message") if isinstance(data, dict) and data.get("message") else f"HTTP_{response.status_code}"
+
+    requests.observe(
+        request.method,
+        request.url_rule.rule if request.url_rule else "<unmatched>",
+        response.status_code,
+        time.perf_counter() - start,
+        message
+    )
+    return response
+
+def start_request() -> None:
+    """
+    Début d'une requête.
+    """
+    from flask import g
+
+    g.metrics_start = time.perf_counter()
+
+def init_app(app: 'Flask') -> None:
+    """
+    Enregistre les mesures des requêtes d'une application.
+
+    Paramètres :
+    - app (Flask) : Application.
+    """
+    app.before_request(start_request)
+    app.after_request(record_request)
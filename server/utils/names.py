@@ -0,0 +1,219 @@
+import os
+import re
+import time
+import heapq
+import bisect
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+from utils.indexes import IndexRegistry
+
+# Âge maximal de l'index, en secondes, avant sa reconstruction depuis la base de données
+NAME_INDEX_MAX_AGE = float(os.environ.get("NAME_INDEX_MAX_AGE", 300))
+# Nombre de personnes renvoyées par défaut par une recherche
+NAME_SEARCH_LIMIT = 10
+
+# Nombre de mots nouveaux gardés à part avant leur fusion dans le vocabulaire trié
+RECENT_WORDS_MAX = 1024
+
+# Mots d'un nom : lettres et chiffres (les tirets, apostrophes et espaces séparent les mots)
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+class Entry(NamedTuple):
+    """
+    Personne indexée, avec les seuls champs affichés par les listes de choix.
+    """
+    id: str
+    first_name: str
+    last_name: str
+    birth_date: str
+
+def fold(text: str) -> str:
+    """
+    Mise en forme d'un texte pour la comparaison : sans accents ni majuscules.
+
+    Paramètres :
+    - text (str) : Texte à mettre en forme.
+
+    Sortie :
+    - str : Texte mis en forme (ex : "Élodie" -> "elodie").
+    """
+    if text.isascii():
+        return text.lower()
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char)).casefold()
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpage d'un texte en mots mis en forme (voir `fold`).
+
+    Paramètres :
+    - text (str) : Texte à découper.
+
+    Sortie :
+    - List[str] : Mots du texte, dans l'ordre.
+    """
+    return WORD_PATTERN.findall(fold(text))
+
+class NameIndex:
+    """
+    Index en mémoire des noms des personnes, pour la recherche à la saisie.
+
+    Chaque mot des prénoms et noms est associé aux positions des personnes
+    qui le portent. Les mots sont triés : les mots commençant par un début
+    de mot recherché sont contigus et trouvés par recherche dichotomique.
+    Les mots nouveaux sont d'abord triés à part, dans une liste courte,
+    fusionnée dans le vocabulaire au-delà de `RECENT_WORDS_MAX` mots : un ajout
+    ne recopie pas tout le vocabulaire.
+
+    Les listes ne sont jamais modifiées en place, sauf par ajout en fin de
+    liste : une lecture concurrente d'un ajout voit l'ancien ou le nouvel état.
+    """
+
+    def __init__(self, persons: Iterable[Tuple[str, str, str, str]] = ()) -> None:
+        """
+        Initialisation de l'index.
+
+        Paramètres :
+        - persons (Iterable[Tuple[str, str, str, str]], optionnel) : Identifiant,
+          prénom, nom et date de naissance des personnes indexées.
+        """
+        self.entries: List[Entry] = []
+        # Mots de chaque personne, à la même position que dans `entries`
+        self.tokens: List[frozenset] = []
+        # Clés de tri de chaque personne : nom et prénom mis en forme
+        self.keys: List[Tuple[str, str, str]] = []
+        self.postings: Dict[str, List[int]] = {}
+        for person in persons:
+            self._append(Entry(*person))
+        # Vocabulaire trié et mots nouveaux triés, remplacés ensemble
+        self.vocabulary: Tuple[List[str], List[str]] = (sorted(self.postings), [])
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _append(self, entry: Entry) -> List[str]:
+        """
+        Ajoute une personne et renvoie ses mots absents jusque-là de l'index.
+        """
+        position = len(self.entries)
+        tokens = frozenset(tokenize(entry.first_name) + tokenize(entry.last_name))
+        self.entries.append(entry)
+        self.tokens.append(tokens)
+        self.keys.append((fold(entry.last_name), fold(entry.first_name), entry.id))
+        new_words = []
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                self.postings[token] = [position]
+                new_words.append(token)
+            else:
+                posting.append(position)
+        return new_words
+
+    def add(self, person: Tuple[str, str, str, str]) -> None:
+        """
+        Ajoute une personne à l'index.
+
+        Paramètres :
+        - person (Tuple[str, str, str, str]) : Identifiant, prénom, nom et date de naissance.
+        """
+        with self.lock:
+            new_words = self._append(Entry(*person))
+            if new_words:
+                words, recent = self.vocabulary
+                recent = sorted(recent + new_words)
+                if len(recent) > RECENT_WORDS_MAX:
+                    words, recent = list(heapq.merge(words, recent)), []
+                self.vocabulary = (words, recent)
+
+    @staticmethod
+    def _words(vocabulary: Tuple[List[str], List[str]], prefix: str) -> List[str]:
+        """
+        Mots de l'index commençant par `prefix`.
+        """
+        found = []
+        for words in vocabulary:
+            start = bisect.bisect_left(words, prefix)
+            found += words[start:bisect.bisect_left(words, prefix + "\U0010ffff", start)]
+        return found
+
+    def search(self, query: str, limit: int = NAME_SEARCH_LIMIT) -> Tuple[List[Entry], int]:
+        """
+        Recherche des personnes dont le prénom ou le nom commence par chaque mot recherché.
+
+        Les candidats sont lus depuis le mot recherché le plus sélectif, puis
+        filtrés sur les autres mots. Les personnes dont des mots correspondent
+        entièrement sont classées en premier, puis par nom et prénom.
+
+        Paramètres :
+        - query (str) : Début(s) de prénom et de nom, dans n'importe quel ordre
+          (ex : "jean du" pour Jean Dupont), sans tenir compte des accents ni des majuscules.
+        - limit (int, optionnel) : Nombre maximal de personnes renvoyées.
+
+        Sortie :
+        - Tuple[List[Entry], int] : Meilleures personnes trouvées et nombre total de personnes correspondantes.
+        """
+        prefixes = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not prefixes:
+            return [], 0
+
+        vocabulary = self.vocabulary
+        words = [self._words(vocabulary, prefix) for prefix in prefixes]
+        if not all(words):
+            return [], 0
+
+        # Le mot recherché correspondant au moins de mots de l'index fournit les candidats
+        selective = min(range(len(prefixes)), key=lambda i: len(words[i]))
+        candidates = set().union(*(self.postings[word] for word in words[selective]))
+        others = [prefix for i, prefix in enumerate(prefixes) if i != selective]
+
+        entries, tokens, keys = self.entries, self.tokens, self.keys
+        found = [
+            position for position in candidates
+            if all(any(token.startswith(prefix) for token in tokens[position]) for prefix in others)
+        ]
+
+        def rank(position: int) -> tuple:
+            exact = sum(prefix in tokens[position] for prefix in prefixes)
+            return -exact, keys[position]
+
+        best = heapq.nsmallest(limit, found, key=rank)
+        return [entries[position] for position in best], len(found)
+
+# Index des noms du processus
+_registry: IndexRegistry[NameIndex] = IndexRegistry(NameIndex, NAME_INDEX_MAX_AGE)
+
+def get_index(loader: Callable[[], Iterable[Tuple[str, str, str, str]]]) -> NameIndex:
+    """
+    Récupère l'index des noms du processus.
+
+    L'index est construit au premier appel. Plus vieux que `NAME_INDEX_MAX_AGE`,
+    il est reconstruit dans un thread, l'ancien index restant utilisé en attendant.
+
+    Paramètres :
+    - loader (Callable) : Fonction qui renvoie toutes les personnes de la base de données.
+
+    Sortie :
+    - NameIndex : Index des noms.
+    """
+    return _registry.get(loader)
+
+def add_person(person_id: str, first_name: str, last_name: str, birth_date: str) -> None:
+    """
+    Ajoute une personne créée à l'index, s'il a été construit.
+
+    Paramètres :
+    - person_id (str) : Identifiant de la personne.
+    - first_name (str) : Prénom de la personne.
+    - last_name (str) : Nom de famille de la personne.
+    - birth_date (str) : Date de naissance de la personne.
+    """
+    _registry.add((person_id, first_name, last_name, birth_date))
+
+def drop_index() -> None:
+    """
+    Supprime l'index, qui sera reconstruit au prochain accès.
+    """
+    _registry.drop()
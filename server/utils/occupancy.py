@@ -0,0 +1,315 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Politiques d'attribution automatique d'une place (voir `OccupancyIndex.find_free`)
+POLICIES = ("lowest_level", "fill_evenly", "nearest_entrance")
+
+class OccupancyIndex:
+    """
+    Index en mémoire de l'occupation des places d'un parking.
+
+    Chaque étage est représenté par trois entiers utilisés comme bitsets :
+    le bit n de `taken[level]` vaut 1 si la place n de l'étage est occupée,
+    celui de `reserved[level]` si la place est réservée par un abonnement et
+    celui de `bad_parked[level]` si la voiture garée sur la place n'appartient
+    pas à la personne abonnée.
+
+    `version` est la version du parking (voir `Parking.version`) à laquelle
+    l'index correspond : elle avance d'un pas avec chaque changement répercuté.
+    """
+
+    def __init__(self, levels: int, spots_per_level: int, version: int = 0) -> None:
+        """
+        Initialisation de l'index.
+
+        Paramètres :
+        - levels (int) : Nombre d'étages du parking.
+        - spots_per_level (int) : Nombre de places par étage du parking.
+        - version (int, optionnel) : Version du parking.
+        """
+        self.levels = levels
+        self.version = version
+        self.spots_per_level = spots_per_level
+        self.full_mask = (1 << spots_per_level) - 1
+        self.taken: List[int] = [0] * levels
+        self.reserved: List[int] = [0] * levels
+        self.bad_parked: List[int] = [0] * levels
+        self.lock = threading.Lock()
+
+    def set_taken(self, level: int, spot: int, value: bool) -> None:
+        """
+        Marque une place comme occupée ou libre.
+
+        Paramètres :
+        - level (int) : Numéro de l'étage.
+        - spot (int) : Numéro de la place.
+        - value (bool) : True si la place est occupée, False sinon.
+        """
+        with self.lock:
+            self.taken[level] = self._set_bit(self.taken[level], spot, value)
+
+    def set_reserved(self, level: int, spot: int, value: bool) -> None:
+        """
+        Marque une place comme réservée ou non.
+
+        Paramètres :
+        - level (int) : Numéro de l'étage.
+        - spot (int) : Numéro de la place.
+        - value (bool) : True si la place est réservée, False sinon.
+        """
+        with self.lock:
+            self.reserved[level] = self._set_bit(self.reserved[level], spot, value)
+
+    def set_bad_parked(self, level: int, spot: int, value: bool) -> None:
+        """
+        Marque une place comme occupée par une voiture mal garée ou non.
+
+        Paramètres :
+        - level (int) : Numéro de l'étage.
+        - spot (int) : Numéro de la place.
+        - value (bool) : True si la voiture garée sur la place est mal garée, False sinon.
+        """
+        with self.lock:
+            self.bad_parked[level] = self._set_bit(self.bad_parked[level], spot, value)
+
+    @staticmethod
+    def _set_bit(bitset: int, spot: int, value: bool) -> int:
+        return bitset | (1 << spot) if value else bitset & ~(1 << spot)
+
+    def free_mask(self, level: int) -> int:
+        """
+        Bitset des places libres (ni occupées, ni réservées) d'un étage.
+
+        Paramètres :
+        - level (int) : Numéro de l'étage.
+
+        Sortie :
+        - int : Bitset des places libres.
+        """
+        return self.full_mask & ~(self.taken[level] | self.reserved[level])
+
+    def is_taken(self, level: int, spot: int) -> bool:
+        return bool(self.taken[level] >> spot & 1)
+
+    def is_reserved(self, level: int, spot: int) -> bool:
+        return bool(self.reserved[level] >> spot & 1)
+
+    def is_free(self, level: int, spot: int) -> bool:
+        return bool(self.free_mask(level) >> spot & 1)
+
+    def first_free(self) -> Optional[Tuple[int, int]]:
+        """
+        Récupère la première place libre, par étage puis par numéro de place.
+
+        Sortie :
+        - Tuple[int, int] : Étage et numéro de la place, None si le parking est complet.
+        """
+        for level in range(self.levels):
+            mask = self.free_mask(level)
+            if mask:
+                return level, (mask & -mask).bit_length() - 1
+        return None
+
+    def find_free(
+            self,
+            policy: str = "lowest_level",
+            entrance: Optional[Tuple[int, int]] = None,
+            exclude: Optional[Dict[int, int]] = None
+        ) -> Optional[Tuple[int, int]]:
+        """
+        Choisit une place libre selon une politique d'attribution.
+
+        - "lowest_level" : première place de l'étage le plus bas.
+        - "fill_evenly" : première place de l'étage le moins rempli.
+        - "nearest_entrance" : place la plus proche de l'entrée, sur l'étage de
+          l'entrée puis sur les étages les plus proches.
+
+        Le choix ne parcourt pas les places : il ne fait que quelques opérations
+        sur les bitsets de chaque étage.
+
+        Paramètres :
+        - policy (str, optionnel) : Politique d'attribution (voir `POLICIES`).
+        - entrance (Tuple[int, int]) OPTIONNEL : Étage et numéro de la place de
+          l'entrée (première place du parking par défaut).
+        - exclude (Dict[int, int]) OPTIONNEL : Bitsets des places à ignorer, par étage.
+
+        Sortie :
+        - Tuple[int, int] : Étage et numéro de la place, None si aucune place n'est libre.
+        """
+        exclude = exclude or {}
+        masks = [self.free_mask(level) & ~exclude.get(level, 0) for level in range(self.levels)]
+
+        if policy == "nearest_entrance":
+            entrance_level, entrance_spot = entrance or (0, 0)
+            for level in sorted(range(self.levels), key=lambda level: (abs(level - entrance_level), level)):
+                mask = masks[level]
+                if not mask:
+                    continue
+                # Places libres de part et d'autre de l'entrée, au plus près
+                below = mask & ((1 << (entrance_spot + 1)) - 1)
+                above = mask >> entrance_spot
+                candidates = []
+                if below:
+                    candidates.append(below.bit_length() - 1)
+                if above:
+                    candidates.append(entrance_spot + (above & -above).bit_length() - 1)
+                return level, min(candidates, key=lambda spot: (abs(spot - entrance_spot), spot))
+            return None
+
+        if policy == "fill_evenly":
+            levels = sorted(range(self.levels), key=lambda level: (-masks[level].bit_count(), level))
+        else:
+            levels = range(self.levels)
+
+        for level in levels:
+            mask = masks[level]
+            if mask:
+                return level, (mask & -mask).bit_length() - 1
+        return None
+
+    def free_count(self, level: Optional[int] = None) -> int:
+        """
+        Compte les places libres du parking ou d'un étage.
+
+        Paramètres :
+        - level (int) OPTIONNEL : Numéro de l'étage.
+
+        Sortie :
+        - int : Nombre de places libres.
+        """
+        levels = range(self.levels) if level is None else [level]
+        return sum(self.free_mask(level).bit_count() for level in levels)
+
+    def taken_count(self, level: Optional[int] = None) -> int:
+        levels = range(self.levels) if level is None else [level]
+        return sum(self.taken[level].bit_count() for level in levels)
+
+    def reserved_count(self, level: Optional[int] = None) -> int:
+        levels = range(self.levels) if level is None else [level]
+        return sum(self.reserved[level].bit_count() for level in levels)
+
+    def bad_parked_count(self, level: Optional[int] = None) -> int:
+        levels = range(self.levels) if level is None else [level]
+        return sum(self.bad_parked[level].bit_count() for level in levels)
+
+    def free_spots(self, level: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Récupère les places libres du parking ou d'un étage.
+
+        Paramètres :
+        - level (int) OPTIONNEL : Numéro de l'étage.
+
+        Sortie :
+        - List[Tuple[int, int]] : Étage et numéro de chaque place libre.
+        """
+        levels = range(self.levels) if level is None else [level]
+        return self._positions((level, self.free_mask(level)) for level in levels)
+
+    def reserved_spots(self, level: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Récupère les places réservées du parking ou d'un étage.
+
+        Paramètres :
+        - level (int) OPTIONNEL : Numéro de l'étage.
+
+        Sortie :
+        - List[Tuple[int, int]] : Étage et numéro de chaque place réservée.
+        """
+        levels = range(self.levels) if level is None else [level]
+        return self._positions((level, self.reserved[level]) for level in levels)
+
+    @staticmethod
+    def _positions(masks: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Positions (étage, numéro) des bits à 1 des bitsets de chaque étage.
+        """
+        spots = []
+        for level, mask in masks:
+            while mask:
+                lowest = mask & -mask
+                spots.append((level, lowest.bit_length() - 1))
+                mask ^= lowest
+        return spots
+
+# Index des parkings persistés, par identifiant de parking
+_indexes: Dict[str, OccupancyIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_index(parking_id: str) -> Optional[OccupancyIndex]:
+    """
+    Récupère l'index d'un parking s'il a déjà été construit.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+
+    Sortie :
+    - OccupancyIndex : Index du parking, None s'il n'a pas été construit.
+    """
+    return _indexes.get(parking_id)
+
+def register_index(parking_id: str, index: OccupancyIndex) -> OccupancyIndex:
+    """
+    Enregistre l'index d'un parking.
+
+    Si un autre thread a enregistré entre-temps un index de même version, c'est
+    celui-ci qui est conservé. Un index d'une autre version est remplacé.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+    - index (OccupancyIndex) : Index à enregistrer.
+
+    Sortie :
+    - OccupancyIndex : Index enregistré pour le parking.
+    """
+    with _indexes_lock:
+        current = _indexes.get(parking_id)
+        if current is not None and current.version == index.version:
+            return current
+        _indexes[parking_id] = index
+        return index
+
+def drop_index(parking_id: str) -> None:
+    """
+    Supprime l'index d'un parking, qui sera reconstruit au prochain accès.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+    """
+    with _indexes_lock:
+        _indexes.pop(parking_id, None)
+
+def update_spot(
+        parking_id: str,
+        level: int,
+        spot: int,
+        is_taken: Optional[bool] = None,
+        is_reserved: Optional[bool] = None,
+        is_bad_parked: Optional[bool] = None
+    ) -> None:
+    """
+    Répercute un changement d'état d'une place sur l'index de son parking.
+
+    Ne fait rien si l'index du parking n'a pas encore été construit : il sera
+    construit depuis la base de données, déjà à jour, au prochain accès.
+    Chaque appel correspond à une incrémentation de la version du parking.
+
+    Paramètres :
+    - parking_id (str) : Identifiant du parking.
+    - level (int) : Numéro de l'étage.
+    - spot (int) : Numéro de la place.
+    - is_taken (bool) OPTIONNEL : Nouvel état d'occupation de la place.
+    - is_reserved (bool) OPTIONNEL : Nouvel état de réservation de la place.
+    - is_bad_parked (bool) OPTIONNEL : Nouvel état de la voiture garée sur la place.
+    """
+    index = _indexes.get(parking_id)
+    if index is None:
+        return
+
+    if is_taken is not None:
+        index.set_taken(level, spot, is_taken)
+    if is_reserved is not None:
+        index.set_reserved(level, spot, is_reserved)
+    if is_bad_parked is not None:
+        index.set_bad_parked(level, spot, is_bad_parked)
+    with index.lock:
+        index.version += 1
@@ -0,0 +1,127 @@
+import base64
+import binascii
+import json
+import re
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, or_
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Query
+    from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+# Nombre d'éléments par page si seul un curseur est fourni
+DEFAULT_LIMIT = 50
+# Nombre maximal d'éléments par page
+MAX_LIMIT = 500
+
+class PaginationError(ValueError):
+    """
+    Erreur levée lorsque les paramètres de pagination sont invalides.
+
+    L'attribut `message` contient le code d'erreur renvoyé par l'API.
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode les valeurs des colonnes de tri du dernier élément d'une page.
+
+    Paramètres :
+    - values (Sequence[Any]) : Valeurs des colonnes de tri.
+
+    Sortie :
+    - str : Curseur opaque.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Décode un curseur produit par `encode_cursor`.
+
+    Paramètres :
+    - cursor (str) : Curseur opaque.
+    - size (int) : Nombre de colonnes de tri attendu.
+
+    Sortie :
+    - List[Any] : Valeurs des colonnes de tri.
+
+    Exceptions :
+    - PaginationError : INVALID_CURSOR si le curseur est invalide.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise PaginationError("INVALID_CURSOR")
+
+    # Seules les valeurs scalaires sont comparables aux colonnes de tri
+    if not isinstance(values, list) or len(values) != size or not all(
+        isinstance(value, (str, int, float, type(None))) and not isinstance(value, bool) for value in values
+    ):
+        raise PaginationError("INVALID_CURSOR")
+
+    return values
+
+def parse_limit(limit: Optional[str], cursor: Optional[str]) -> Optional[int]:
+    """
+    Valide le nombre d'éléments par page demandé.
+
+    Paramètres :
+    - limit (str) : Valeur du paramètre `limit` de la requête.
+    - cursor (str) : Valeur du paramètre `cursor` de la requête.
+
+    Sortie :
+    - int : Nombre d'éléments par page, None si la requête n'est pas paginée.
+    """
+    if limit is None:
+        return DEFAULT_LIMIT if cursor is not None else None
+
+    # `str.isdigit` accepte aussi les chiffres Unicode (ex : "²"), refusés par `int`
+    if not re.fullmatch(r"[0-9]+", limit) or not 1 <= int(limit) <= MAX_LIMIT:
+        raise PaginationError("INVALID_LIMIT")
+
+    return int(limit)
+
+def paginate(
+        query: 'Query',
+        columns: Sequence['InstrumentedAttribute'],
+        limit: Optional[int],
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+    """
+    Pagination par clé (keyset) d'une requête.
+
+    La requête est triée sur `columns`, dont la dernière doit être unique, et
+    seuls les éléments situés après le curseur sont lus : le coût d'une page ne
+    dépend pas de sa position ni de la taille de la table.
+
+    Paramètres :
+    - query (Query) : Requête à paginer, sans tri.
+    - columns (Sequence[InstrumentedAttribute]) : Colonnes de tri.
+    - limit (int) : Nombre d'éléments par page, None pour tout récupérer.
+    - cursor (str) OPTIONNEL : Curseur renvoyé avec la page précédente.
+
+    Sortie :
+    - Tuple[List[Any], Optional[str]] : Éléments de la page et curseur de la page suivante.
+    """
+    query = query.order_by(*columns)
+
+    if cursor is not None:
+        values = decode_cursor(cursor, len(columns))
+        # (c1, c2, ...) > (v1, v2, ...) développé pour rester portable
+        query = query.filter(or_(*(
+            and_(*(column == value for column, value in zip(columns[:i], values[:i])), columns[i] > values[i])
+            for i in range(len(columns))
+        )))
+
+    if limit is None:
+        return query.all(), None
+
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, encode_cursor([getattr(items[-1], column.key) for column in columns])
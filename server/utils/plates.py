@@ -0,0 +1,297 @@
+import os
+import re
+import math
+import time
+import bisect
+import threading
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils.indexes import IndexRegistry
+
+# Format des plaques d'immatriculation (ex : AB123CD)
+PLATE_PATTERN = re.compile(r"^[A-Z]{2}[0-9]{3}[A-Z]{2}$")
+# Âge maximal de l'index, en secondes, avant sa reconstruction en arrière-plan
+# (prise en compte des voitures créées par d'autres processus ; 0 pour la désactiver)
+PLATE_INDEX_MAX_AGE = float(os.environ.get("PLATE_INDEX_MAX_AGE", 300))
+# Nombre de résultats d'une recherche par défaut
+PLATE_SEARCH_LIMIT = 20
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = "0123456789"
+# Alphabet de chaque position de la plaque
+ALPHABETS = (LETTERS, LETTERS, DIGITS, DIGITS, DIGITS, LETTERS, LETTERS)
+RADICES = tuple(len(alphabet) for alphabet in ALPHABETS)
+# Poids de chaque position dans le code d'une plaque, et nombre de codes possibles
+WEIGHTS = tuple(math.prod(RADICES[position + 1:]) for position in range(len(RADICES)))
+SPACE = RADICES[0] * WEIGHTS[0]
+# Contribution de chaque caractère au code, par position (voir `encode`)
+_CODES = tuple({char: value * WEIGHTS[position] for value, char in enumerate(alphabet)} for position, alphabet in enumerate(ALPHABETS))
+
+# Caractères souvent confondus par les caméras de lecture de plaques
+CONFUSIONS = {frozenset(pair) for pair in ("0O", "0D", "0Q", "1I", "2Z", "5S", "6G", "8B")}
+
+def normalize(text: str) -> str:
+    """
+    Mise en forme d'une plaque saisie ou lue : majuscules, sans espaces ni tirets.
+
+    Paramètres :
+    - text (str) : Plaque saisie.
+
+    Sortie :
+    - str : Plaque normalisée (ex : "ab-123-cd" devient "AB123CD").
+    """
+    return re.sub(r"[\s-]", "", text).upper()
+
+def char_value(char: str, position: int) -> Optional[int]:
+    """
+    Valeur d'un caractère à une position de la plaque.
+
+    Paramètres :
+    - char (str) : Caractère.
+    - position (int) : Position dans la plaque.
+
+    Sortie :
+    - int : Rang du caractère dans l'alphabet de la position, None s'il n'en fait pas partie.
+    """
+    value = ALPHABETS[position].find(char) if len(char) == 1 else -1
+    return value if value >= 0 else None
+
+def encode(plate: str) -> int:
+    """
+    Code d'une plaque au format `PLATE_PATTERN`.
+
+    Le code conserve l'ordre alphabétique des plaques : les plaques de même
+    préfixe ont des codes consécutifs.
+
+    Paramètres :
+    - plate (str) : Plaque.
+
+    Sortie :
+    - int : Code de la plaque, inférieur à `SPACE`.
+    """
+    c0, c1, c2, c3, c4, c5, c6 = _CODES
+    return c0[plate[0]] + c1[plate[1]] + c2[plate[2]] + c3[plate[3]] + c4[plate[4]] + c5[plate[5]] + c6[plate[6]]
+
+def decode(code: int) -> str:
+    """
+    Plaque correspondant à un code (inverse de `encode`).
+
+    Paramètres :
+    - code (int) : Code de la plaque.
+
+    Sortie :
+    - str : Plaque.
+    """
+    chars = []
+    for position in range(len(RADICES)):
+        value, code = divmod(code, WEIGHTS[position])
+        chars.append(ALPHABETS[position][value])
+    return "".join(chars)
+
+class PlateIndex:
+    """
+    Index en mémoire des plaques d'immatriculation, pour la recherche par
+    préfixe et la recherche approchée (distance d'édition de 1).
+
+    Les plaques sont stockées sous forme de codes entiers triés (voir `encode`)
+    dans un tableau de 4 octets par plaque : quelques Mio pour un million de
+    voitures. Une recherche par préfixe est une recherche dichotomique ; une
+    recherche approchée énumère les plaques ne différant que d'un caractère,
+    dont les codes ne diffèrent que par le poids d'une position.
+
+    Le tableau n'est jamais modifié en place : une lecture concurrente d'un
+    ajout voit l'ancien ou le nouveau tableau.
+    """
+
+    def __init__(self, plates: Iterable[str] = ()) -> None:
+        """
+        Initialisation de l'index.
+
+        Paramètres :
+        - plates (Iterable[str], optionnel) : Plaques indexées ; celles qui ne
+          respectent pas `PLATE_PATTERN` sont ignorées.
+        """
+        codes = set()
+        for plate in plates:
+            # Équivalent à `PLATE_PATTERN`, en plus rapide : un caractère hors de l'alphabet de sa position n'a pas de code
+            if len(plate) == len(RADICES):
+                try:
+                    codes.add(encode(plate))
+                except KeyError:
+                    pass
+        self.codes = array("I", sorted(codes))
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, plate: str) -> bool:
+        return bool(PLATE_PATTERN.match(plate)) and self._contains(self.codes, encode(plate))
+
+    @staticmethod
+    def _contains(codes: array, code: int) -> bool:
+        position = bisect.bisect_left(codes, code)
+        return position < len(codes) and codes[position] == code
+
+    def add(self, plate: str) -> None:
+        """
+        Ajoute une plaque à l'index.
+
+        Paramètres :
+        - plate (str) : Plaque ; ignorée si elle ne respecte pas `PLATE_PATTERN`.
+        """
+        if not PLATE_PATTERN.match(plate):
+            return
+        code = encode(plate)
+        with self.lock:
+            position = bisect.bisect_left(self.codes, code)
+            if position < len(self.codes) and self.codes[position] == code:
+                return
+            codes = array("I", self.codes)
+            codes.insert(position, code)
+            self.codes = codes
+
+    def search_prefix(self, prefix: str, limit: int = 20) -> Tuple[List[str], int]:
+        """
+        Recherche des plaques commençant par un préfixe.
+
+        Paramètres :
+        - prefix (str) : Préfixe normalisé (voir `normalize`).
+        - limit (int, optionnel) : Nombre maximal de plaques renvoyées.
+
+        Sortie :
+        - Tuple[List[str], int] : Premières plaques, dans l'ordre alphabétique, et nombre total de plaques correspondantes.
+        """
+        if len(prefix) > len(RADICES):
+            return [], 0
+
+        low = 0
+        for position, char in enumerate(prefix):
+            value = char_value(char, position)
+            if value is None:
+                return [], 0
+            low += value * WEIGHTS[position]
+        high = low + (WEIGHTS[len(prefix) - 1] if prefix else SPACE)
+
+        codes = self.codes
+        start = bisect.bisect_left(codes, low)
+        end = bisect.bisect_left(codes, high, start)
+        return [decode(code) for code in codes[start:min(end, start + limit)]], end - start
+
+    def _matches_at(self, codes: array, base: int, position: int) -> List[int]:
+        """
+        Codes de l'index égaux à `base` à un caractère près, à une position donnée.
+
+        Selon le nombre de plaques attendues dans l'intervalle des codes
+        possibles, l'intervalle est parcouru ou chaque code est cherché.
+
+        Paramètres :
+        - codes (array) : Codes de l'index.
+        - base (int) : Code dont le caractère à la position vaut la première valeur de l'alphabet.
+        - position (int) : Position du caractère qui varie.
+
+        Sortie :
+        - List[int] : Codes trouvés.
+        """
+        weight, radix = WEIGHTS[position], RADICES[position]
+        if weight * len(codes) < SPACE:
+            start = bisect.bisect_left(codes, base)
+            end = bisect.bisect_left(codes, base + radix * weight, start)
+            return [code for code in codes[start:end] if (code - base) % weight == 0]
+        return [code for code in range(base, base + radix * weight, weight) if self._contains(codes, code)]
+
+    def search_fuzzy(self, query: str, limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Recherche des plaques à une distance d'édition d'au plus 1 de la plaque lue.
+
+        Une plaque lue au bon format peut avoir un caractère mal lu
+        (substitution) ; une plaque de 6 ou 8 caractères, un caractère oublié
+        ou en trop. Les plaques sont triées par distance, puis les substitutions
+        de caractères souvent confondus (`CONFUSIONS`, par exemple 0 et O)
+        avant les autres.
+
+        Paramètres :
+        - query (str) : Plaque lue, normalisée (voir `normalize`).
+        - limit (int, optionnel) : Nombre maximal de plaques renvoyées.
+
+        Sortie :
+        - List[Tuple[str, int]] : Plaques trouvées et leur distance à la plaque lue.
+        """
+        codes = self.codes
+        length = len(RADICES)
+        found: Dict[int, int] = {}
+
+        if len(query) == length:
+            values = [char_value(char, position) for position, char in enumerate(query)]
+            invalid = [position for position, value in enumerate(values) if value is None]
+            if not invalid and self._contains(codes, encode(query)):
+                found[encode(query)] = 0
+            # Un caractère hors de l'alphabet de sa position est forcément le caractère mal lu
+            if len(invalid) <= 1:
+                for position in invalid or range(length):
+                    base = sum(value * WEIGHTS[other] for other, value in enumerate(values) if other != position)
+                    for code in self._matches_at(codes, base, position):
+                        found.setdefault(code, 1)
+
+        elif len(query) == length - 1:
+            # Caractère oublié : inséré à chaque position
+            for position in range(length):
+                values = [char_value(char, other) for other, char in zip(
+                    list(range(position)) + list(range(position + 1, length)), query
+                )]
+                if None in values:
+                    continue
+                others = [other for other in range(length) if other != position]
+                base = sum(value * WEIGHTS[other] for other, value in zip(others, values))
+                for code in self._matches_at(codes, base, position):
+                    found.setdefault(code, 1)
+
+        elif len(query) == length + 1:
+            # Caractère en trop : retiré à chaque position
+            for position in range(len(query)):
+                candidate = query[:position] + query[position + 1:]
+                if PLATE_PATTERN.match(candidate) and self._contains(codes, encode(candidate)):
+                    found.setdefault(encode(candidate), 1)
+
+        def rank(item: Tuple[int, int]) -> Tuple[int, bool, str]:
+            plate = decode(item[0])
+            confused = len(query) == length and any(
+                a != b and frozenset((a, b)) in CONFUSIONS for a, b in zip(query, plate)
+            )
+            return item[1], not confused, plate
+
+        return [(decode(code), distance) for code, distance in sorted(found.items(), key=rank)[:limit]]
+
+# Index des plaques du processus
+_registry: IndexRegistry[PlateIndex] = IndexRegistry(PlateIndex, PLATE_INDEX_MAX_AGE)
+
+def get_index(loader: Callable[[], Iterable[str]]) -> PlateIndex:
+    """
+    Récupère l'index des plaques du processus.
+
+    L'index est construit au premier appel. Plus vieux que `PLATE_INDEX_MAX_AGE`,
+    il est reconstruit dans un thread, l'ancien index restant utilisé en attendant.
+
+    Paramètres :
+    - loader (Callable) : Fonction qui renvoie toutes les plaques de la base de données.
+
+    Sortie :
+    - PlateIndex : Index des plaques.
+    """
+    return _registry.get(loader)
+
+def add_plate(plate: str) -> None:
+    """
+    Ajoute la plaque d'une voiture créée à l'index, s'il a été construit.
+
+    Paramètres :
+    - plate (str) : Plaque de la voiture.
+    """
+    _registry.add(plate)
+
+def drop_index() -> None:
+    """
+    Supprime l'index, qui sera reconstruit au prochain accès.
+    """
+    _registry.drop()
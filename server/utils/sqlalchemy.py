@@ -1,13 +1,88 @@
-from sqlalchemy import create_engine
+import os
+from functools import partial
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
 
 if TYPE_CHECKING:
     from sqlalchemy.orm.session import Session as SessionType
     from sqlalchemy.ext.declarative import DeclarativeMeta
 
-# Créer un moteur (ici pour SQLite)
-engine = create_engine('sqlite:///defaultdb.db')
+# Configuration de la base de données, surchargeable par variables d'environnement
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///defaultdb.db')
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', 'false').lower() == 'true'
+
+# Pilote asynchrone du mode ASGI (voir `asgi.py`), déduit de `DATABASE_URL` si non précisé
+ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
+
+# PRAGMAs appliqués à chaque connexion SQLite
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # En Kio si négatif (64 Mio)
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),  # En octets (256 Mio)
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # En millisecondes
+}
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """
+    Options du moteur selon la base de données utilisée.
+
+    Paramètres :
+    - url (str) : URL de la base de données.
+
+    Sortie :
+    - dict : Options à passer à `create_engine`.
+    """
+    url = make_url(url)
+    options: Dict[str, Any] = {'pool_pre_ping': DATABASE_POOL_PRE_PING}
+
+    # Une base SQLite en mémoire utilise une connexion unique par thread, sans pool à dimensionner
+    if url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:'):
+        options['pool_size'] = DATABASE_POOL_SIZE
+        options['max_overflow'] = DATABASE_MAX_OVERFLOW
+
+    return options
+
+def async_database_url(url: str) -> str:
+    """
+    URL de la base de données pour le moteur asynchrone du mode ASGI.
+
+    Le pilote synchrone de l'URL (pysqlite, psycopg2...) est remplacé par le
+    pilote asynchrone de la base (aiosqlite, asyncpg).
+
+    Paramètres :
+    - url (str) : URL de la base de données.
+
+    Sortie :
+    - str : URL de la base de données avec un pilote asynchrone.
+    """
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {url.get_backend_name()}")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+# Créer un moteur (par défaut pour SQLite)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(connection, _) -> None:
+        """
+        Application des PRAGMAs SQLite à l'ouverture d'une connexion.
+        """
+        cursor = connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
 
 # Utilisation de scoped_session pour gérer les sessions par thread
 SessionFactory = sessionmaker(bind=engine)
@@ -26,13 +101,18 @@ def __repr__(self) -> str:
     """
     return f"<{self.__class__.__name__} {self.id}>"
 
-def save(self, session: 'SessionType' = None) -> 'DeclarativeMeta':
+def save(self, session: 'SessionType' = None, commit: bool = False) -> 'DeclarativeMeta':
     """
     Enregistrement de l'objet dans la base de données.
 
+    L'objet est écrit dans la transaction en cours (flush), qui est validée une
+    seule fois à la fin de la requête. La validation immédiate reste possible
+    avec `commit=True`.
+
     Paramètres :
     - session (SessionType, optionnel) : Session de la base de données.
       Si aucune session n'est fournie, la session thread-safe est utilisée.
+    - commit (bool, optionnel) : Valide la transaction après l'enregistrement.
 
     Sortie :
     - DeclarativeMeta : Objet enregistré dans la base de données.
@@ -41,22 +121,85 @@ def save(self, session: 'SessionType' = None) -> 'DeclarativeMeta':
         session = Session()  # Utilise la session thread-safe
 
     session.add(self)
-    session.commit()
+    if commit:
+        session.commit()
+    else:
+        session.flush()
     return self
 
-def delete(self, session: 'SessionType' = None) -> None:
+def delete(self, session: 'SessionType' = None, commit: bool = False) -> None:
     """
     Suppression de l'objet de la base de données.
 
+    Comme pour `save`, la suppression est écrite dans la transaction en cours
+    et n'est validée immédiatement qu'avec `commit=True`.
+
     Paramètres :
     - session (SessionType, optionnel) : Session de la base de données.
       Si aucune session n'est fournie, la session thread-safe est utilisée.
+    - commit (bool, optionnel) : Valide la transaction après la suppression.
     """
     if session is None:
         session = Session()  # Utilise la session thread-safe
 
     session.delete(self)
+    if commit:
+        session.commit()
+    else:
+        session.flush()
+
+def after_commit(callback: Callable[..., Any], *args: Any, session: 'SessionType' = None, **kwargs: Any) -> None:
+    """
+    Exécute une fonction une fois la transaction en cours validée.
+
+    Sert à répercuter une écriture hors de la base de données (index en
+    mémoire, notifications...) seulement si elle a bien été validée : si la
+    transaction est annulée, la fonction n'est jamais appelée. Les arguments
+    sont évalués immédiatement, les objets de la session étant expirés après
+    la validation.
+
+    Paramètres :
+    - callback (Callable) : Fonction à exécuter.
+    - args, kwargs : Arguments de la fonction.
+    - session (SessionType, optionnel) : Session de la base de données.
+      Si aucune session n'est fournie, la session thread-safe est utilisée.
+    """
+    if session is None:
+        session = Session()  # Utilise la session thread-safe
+
+    session.info.setdefault('after_commit', []).append(partial(callback, *args, **kwargs))
+
+def commit_deferred(session: 'SessionType') -> List[Callable[[], Any]]:
+    """
+    Valide la transaction en cours sans exécuter les fonctions enregistrées
+    avec `after_commit`, renvoyées pour être exécutées par l'appelant : leurs
+    erreurs ne sont alors pas confondues avec un échec de la validation.
+
+    Paramètres :
+    - session (SessionType) : Session de la base de données.
+
+    Sortie :
+    - List[Callable] : Fonctions à exécuter, dans l'ordre de leur enregistrement.
+    """
+    callbacks = session.info.pop('after_commit', [])
     session.commit()
+    return callbacks
+
+@event.listens_for(SessionFactory, 'after_commit')
+def run_after_commit(session: 'SessionType') -> None:
+    """
+    Exécution des fonctions enregistrées avec `after_commit`.
+    """
+    for callback in session.info.pop('after_commit', []):
+        callback()
+
+@event.listens_for(SessionFactory, 'after_transaction_end')
+def discard_after_commit(session: 'SessionType', transaction) -> None:
+    """
+    Abandon des fonctions d'une transaction terminée sans être validée.
+    """
+    if transaction.parent is None:
+        session.info.pop('after_commit', None)
 
 Base.__repr__ = __repr__
 Base.save = save
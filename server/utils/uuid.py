@@ -1,4 +1,28 @@
+import os
 import random
+from typing import List, Optional
+from sqlalchemy.types import TypeDecorator, String, LargeBinary, Uuid
+
+# Stockage des identifiants en base de données :
+# - "string" : forme canonique sur 36 caractères (par défaut)
+# - "binary" : 16 octets (type UUID natif sur PostgreSQL)
+# Une base de données doit toujours être utilisée avec le mode qui a servi à la créer.
+ID_STORAGE = os.environ.get("ID_STORAGE", "string")
+
+def format_uuid_v4(digits: str) -> str:
+    """
+    Mise en forme de 32 chiffres hexadécimaux aléatoires en identifiant UUID v4.
+
+    Les chiffres de version et de variante sont forcés.
+
+    Paramètres :
+    - digits (str) : 32 chiffres hexadécimaux.
+
+    Sortie :
+    - str : Identifiant UUID v4.
+    """
+    h = digits
+    return f"{h[0:8]}-{h[8:12]}-4{h[13:16]}-{'89ab'[int(h[16], 16) & 3]}{h[17:20]}-{h[20:32]}"
 
 def uuid_v4() -> str:
     """
@@ -7,23 +31,83 @@ def uuid_v4() -> str:
     Sortie :
     - str : Identifiant UUID v4.
     """
+    return format_uuid_v4(os.urandom(16).hex())
+
+def uuid_v4_batch(count: int, rng: Optional[random.Random] = None) -> List[str]:
+    """
+    Génération d'un lot d'identifiants UUID v4.
+
+    Les octets aléatoires de tout le lot sont tirés en un seul appel, puis
+    découpés en identifiants au format canonique.
+
+    Paramètres :
+    - count (int) : Nombre d'identifiants à générer.
+    - rng (random.Random, optionnel) : Générateur à utiliser pour obtenir des
+      identifiants reproductibles. Par défaut, `os.urandom` est utilisé.
+
+    Sortie :
+    - List[str] : Identifiants UUID v4.
+    """
+    digits = (rng.randbytes(16 * count) if rng else os.urandom(16 * count)).hex()
+    return [format_uuid_v4(digits[i:i + 32]) for i in range(0, 32 * count, 32)]
+
+def uuid_to_bytes(value: str) -> Optional[bytes]:
+    """
+    Conversion d'un identifiant en 16 octets.
+
+    Paramètres :
+    - value (str) : Identifiant au format canonique.
+
+    Sortie :
+    - bytes : Identifiant sur 16 octets, None si l'identifiant est invalide.
+    """
+    try:
+        value = bytes.fromhex(value.replace("-", ""))
+    except (AttributeError, ValueError):
+        return None
+    return value if len(value) == 16 else None
+
+def bytes_to_uuid(value: bytes) -> str:
+    """
+    Conversion de 16 octets en identifiant au format canonique.
+
+    Paramètres :
+    - value (bytes) : Identifiant sur 16 octets.
+
+    Sortie :
+    - str : Identifiant au format canonique.
+    """
+    h = value.hex()
+    return f"{h[0:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:32]}"
+
+class Identifier(TypeDecorator):
+    """
+    Type des colonnes d'identifiant (clés primaires et étrangères).
+
+    Côté Python, un identifiant est toujours une chaîne au format canonique ;
+    son stockage dépend de `ID_STORAGE`. En mode "binary", un identifiant
+    invalide reçu par l'API est converti en NULL et ne correspond donc à aucune ligne.
+    """
 
-    def random_hex(digits: int) -> str:
-        """
-        Génération d'une chaîne hexadécimale aléatoire.
+    impl = String
+    cache_ok = True
 
-        Paramètres :
-        - digits (int) : Nombre de chiffres hexadécimaux à générer.
+    def load_dialect_impl(self, dialect):
+        if ID_STORAGE != "binary":
+            return dialect.type_descriptor(String())
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(Uuid(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
 
-        Sortie :
-        - str : Chaîne hexadécimale aléatoire.
-        """
-        return ''.join(random.choices('0123456789abcdef', k=digits))
+    def process_bind_param(self, value, dialect):
+        if value is None or ID_STORAGE != "binary":
+            return value
+        value = uuid_to_bytes(value)
+        if value is None or dialect.name != "postgresql":
+            return value
+        return bytes_to_uuid(value)
 
-    return (
-        f"{random_hex(8)}-"
-        f"{random_hex(4)}-"
-        f"4{random_hex(3)}-"
-        f"{random.choice('89ab')}{random_hex(3)}-"
-        f"{random_hex(12)}"
-    )
+    def process_result_value(self, value, dialect):
+        if value is None or ID_STORAGE != "binary" or dialect.name == "postgresql":
+            return value
+        return bytes_to_uuid(value)